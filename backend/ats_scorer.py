@@ -0,0 +1,366 @@
+"""
+Local ATS / keyword scorer
+- Skill extraction against a built-in taxonomy (with aliases)
+- BM25-style weighting of job description keywords
+- Rule-based ATS formatting checks (contact info, sections, tables, length)
+Deterministic and LLM-free; answers in milliseconds.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+from prompt_budget import STOPWORDS, REQUIREMENT_CUES, split_sections
+
+
+# Canonical skill -> aliases (lower-case), grouped by category
+SKILL_TAXONOMY = {
+    "languages": {
+        "python": ["python", "python3"],
+        "java": ["java"],
+        "javascript": ["javascript", "js", "es6", "ecmascript"],
+        "typescript": ["typescript"],
+        "c++": ["c++", "cpp"],
+        "c#": ["c#", "csharp"],
+        "go": ["golang", "go lang"],
+        "rust": ["rust"],
+        "ruby": ["ruby"],
+        "php": ["php"],
+        "kotlin": ["kotlin"],
+        "swift": ["swift"],
+        "scala": ["scala"],
+        "r": ["r programming", "rstudio"],
+        "sql": ["sql", "t-sql", "pl/sql"],
+        "bash": ["bash", "shell scripting"],
+        "html": ["html", "html5"],
+        "css": ["css", "css3", "sass", "scss"],
+        "matlab": ["matlab"],
+    },
+    "frameworks": {
+        "react": ["react", "react.js", "reactjs"],
+        "angular": ["angular", "angularjs"],
+        "vue": ["vue", "vue.js", "vuejs"],
+        "next.js": ["next.js", "nextjs"],
+        "node.js": ["node.js", "nodejs"],
+        "express": ["express.js", "expressjs"],
+        "django": ["django"],
+        "flask": ["flask"],
+        "fastapi": ["fastapi"],
+        "spring": ["spring boot", "springboot", "spring framework"],
+        ".net": [".net", "dotnet", "asp.net"],
+        "rails": ["rails", "ruby on rails"],
+        "tailwind": ["tailwind", "tailwindcss"],
+        "graphql": ["graphql"],
+        "rest api": ["restful", "rest api", "rest apis"],
+        "grpc": ["grpc"],
+    },
+    "data": {
+        "postgresql": ["postgresql", "postgres"],
+        "mysql": ["mysql"],
+        "mongodb": ["mongodb", "mongo"],
+        "redis": ["redis"],
+        "elasticsearch": ["elasticsearch", "elastic search", "opensearch"],
+        "cassandra": ["cassandra"],
+        "dynamodb": ["dynamodb"],
+        "sqlite": ["sqlite"],
+        "kafka": ["kafka"],
+        "rabbitmq": ["rabbitmq"],
+        "spark": ["spark", "pyspark", "apache spark"],
+        "hadoop": ["hadoop"],
+        "airflow": ["airflow"],
+        "dbt": ["dbt"],
+        "snowflake": ["snowflake"],
+        "bigquery": ["bigquery"],
+        "etl": ["etl", "elt", "data pipelines", "data pipeline"],
+        "data warehousing": ["data warehouse", "data warehousing"],
+        "pandas": ["pandas"],
+        "numpy": ["numpy"],
+        "tableau": ["tableau"],
+        "power bi": ["power bi", "powerbi"],
+        "excel": ["microsoft excel", "ms excel", "spreadsheets"],
+    },
+    "ml": {
+        "machine learning": ["machine learning", "ml"],
+        "deep learning": ["deep learning"],
+        "nlp": ["nlp", "natural language processing"],
+        "computer vision": ["computer vision"],
+        "llm": ["llm", "llms", "large language models", "generative ai", "genai"],
+        "pytorch": ["pytorch", "torch"],
+        "tensorflow": ["tensorflow", "keras"],
+        "scikit-learn": ["scikit-learn", "sklearn", "scikit learn"],
+        "statistics": ["statistics", "statistical"],
+        "mlops": ["mlops"],
+    },
+    "cloud": {
+        "aws": ["aws", "amazon web services", "ec2", "s3", "lambda"],
+        "gcp": ["gcp", "google cloud"],
+        "azure": ["azure"],
+        "docker": ["docker", "containers", "containerization"],
+        "kubernetes": ["kubernetes", "k8s", "eks", "gke", "aks"],
+        "terraform": ["terraform"],
+        "ansible": ["ansible"],
+        "ci/cd": ["ci/cd", "cicd", "continuous integration", "continuous delivery", "continuous deployment"],
+        "jenkins": ["jenkins"],
+        "github actions": ["github actions"],
+        "linux": ["linux", "unix"],
+        "microservices": ["microservices", "microservice", "micro-services"],
+        "serverless": ["serverless"],
+        "monitoring": ["prometheus", "grafana", "datadog", "observability"],
+    },
+    "practices": {
+        "git": ["git", "github", "gitlab", "bitbucket"],
+        "agile": ["agile", "scrum", "kanban"],
+        "testing": ["unit testing", "integration testing", "test automation", "tdd", "pytest", "jest", "selenium", "cypress"],
+        "system design": ["system design", "distributed systems", "scalability"],
+        "security": ["security", "oauth", "authentication", "owasp"],
+        "data structures": ["data structures", "algorithms"],
+        "object-oriented design": ["oop", "object-oriented", "object oriented"],
+        "api design": ["api design", "openapi", "swagger"],
+        "figma": ["figma"],
+        "jira": ["jira"],
+    },
+    "soft": {
+        "communication": ["communication", "communicator"],
+        "leadership": ["leadership", "mentoring", "mentored", "led a team"],
+        "collaboration": ["collaboration", "cross-functional", "stakeholders"],
+        "problem solving": ["problem solving", "problem-solving"],
+        "project management": ["project management", "roadmap"],
+    },
+}
+
+# Job-ad words that carry no signal about fit
+GENERIC_TERMS = {
+    "looking", "candidate", "candidates", "opportunity", "responsibilities", "requirements",
+    "qualifications", "preferred", "plus", "bonus", "benefits", "salary", "apply", "position",
+    "join", "help", "like", "based", "across", "within", "year", "knowledge",
+    "understanding", "excellent", "good", "great", "related", "field", "environment",
+    "ideal", "successful", "please", "offer", "equal", "employer", "hiring", "location",
+    "remote", "hybrid", "full", "time", "day", "make", "get", "best", "need",
+    "needs", "required", "requirement", "nice", "have", "skill", "skills", "able",
+    "etc", "e.g", "i.e", "using", "used", "use", "build", "building", "develop",
+    "developing", "support", "ensure", "provide", "including", "part", "key", "high",
+    "level", "world", "people", "customers", "products", "product", "business",
+}
+
+RESUME_SECTIONS = {
+    "experience": (r"(work |professional )?experience|employment( history)?|work history", "high"),
+    "education": (r"education|academic (background|qualifications)", "high"),
+    "skills": (r"(technical |core |key )?skills|technologies|tech stack|competencies", "medium"),
+}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"(\+?\d[\d\s().-]{8,}\d)")
+LINK_RE = re.compile(r"linkedin\.com/|github\.com/", re.I)
+YEAR_RE = re.compile(r"\b(19[89]\d|20\d{2})\b")
+BULLET_RE = re.compile(r"^\s*([-*•·▪●◦‣]|\d+[.)])\s+")
+TABLE_RE = re.compile(r"\|.*\||\t\S.*\t|\S {4,}\S.* {4,}\S")
+GRAPHIC_CHARS_RE = re.compile(r"[★☆✓✔✗✘☐☑■□◆◇►▶➤→⇒❖❯]")
+TOKEN_RE = re.compile(r"[a-z][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+
+SEVERITY_PENALTY = {"high": 15, "medium": 8, "low": 3}
+MAX_KEYWORDS = 30
+BM25_K1 = 1.2
+
+
+def _stem(word: str) -> str:
+    """Very light suffix stripping so "deploying" matches "deployed" """
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.rstrip(".") for t in TOKEN_RE.findall((text or "").lower())]
+
+
+class ATSScorer:
+    """Score a resume against a job description without calling an LLM"""
+
+    def __init__(self):
+        # alias -> canonical skill, longest aliases first so "spring boot" wins over "spring"
+        self._skill_category: Dict[str, str] = {}
+        aliases: List[Tuple[str, str]] = []
+        for category, skills in SKILL_TAXONOMY.items():
+            for canonical, names in skills.items():
+                self._skill_category[canonical] = category
+                aliases.extend((name, canonical) for name in names)
+        aliases.sort(key=lambda pair: len(pair[0]), reverse=True)
+        self._alias_to_skill = dict(aliases)
+        self._alias_re = re.compile(
+            r"(?<![a-z0-9+#])(" + "|".join(re.escape(name) for name, _ in aliases) + r")(?![a-z0-9+#]|\.[a-z])"
+        )
+        self._section_res = {
+            name: (re.compile(rf"^\s*({pattern})\s*:?\s*$", re.I | re.M), severity)
+            for name, (pattern, severity) in RESUME_SECTIONS.items()
+        }
+
+    def extract_skills(self, text: str) -> Counter:
+        """Canonical taxonomy skills mentioned in the text, with counts"""
+        return Counter(self._alias_to_skill[m] for m in self._alias_re.findall((text or "").lower()))
+
+    def score(self, resume_content: str, job_description: str) -> Dict[str, Any]:
+        """
+        Returns the /ats-score payload: ats_score, match_score, keyword_match,
+        ats_issues, summary, plus skills_analysis.
+        """
+        resume_skills = self.extract_skills(resume_content)
+        job_skills = self.extract_skills(job_description)
+        resume_stems = {_stem(t) for t in tokenize(resume_content)}
+
+        weights = self._keyword_weights(resume_content, job_description, job_skills)
+        matched, missing = [], []
+        for keyword, _ in sorted(weights.items(), key=lambda kv: kv[1], reverse=True):
+            present = resume_skills[keyword] > 0 if keyword in job_skills else _stem(keyword) in resume_stems
+            (matched if present else missing).append(keyword)
+
+        total_weight = sum(weights.values()) or 1.0
+        keyword_coverage = sum(weights[k] for k in matched) / total_weight if weights else 0.0
+
+        matched_skills = sorted(s for s in job_skills if resume_skills[s])
+        missing_skills = sorted((s for s in job_skills if not resume_skills[s]), key=lambda s: -job_skills[s])
+        skill_coverage = len(matched_skills) / len(job_skills) if job_skills else keyword_coverage
+
+        issues = self._ats_issues(resume_content, missing_skills)
+        format_score = max(0, 100 - sum(SEVERITY_PENALTY[i["severity"]] for i in issues))
+
+        match_score = round(100 * (0.6 * skill_coverage + 0.4 * keyword_coverage))
+        ats_score = round(0.5 * format_score + 0.5 * 100 * keyword_coverage)
+
+        return {
+            "ats_score": ats_score,
+            "match_score": match_score,
+            "keyword_match": {
+                "matched_keywords": matched,
+                "missing_keywords": missing,
+                "match_percentage": round(100 * keyword_coverage)
+            },
+            "skills_analysis": {
+                "matched_skills": matched_skills,
+                "missing_skills": missing_skills,
+                "additional_skills": sorted(s for s in resume_skills if s not in job_skills)
+            },
+            "ats_issues": issues,
+            "summary": self._summary(ats_score, match_score, matched_skills, missing_skills, issues)
+        }
+
+    def _keyword_weights(self, resume_content: str, job_description: str, job_skills: Counter) -> Dict[str, float]:
+        """
+        BM25-style weight per JD keyword: saturated term frequency in the JD
+        times IDF over resume + JD sections, boosted for taxonomy skills and
+        terms that appear on requirement lines.
+        """
+        documents = [set(tokenize(chunk)) for chunk in split_sections(job_description) + split_sections(resume_content)]
+        n_docs = len(documents) or 1
+
+        def idf(term: str) -> float:
+            df = sum(1 for doc in documents if term in doc)
+            return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        requirement_text = "\n".join(
+            line for line in job_description.splitlines() if REQUIREMENT_CUES.search(line)
+        )
+        requirement_terms = set(tokenize(requirement_text))
+        requirement_skills = self.extract_skills(requirement_text)
+        skill_aliases = set(self._alias_to_skill)
+
+        term_counts = Counter(
+            t for t in tokenize(job_description)
+            if len(t) > 2 and t not in STOPWORDS and t not in GENERIC_TERMS
+            and t not in skill_aliases and not t.isdigit()
+        )
+
+        weights: Dict[str, float] = {}
+        for term, tf in term_counts.items():
+            weight = idf(term) * tf * (BM25_K1 + 1) / (tf + BM25_K1)
+            if term in requirement_terms:
+                weight *= 1.5
+            weights[term] = weight
+
+        for skill, tf in job_skills.items():
+            weight = 2.0 * (1 + math.log(n_docs)) * tf * (BM25_K1 + 1) / (tf + BM25_K1)
+            if requirement_skills[skill]:
+                weight *= 1.5
+            weights[skill] = weight
+
+        top = sorted(weights.items(), key=lambda kv: kv[1], reverse=True)[:MAX_KEYWORDS]
+        return dict(top)
+
+    def _ats_issues(self, resume_content: str, missing_skills: List[str]) -> List[Dict[str, str]]:
+        """Rule-based checks for things ATS parsers commonly trip over"""
+        issues: List[Dict[str, str]] = []
+        text = resume_content or ""
+        lines = [line for line in text.splitlines() if line.strip()]
+        words = len(text.split())
+
+        def add(issue: str, severity: str, fix: str):
+            issues.append({"issue": issue, "severity": severity, "fix": fix})
+
+        if not EMAIL_RE.search(text):
+            add("No email address found", "high", "Add a professional email address in the header")
+        if not PHONE_RE.search(text):
+            add("No phone number found", "medium", "Add a phone number in the header")
+        if not LINK_RE.search(text):
+            add("No LinkedIn or GitHub profile link", "low", "Add your LinkedIn (and GitHub for technical roles) URL")
+
+        for name, (pattern, severity) in self._section_res.items():
+            if not pattern.search(text):
+                add(
+                    f"Missing a clearly labelled '{name.title()}' section",
+                    severity,
+                    f"Add a standard '{name.title()}' heading so the ATS can map your content"
+                )
+
+        table_lines = sum(1 for line in lines if TABLE_RE.search(line))
+        if table_lines >= 3:
+            add(
+                "Table or multi-column layout detected",
+                "medium",
+                "Use a single-column layout; ATS parsers often scramble tables and columns"
+            )
+        if GRAPHIC_CHARS_RE.search(text):
+            add("Decorative symbols or icons in text", "low", "Replace icons and symbols with plain text or standard bullets")
+
+        if not YEAR_RE.search(text):
+            add("No dates found for experience or education", "medium", "Add start/end dates (e.g. Jan 2021 - Present)")
+
+        if words < 250:
+            add("Resume is very short", "medium", "Expand on achievements and responsibilities (aim for 400-800 words)")
+        elif words > 1100:
+            add("Resume is long", "low", "Trim to the most relevant experience (1-2 pages)")
+
+        bullets = sum(1 for line in lines if BULLET_RE.match(line))
+        long_paragraphs = sum(1 for line in lines if len(line.split()) > 60)
+        if lines and bullets == 0 and long_paragraphs:
+            add("Experience written as paragraphs", "low", "Use concise bullet points starting with action verbs")
+
+        if missing_skills:
+            add(
+                f"Missing job keywords: {', '.join(missing_skills[:5])}",
+                "high" if len(missing_skills) > 5 else "medium",
+                "Mention the skills you genuinely have using the job description's wording"
+            )
+        return issues
+
+    def _summary(
+        self,
+        ats_score: int,
+        match_score: int,
+        matched_skills: List[str],
+        missing_skills: List[str],
+        issues: List[Dict[str, str]]
+    ) -> str:
+        fit = "strong" if match_score >= 75 else "moderate" if match_score >= 50 else "weak"
+        parts = [f"ATS score {ats_score}/100 with a {fit} keyword match ({match_score}/100)."]
+        if matched_skills:
+            parts.append(f"Matches {len(matched_skills)} required skills including {', '.join(matched_skills[:3])}.")
+        if missing_skills:
+            parts.append(f"Missing {', '.join(missing_skills[:3])}.")
+        high = sum(1 for i in issues if i["severity"] == "high")
+        if high:
+            parts.append(f"{high} high-severity formatting issue{'s' if high > 1 else ''} to fix.")
+        return " ".join(parts)
+
+
+# Global scorer instance
+ats_scorer = ATSScorer()
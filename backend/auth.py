@@ -8,6 +8,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from config import settings
 from database import get_db
+from usage import usage_recorder
 from models import User
 from schemas import TokenData
 # bit of auth changes
@@ -75,6 +76,7 @@ async def get_current_user(
     user = get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+    usage_recorder.set_user(user.id)
     return user
 
 
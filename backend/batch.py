@@ -0,0 +1,182 @@
+"""
+Batch generation engine for LanditAI
+- Bounded-concurrency generation across many jobs
+- Results yielded as each job finishes (for NDJSON/SSE streaming)
+- Final summary with per-job latency and token usage
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, List, AsyncIterator
+from services_enhanced import quick_generator, cover_letter_service
+from streaming import ndjson_line, sse_event
+
+
+class BatchGenerationEngine:
+    """Run email/cover letter generation for many jobs in parallel"""
+
+    async def _process_job(
+        self,
+        index: int,
+        job: Dict[str, Any],
+        resume_content: str,
+        generate_type: str,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """Generate the requested artifacts for a single job"""
+        started = time.perf_counter()
+        job_result: Dict[str, Any] = {
+            "index": index,
+            "company_name": job.get("company_name", ""),
+            "job_title": job.get("job_title", ""),
+            "success": True
+        }
+
+        jobs = {}
+        if generate_type in ["email", "both"]:
+            jobs["email"] = quick_generator.generate_quick_email(
+                resume_content=resume_content,
+                job_description=job.get("job_description", ""),
+                company_name=job.get("company_name", ""),
+                job_title=job.get("job_title", ""),
+                tone="professional",
+                length="medium",
+                regenerate=regenerate
+            )
+
+        if generate_type in ["cover_letter", "both"]:
+            jobs["cover_letter"] = cover_letter_service.generate_cover_letter(
+                resume_content=resume_content,
+                job_description=job.get("job_description", ""),
+                company_name=job.get("company_name", ""),
+                job_title=job.get("job_title", ""),
+                regenerate=regenerate
+            )
+
+        # One failed artifact shouldn't discard the others for this job
+        tokens_used = 0
+        errors = {}
+        outputs = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        for name, output in zip(jobs.keys(), outputs):
+            if isinstance(output, BaseException):
+                errors[name] = str(output) or output.__class__.__name__
+                continue
+            job_result[name] = output
+            tokens_used += int(output.get("tokens_used", 0))
+
+        if errors:
+            job_result["success"] = False
+            job_result["errors"] = errors
+            job_result["error"] = "; ".join(f"{name}: {message}" for name, message in errors.items())
+
+        job_result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        job_result["tokens_used"] = tokens_used
+        return job_result
+
+    async def run(
+        self,
+        resume_content: str,
+        jobs: List[Dict[str, Any]],
+        generate_type: str = "email",
+        concurrency: int = 4,
+        regenerate: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield job results in completion order"""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def worker(index: int, job: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._process_job(index, job, resume_content, generate_type, regenerate)
+
+        tasks = [asyncio.create_task(worker(i, job)) for i, job in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away or iteration stopped early - stop pending work
+            for task in tasks:
+                task.cancel()
+            # Let cancelled generations unwind before the stream goes away
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def summarize(
+        self,
+        results: List[Dict[str, Any]],
+        total_jobs: int,
+        elapsed_ms: float
+    ) -> Dict[str, Any]:
+        """Build the batch summary from finished job results"""
+        ordered = sorted(results, key=lambda r: r["index"])
+        latencies = [r["latency_ms"] for r in ordered]
+        return {
+            "total_jobs": total_jobs,
+            "processed": len(ordered),
+            "succeeded": sum(1 for r in ordered if r["success"]),
+            "failed": sum(1 for r in ordered if not r["success"]),
+            "total_tokens": sum(r["tokens_used"] for r in ordered),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "avg_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            "max_latency_ms": max(latencies) if latencies else 0,
+            "jobs": [
+                {
+                    "index": r["index"],
+                    "company_name": r["company_name"],
+                    "job_title": r["job_title"],
+                    "success": r["success"],
+                    "failed_artifacts": list(r.get("errors", {})),
+                    "latency_ms": r["latency_ms"],
+                    "tokens_used": r["tokens_used"]
+                }
+                for r in ordered
+            ]
+        }
+
+    async def collect(
+        self,
+        resume_content: str,
+        jobs: List[Dict[str, Any]],
+        generate_type: str,
+        concurrency: int,
+        total_jobs: int,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """Run the whole batch and return results in request order"""
+        started = time.perf_counter()
+        results = [r async for r in self.run(resume_content, jobs, generate_type, concurrency, regenerate)]
+        summary = self.summarize(results, total_jobs, (time.perf_counter() - started) * 1000)
+        return {
+            "total_jobs": total_jobs,
+            "processed": len(results),
+            "results": sorted(results, key=lambda r: r["index"]),
+            "summary": summary
+        }
+
+    async def stream(
+        self,
+        resume_content: str,
+        jobs: List[Dict[str, Any]],
+        generate_type: str,
+        concurrency: int,
+        total_jobs: int,
+        fmt: str = "ndjson",
+        regenerate: bool = False
+    ) -> AsyncIterator[str]:
+        """Stream each job result as it finishes, then the summary"""
+        started = time.perf_counter()
+        results = []
+        async for result in self.run(resume_content, jobs, generate_type, concurrency, regenerate):
+            results.append(result)
+            if fmt == "sse":
+                yield sse_event("result", result)
+            else:
+                yield ndjson_line({"type": "result", **result})
+
+        summary = self.summarize(results, total_jobs, (time.perf_counter() - started) * 1000)
+        if fmt == "sse":
+            yield sse_event("summary", summary)
+        else:
+            yield ndjson_line({"type": "summary", **summary})
+
+
+# Global engine instance
+batch_engine = BatchGenerationEngine()
@@ -0,0 +1,355 @@
+"""
+Local OpenAI/Groq-compatible stub for load testing without spending tokens
+- Serves /openai/v1/chat/completions (Groq SDK) and /v1/chat/completions (OpenAI SDK)
+- Configurable time to first token, token rate, error rate and 429 injection
+- Canned output shaped per task so the backend's validators accept it
+- Simulated provider prompt cache: repeated prompt prefixes are reported
+  as usage.prompt_tokens_details.cached_tokens
+- /jobs/{id} serves a job posting page for the scrape endpoint
+
+Run from backend/:
+    python -m bench.stub_llm --port 8900 --latency 0.3 --token-rate 400
+Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:8900 and
+OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+import uvicorn
+
+
+# Runtime-adjustable behaviour (POST /stub/config)
+config: Dict[str, float] = {
+    "latency": 0.2,           # seconds before the first token
+    "jitter": 0.05,           # +/- uniform noise on latency
+    "token_rate": 500.0,      # completion tokens per second (0 = instant)
+    "error_rate": 0.0,        # fraction of requests answered with a 500
+    "rate_limit_rate": 0.0,   # fraction of requests answered with a 429
+    "retry_after": 1.0        # retry-after seconds sent with injected 429s
+}
+
+stats: Dict[str, int] = {
+    "requests": 0,
+    "streamed": 0,
+    "errors_injected": 0,
+    "rate_limits_injected": 0,
+    "prompt_tokens": 0,
+    "cached_prompt_tokens": 0,
+    "completion_tokens": 0
+}
+
+# Prompt prefixes are cached in blocks of this many characters (~128 tokens)
+PREFIX_BLOCK = 512
+MAX_CACHED_PREFIXES = 20000
+_prefix_cache: "OrderedDict[int, None]" = OrderedDict()
+
+SENTENCE = (
+    "I have shipped production Python services with FastAPI and PostgreSQL, "
+    "cut p95 latency by 40% through caching and query tuning, and mentored "
+    "two engineers while owning the on-call rotation. "
+)
+
+app = FastAPI(title="LLM stub")
+
+
+def count_tokens(text: str) -> int:
+    """Rough tokenizer: ~4 characters per token"""
+    return max(1, len(text) // 4)
+
+
+def cached_prefix_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Tokens of the longest block-aligned prompt prefix seen before; remembers this prompt's blocks"""
+    text = "\n".join(f"{m.get('role')}: {m.get('content') or ''}" for m in messages)
+    cached = 0
+    for end in range(PREFIX_BLOCK, len(text) + 1, PREFIX_BLOCK):
+        key = hash(text[:end])
+        if key in _prefix_cache and cached == end - PREFIX_BLOCK:
+            cached = end
+            _prefix_cache.move_to_end(key)
+        else:
+            _prefix_cache[key] = None
+    while len(_prefix_cache) > MAX_CACHED_PREFIXES:
+        _prefix_cache.popitem(last=False)
+    return count_tokens(text[:cached]) if cached else 0
+
+
+def _analysis() -> Dict[str, Any]:
+    return {
+        "ats_score": 78,
+        "match_score": 72,
+        "keyword_match": {
+            "matched_keywords": ["python", "fastapi", "postgresql"],
+            "missing_keywords": ["kubernetes"],
+            "match_percentage": 75
+        },
+        "skills_analysis": {
+            "matched_skills": ["python", "sql"],
+            "missing_skills": ["kubernetes"],
+            "transferable_skills": ["mentoring"]
+        },
+        "experience_relevance": {"score": 70, "relevant_experiences": ["backend services"], "gaps": ["cloud"]},
+        "ats_issues": [{"issue": "No summary section", "severity": "low", "fix": "Add a two-line summary"}],
+        "improvement_suggestions": [{"priority": "medium", "category": "skills", "suggestion": "Mention Kubernetes exposure"}],
+        "summary": "Strong backend match with a gap in container orchestration.",
+        "strengths": ["API design", "performance work"],
+        "weaknesses": ["limited cloud experience"]
+    }
+
+
+def _email() -> str:
+    return "Subject: Backend Engineer application - Python and FastAPI experience\n\nHi there,\n\n" + SENTENCE * 4 + "\n\nBest regards,\nAlex"
+
+
+def _cover_letter() -> str:
+    return "Dear Hiring Manager,\n\n" + "\n\n".join([SENTENCE * 3] * 3) + "\n\nSincerely,\nAlex"
+
+
+def _latex() -> str:
+    body = "\n".join(f"\\item {SENTENCE.strip()}" for _ in range(12))
+    return (
+        "\\documentclass[11pt]{article}\n\\usepackage[margin=0.8in]{geometry}\n"
+        "\\begin{document}\n\\section*{Experience}\n\\begin{itemize}\n"
+        f"{body}\n\\end{{itemize}}\n\\end{{document}}"
+    )
+
+
+def _profile() -> Dict[str, Any]:
+    return {
+        "name": "Alex Doe",
+        "summary": "Backend engineer focused on Python APIs.",
+        "skills": ["Python", "FastAPI", "PostgreSQL", "Redis", "Docker"],
+        "work_experience": [{
+            "title": "Backend Engineer",
+            "company": "Acme",
+            "duration": "2021-2024",
+            "highlights": ["Cut p95 latency by 40%", "Owned on-call"],
+            "tech_stack": ["Python", "PostgreSQL"]
+        }],
+        "projects": [{"title": "Job tracker", "description": "FastAPI app", "tech_stack": ["FastAPI"]}],
+        "education": [{"degree": "B.Tech", "institution": "State University", "year": "2021"}],
+        "certifications": []
+    }
+
+
+def _interview_prep() -> Dict[str, Any]:
+    return {
+        "questions": [
+            {
+                "category": category,
+                "question": f"Tell me about a {category} challenge you handled.",
+                "why_asked": "Checks depth of experience",
+                "suggested_answer": SENTENCE.strip(),
+                "resume_connection": "Latency work at Acme"
+            }
+            for category in ("behavioral", "technical", "situational", "company-specific")
+        ],
+        "company_research_tips": ["Read the engineering blog"],
+        "questions_to_ask_interviewer": ["How is on-call organised?"],
+        "red_flags_to_avoid": ["Blaming former teammates"],
+        "salary_negotiation_tips": ["Anchor on market data"]
+    }
+
+
+def _bundle() -> Dict[str, Any]:
+    email = _email()
+    subject, _, body = email.partition("\n\n")
+    return {
+        "email": {"subject": subject.replace("Subject:", "").strip(), "body": body},
+        "cover_letter": _cover_letter(),
+        "analysis": _analysis()
+    }
+
+
+def canned_content(messages: List[Dict[str, Any]], json_mode: bool) -> str:
+    """Pick an output shape from the system prompt, like the real model would"""
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system").lower()
+    if "extract structured data" in system:
+        return json.dumps(_profile())
+    if "interview" in system:
+        return json.dumps(_interview_prep())
+    if "single valid json" in system:
+        return json.dumps(_bundle())
+    if json_mode or "json" in system:
+        return json.dumps(_analysis())
+    if "latex" in system:
+        return _latex()
+    if "cover letter" in system:
+        return _cover_letter()
+    return _email()
+
+
+def _injected_error():
+    """Roll the configured error and 429 rates; returns a response or None"""
+    roll = random.random()
+    if roll < config["rate_limit_rate"]:
+        stats["rate_limits_injected"] += 1
+        retry_after = config["retry_after"]
+        return JSONResponse(
+            status_code=429,
+            headers={
+                "retry-after": f"{retry_after:g}",
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-reset-requests": f"{retry_after:g}s"
+            },
+            content={"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    if roll < config["rate_limit_rate"] + config["error_rate"]:
+        stats["errors_injected"] += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Internal server error (stub)", "type": "internal_server_error"}}
+        )
+    return None
+
+
+def _first_token_delay() -> float:
+    return max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"]))
+
+
+def _usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    error = _injected_error()
+    if error is not None:
+        await asyncio.sleep(_first_token_delay())
+        return error
+
+    messages = body.get("messages") or []
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = canned_content(messages, json_mode)
+    prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+    cached_tokens = min(prompt_tokens, cached_prefix_tokens(messages))
+    completion_tokens = count_tokens(content)
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_prompt_tokens"] += cached_tokens
+    stats["completion_tokens"] += completion_tokens
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "stub")
+    created = int(time.time())
+    token_rate = config["token_rate"]
+
+    if not body.get("stream"):
+        generation_time = completion_tokens / token_rate if token_rate > 0 else 0.0
+        await asyncio.sleep(_first_token_delay() + generation_time)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": _usage(prompt_tokens, completion_tokens, cached_tokens)
+        }
+
+    stats["streamed"] += 1
+
+    def chunk(payload: Dict[str, Any]) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            **payload
+        }) + "\n\n"
+
+    async def events():
+        await asyncio.sleep(_first_token_delay())
+        # ~4 chars per token; flush at most every 10ms to keep timer overhead sane
+        tokens_per_flush = max(1, int(token_rate * 0.01)) if token_rate > 0 else len(content)
+        step = tokens_per_flush * 4
+        for start in range(0, len(content), step):
+            piece = content[start:start + step]
+            yield chunk({"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            if token_rate > 0:
+                await asyncio.sleep(count_tokens(piece) / token_rate)
+        usage = _usage(prompt_tokens, completion_tokens, cached_tokens)
+        # OpenAI reports usage on a choice-less final chunk, Groq under x_groq
+        yield chunk({"choices": [], "usage": usage, "x_groq": {"id": completion_id, "usage": usage}})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/jobs/{job_id}", response_class=HTMLResponse)
+async def job_posting(job_id: str):
+    """A generic job page for /api/enhanced/scrape-job"""
+    return f"""<html><head><meta property="og:site_name" content="Acme Corp"></head>
+<body><h1>Senior Backend Engineer {job_id}</h1>
+<main><p>We are hiring a backend engineer to build Python APIs with FastAPI, PostgreSQL and Redis.</p>
+<ul><li>5+ years of Python</li><li>Experience with Docker and Kubernetes</li><li>Strong SQL and caching skills</li></ul></main>
+</body></html>"""
+
+
+@app.get("/stub/config")
+async def get_config():
+    return config
+
+
+@app.post("/stub/config")
+async def update_config(request: Request):
+    """Change behaviour mid-run, e.g. {"error_rate": 0.2}"""
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in config:
+            config[key] = float(value)
+    return config
+
+
+@app.get("/stub/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stub/reset")
+async def reset_stats():
+    _prefix_cache.clear()
+    for key in stats:
+        stats[key] = 0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI/Groq-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=config["latency"], help="Seconds to first token")
+    parser.add_argument("--jitter", type=float, default=config["jitter"], help="+/- seconds of latency noise")
+    parser.add_argument("--token-rate", type=float, default=config["token_rate"], help="Completion tokens/sec (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="Fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=config["rate_limit_rate"], help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=config["retry_after"], help="retry-after on injected 429s")
+    args = parser.parse_args()
+
+    config.update({
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "token_rate": args.token_rate,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "retry_after": args.retry_after
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Local Upstash-compatible REST stand-in backed by a real Redis
+- POST /              one command as a JSON array body, e.g. ["SET", "k", "v", "EX", "60"]
+- POST /pipeline      JSON array of commands -> [{"result": ...} | {"error": ...}, ...]
+- POST /multi-exec    same, run atomically in MULTI/EXEC
+- GET|POST /cmd/arg/… path-style commands; a POST body is appended as the last
+  argument, then query parameters (?EX=60)
+- Bearer-token auth, optional per-request latency to mimic the network hop
+- /stub/stats counts requests and commands per route
+
+Run from backend/:
+    python -m bench.upstash_stub --port 8079 --redis-url redis://127.0.0.1:6379/0
+Point the backend at it with UPSTASH_REDIS_REST_URL=http://127.0.0.1:8079 and
+UPSTASH_REDIS_REST_TOKEN=local-token
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Any, List
+from urllib.parse import unquote
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import redis.asyncio as aioredis
+import uvicorn
+
+
+config: Dict[str, Any] = {
+    "redis_url": "redis://127.0.0.1:6379/0",
+    "token": "local-token",
+    "latency": 0.0  # seconds added to every request
+}
+
+stats: Dict[str, int] = {
+    "requests": 0,
+    "commands": 0,
+    "pipelines": 0,
+    "transactions": 0,
+    "path_commands": 0,
+    "errors": 0
+}
+
+app = FastAPI(title="Upstash stub")
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = aioredis.from_url(config["redis_url"], decode_responses=True)
+        # Reply with raw RESP values ("OK", 1, lists) the way Upstash does
+        _client.response_callbacks.clear()
+    return _client
+
+
+def _error(message: str, status_code: int = 400) -> JSONResponse:
+    stats["errors"] += 1
+    return JSONResponse(status_code=status_code, content={"error": message})
+
+
+def _is_command(body: Any) -> bool:
+    return isinstance(body, list) and bool(body) and all(isinstance(arg, (str, int, float)) for arg in body)
+
+
+async def _admit(request: Request):
+    """Check the bearer token and apply the simulated latency; returns an error response or None"""
+    stats["requests"] += 1
+    if request.headers.get("authorization") != f"Bearer {config['token']}":
+        return _error("Unauthorized", 401)
+    if config["latency"]:
+        await asyncio.sleep(config["latency"])
+    return None
+
+
+async def _run(args: List[Any]) -> JSONResponse:
+    stats["commands"] += 1
+    try:
+        return JSONResponse({"result": await get_client().execute_command(*args)})
+    except aioredis.ResponseError as e:
+        return _error(str(e))
+    except aioredis.RedisError as e:
+        return _error(str(e), 500)
+
+
+@app.get("/stub/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stub/reset")
+async def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    return stats
+
+
+@app.post("/")
+async def command(request: Request):
+    denied = await _admit(request)
+    if denied:
+        return denied
+    body = await request.json()
+    if not _is_command(body):
+        return _error("Expected a JSON array command")
+    return await _run(body)
+
+
+@app.post("/pipeline")
+async def pipeline(request: Request):
+    return await _batch(request, transaction=False)
+
+
+@app.post("/multi-exec")
+async def multi_exec(request: Request):
+    return await _batch(request, transaction=True)
+
+
+async def _batch(request: Request, transaction: bool):
+    denied = await _admit(request)
+    if denied:
+        return denied
+    body = await request.json()
+    if not isinstance(body, list) or not body or not all(_is_command(command) for command in body):
+        return _error("Expected a JSON array of commands")
+    stats["transactions" if transaction else "pipelines"] += 1
+    stats["commands"] += len(body)
+
+    async with get_client().pipeline(transaction=transaction) as pipe:
+        for command in body:
+            pipe.execute_command(*command)
+        try:
+            replies = await pipe.execute(raise_on_error=False)
+        except aioredis.ResponseError as e:
+            # The transaction was discarded (e.g. a command failed to queue)
+            return _error(str(e))
+        except aioredis.RedisError as e:
+            return _error(str(e), 500)
+    return [{"error": str(reply)} if isinstance(reply, Exception) else {"result": reply} for reply in replies]
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST"])
+async def path_command(path: str, request: Request):
+    denied = await _admit(request)
+    if denied:
+        return denied
+    args = [unquote(part) for part in path.split("/") if part]
+    body = await request.body()
+    if body:
+        args.append(body.decode("utf-8"))
+    # Options such as ?EX=60 follow the arguments
+    for name, value in request.query_params.multi_items():
+        args.extend([name, value] if value else [name])
+    if not args:
+        return _error("Missing command")
+    stats["path_commands"] += 1
+    return await _run(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstash-compatible REST stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8079)
+    parser.add_argument("--redis-url", default=config["redis_url"], help="Redis the stub forwards commands to")
+    parser.add_argument("--token", default=config["token"], help="Expected bearer token")
+    parser.add_argument("--latency", type=float, default=config["latency"], help="Seconds added to every request")
+    args = parser.parse_args()
+
+    config.update({"redis_url": args.redis_url, "token": args.token, "latency": args.latency})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
+import time
+import threading
+import uuid
+import weakref
+import httpx
 import requests
-from typing import Optional, Any
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Tuple
 from datetime import datetime
 from config import settings
+from serialization import cache_serializer
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -14,6 +24,108 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+class LocalLRUCache:
+    """Bounded in-process cache with per-entry TTL (thread-safe)"""
+    
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get value if present and not expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, expire: int = 3600):
+        """Set value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + expire, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _redis_pool(module):
+    """
+    Connection pool for the redis or redis.asyncio client. Blocking: when all
+    REDIS_MAX_CONNECTIONS are busy callers wait (up to the socket timeout) for
+    one to be returned instead of failing with "Too many connections".
+    """
+    options = {
+        "decode_responses": True,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT
+    }
+    if settings.REDIS_URL:
+        return module.BlockingConnectionPool.from_url(settings.REDIS_URL, **options)
+    return module.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
+        **options
+    )
+
+
+def _batch_results(items: List[Any]) -> List[Any]:
+    """
+    Normalise pipeline replies: Upstash sends {"result"} / {"error"} objects,
+    redis-py values or exception instances. Failed commands become None.
+    """
+    results = []
+    for item in items:
+        if isinstance(item, dict) and ("result" in item or "error" in item):
+            if "error" in item:
+                print(f"Redis pipeline command error: {item['error']}")
+            results.append(item.get("result"))
+        elif isinstance(item, Exception):
+            print(f"Redis pipeline command error: {item}")
+            results.append(None)
+        else:
+            results.append(item)
+    return results
+
+
+def _set_commands(items: Dict[str, Any], expire: int) -> List[List[Any]]:
+    return [["SET", key, cache_serializer.dumps(key, value), "EX", expire] for key, value in items.items()]
+
+
+# Per-user cache namespaces: user keys embed the user's namespace version, so
+# one INCR makes all of them unreachable (they then expire on their own TTL).
+# The counter outlives any cached entry; if it lapses the old entries are gone too.
+NAMESPACE_TTL = 7 * 86400
+
+
+def namespace_key(user_id: int) -> str:
+    return f"user:{user_id}:ns"
+
+
+def _bump_commands(user_id: int) -> List[List[Any]]:
+    key = namespace_key(user_id)
+    return [["INCR", key], ["EXPIRE", key, NAMESPACE_TTL]]
+
+
 class RedisCache:
     def __init__(self):
         # Check if Upstash REST API is configured
@@ -22,40 +134,30 @@ class RedisCache:
             self.upstash_url = settings.UPSTASH_REDIS_REST_URL.rstrip('/')
             self.upstash_token = settings.UPSTASH_REDIS_REST_TOKEN
             self.redis_client = None
-        # Check if REDIS_URL is provided (for standard Redis with URL)
-        elif settings.REDIS_URL:
-            self.use_upstash_rest = False
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL,
-                decode_responses=True
-            )
-        # Fallback to host/port configuration
+            # One keep-alive session instead of a new TLS connection per call
+            self.session = requests.Session()
+            self.session.headers["Authorization"] = f"Bearer {self.upstash_token}"
+            adapter = HTTPAdapter(pool_maxsize=settings.REDIS_MAX_CONNECTIONS)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.timeout = (settings.REDIS_CONNECT_TIMEOUT, settings.REDIS_SOCKET_TIMEOUT)
+        # Standard Redis: REDIS_URL if provided, else host/port configuration
         else:
             self.use_upstash_rest = False
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-                decode_responses=True
-            )
+            self.redis_client = redis.Redis(connection_pool=_redis_pool(redis))
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         try:
             if self.use_upstash_rest:
-                response = requests.get(
-                    f"{self.upstash_url}/get/{key}",
-                    headers={"Authorization": f"Bearer {self.upstash_token}"}
-                )
-                if response.status_code == 200:
-                    result = response.json().get('result')
-                    if result:
-                        return json.loads(result)
+                result = self._upstash_command("GET", key)
+                if result:
+                    return cache_serializer.loads(key, result)
                 return None
             else:
                 value = self.redis_client.get(key)
                 if value:
-                    return json.loads(value)
+                    return cache_serializer.loads(key, value)
                 return None
         except Exception as e:
             print(f"Redis get error: {e}")
@@ -65,16 +167,14 @@ class RedisCache:
         """Set value in cache with expiration (default 1 hour)"""
         try:
             if self.use_upstash_rest:
-                response = requests.post(
-                    f"{self.upstash_url}/set/{key}/{json.dumps(value, cls=DateTimeEncoder)}/EX/{expire}",
-                    headers={"Authorization": f"Bearer {self.upstash_token}"}
-                )
-                return response.status_code == 200
+                # Value goes in the request body - large lists would overflow a URL path
+                self._upstash_command("SET", key, cache_serializer.dumps(key, value), "EX", expire)
+                return True
             else:
                 self.redis_client.setex(
                     key,
                     expire,
-                    json.dumps(value, cls=DateTimeEncoder)
+                    cache_serializer.dumps(key, value)
                 )
                 return True
         except Exception as e:
@@ -85,11 +185,8 @@ class RedisCache:
         """Delete key from cache"""
         try:
             if self.use_upstash_rest:
-                response = requests.post(
-                    f"{self.upstash_url}/del/{key}",
-                    headers={"Authorization": f"Bearer {self.upstash_token}"}
-                )
-                return response.status_code == 200
+                self._upstash_command("DEL", key)
+                return True
             else:
                 self.redis_client.delete(key)
                 return True
@@ -101,37 +198,707 @@ class RedisCache:
         """Check if key exists"""
         try:
             if self.use_upstash_rest:
-                response = requests.get(
-                    f"{self.upstash_url}/exists/{key}",
-                    headers={"Authorization": f"Bearer {self.upstash_token}"}
-                )
-                if response.status_code == 200:
-                    return response.json().get('result', 0) > 0
-                return False
+                return int(self._upstash_command("EXISTS", key) or 0) > 0
             else:
                 return self.redis_client.exists(key) > 0
         except Exception as e:
             print(f"Redis exists error: {e}")
             return False
     
-    def clear_user_cache(self, user_id: int):
-        """Clear all cache entries for a user"""
+    # Compare-and-delete so a lock is only released by the worker that holds it
+    RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+    
+    def _upstash_command(self, *args) -> Any:
+        """Run one command via the Upstash REST API (JSON body, values stay out of the URL)"""
+        response = self.session.post(
+            self.upstash_url,
+            timeout=self.timeout,
+            json=[str(arg) for arg in args]
+        )
+        response.raise_for_status()
+        return response.json().get('result')
+    
+    def _upstash_batch(self, commands: List[List[Any]], transaction: bool) -> List[Any]:
+        """Send several commands in one request via /pipeline or /multi-exec"""
+        response = self.session.post(
+            f"{self.upstash_url}/{'multi-exec' if transaction else 'pipeline'}",
+            timeout=self.timeout,
+            json=[[str(arg) for arg in command] for command in commands]
+        )
+        response.raise_for_status()
+        return _batch_results(response.json())
+    
+    def pipeline(self, commands: List[List[Any]], transaction: bool = False) -> Optional[List[Any]]:
+        """
+        Run several raw commands in one round trip (atomically with
+        transaction=True). Returns one result per command, None for a command
+        that failed, or None overall if Redis is unreachable.
+        """
+        if not commands:
+            return []
         try:
             if self.use_upstash_rest:
-                # Upstash REST API doesn't support KEYS command well
-                # For production, consider maintaining a set of keys per user
-                print(f"Warning: clear_user_cache not fully supported with Upstash REST API")
-                return True
+                return self._upstash_batch(commands, transaction)
+            pipe = self.redis_client.pipeline(transaction=transaction)
+            for command in commands:
+                pipe.execute_command(*command)
+            return _batch_results(pipe.execute(raise_on_error=False))
+        except Exception as e:
+            print(f"Redis pipeline error: {e}")
+            return None
+    
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values in one round trip (None for missing keys)"""
+        if not keys:
+            return []
+        try:
+            if self.use_upstash_rest:
+                values = self._upstash_command("MGET", *keys)
             else:
-                pattern = f"user:{user_id}:*"
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
-                return True
+                values = self.redis_client.mget(keys)
+            return [cache_serializer.loads(key, value) if value else None for key, value in zip(keys, values)]
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+    
+    def set_many(self, items: Dict[str, Any], expire: int = 3600) -> bool:
+        """Set several values with the same expiration in one round trip (cache warming)"""
+        results = self.pipeline(_set_commands(items, expire))
+        return results is not None and all(result is not None for result in results)
+    
+    def delete_many(self, keys: List[str]) -> bool:
+        """Delete several keys in one command"""
+        if not keys:
+            return True
+        try:
+            if self.use_upstash_rest:
+                self._upstash_command("DEL", *keys)
+            else:
+                self.redis_client.delete(*keys)
+            return True
+        except Exception as e:
+            print(f"Redis delete error: {e}")
+            return False
+    
+    def acquire_lock(self, key: str, owner: str, ttl: int) -> Optional[bool]:
+        """
+        SET key owner NX EX ttl. Returns True if acquired, False if held
+        elsewhere, None if Redis is unreachable.
+        """
+        try:
+            if self.use_upstash_rest:
+                return self._upstash_command("SET", key, owner, "NX", "EX", ttl) == "OK"
+            return bool(self.redis_client.set(key, owner, nx=True, ex=ttl))
+        except Exception as e:
+            print(f"Redis lock error: {e}")
+            return None
+    
+    def release_lock(self, key: str, owner: str) -> bool:
+        """Release a lock if this owner still holds it"""
+        try:
+            if self.use_upstash_rest:
+                self._upstash_command("EVAL", self.RELEASE_LOCK_SCRIPT, 1, key, owner)
+            else:
+                self.redis_client.eval(self.RELEASE_LOCK_SCRIPT, 1, key, owner)
+            return True
+        except Exception as e:
+            print(f"Redis unlock error: {e}")
+            return False
+    
+    def publish(self, channel: str, value: Any) -> bool:
+        """Publish a JSON message on a channel"""
+        try:
+            message = json.dumps(value, cls=DateTimeEncoder)
+            if self.use_upstash_rest:
+                self._upstash_command("PUBLISH", channel, message)
+            else:
+                self.redis_client.publish(channel, message)
+            return True
+        except Exception as e:
+            print(f"Redis publish error: {e}")
+            return False
+    
+    def subscribe(self, channel: str):
+        """
+        Subscribe to a channel and return the PubSub handle, or None when
+        subscriptions are unavailable (Upstash REST, Redis down)
+        """
+        if self.use_upstash_rest:
+            return None
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel)
+            return pubsub
+        except Exception as e:
+            print(f"Redis subscribe error: {e}")
+            return None
+    
+    def next_message(self, pubsub, timeout: float) -> Optional[Any]:
+        """Block up to timeout for the next JSON message on a subscription"""
+        if pubsub is None:
+            time.sleep(timeout)
+            return None
+        try:
+            message = pubsub.get_message(timeout=timeout)
+            if message and message.get('type') == 'message':
+                return json.loads(message['data'])
+            return None
+        except Exception as e:
+            print(f"Redis subscribe error: {e}")
+            time.sleep(timeout)
+            return None
+    
+    # Pop the first member due by ARGV[1] and re-score it to ARGV[2] (a lease)
+    CLAIM_DUE_SCRIPT = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #due == 0 then
+    return false
+end
+redis.call('zadd', KEYS[1], ARGV[2], due[1])
+return due[1]
+"""
+    
+    # Overwrite KEYS[1] only if it still holds exactly ARGV[1] (optimistic update)
+    COMPARE_AND_SET_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+    
+    def get_versioned(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """Value plus its raw stored form, to pass to compare_and_set"""
+        try:
+            if self.use_upstash_rest:
+                raw = self._upstash_command("GET", key)
+            else:
+                raw = self.redis_client.get(key)
+            return (cache_serializer.loads(key, raw), raw) if raw else (None, None)
+        except Exception as e:
+            print(f"Redis get error: {e}")
+            return None, None
+    
+    def compare_and_set(self, key: str, expected: str, value: Any, expire: int = 3600) -> Optional[bool]:
+        """
+        Store value only if the key still holds expected (from get_versioned).
+        True if written, False if it changed meanwhile, None if Redis is unreachable.
+        """
+        try:
+            data = cache_serializer.dumps(key, value)
+            if self.use_upstash_rest:
+                return bool(int(self._upstash_command("EVAL", self.COMPARE_AND_SET_SCRIPT, 1, key, expected, data, expire)))
+            return bool(self.redis_client.eval(self.COMPARE_AND_SET_SCRIPT, 1, key, expected, data, expire))
+        except Exception as e:
+            print(f"Redis compare-and-set error: {e}")
+            return None
+    
+    def schedule(self, key: str, member: str, score: float) -> bool:
+        """Add or move a member of a sorted set (ZADD)"""
+        try:
+            if self.use_upstash_rest:
+                self._upstash_command("ZADD", key, score, member)
+            else:
+                self.redis_client.zadd(key, {member: score})
+            return True
+        except Exception as e:
+            print(f"Redis schedule error: {e}")
+            return False
+    
+    def unschedule(self, key: str, member: str) -> bool:
+        """Remove a member from a sorted set; True if it was there"""
+        try:
+            if self.use_upstash_rest:
+                return bool(self._upstash_command("ZREM", key, member))
+            return bool(self.redis_client.zrem(key, member))
+        except Exception as e:
+            print(f"Redis unschedule error: {e}")
+            return False
+    
+    def claim_due(self, key: str, now: float, lease_until: float) -> Optional[str]:
+        """Atomically take the earliest member scored <= now, re-scoring it to lease_until"""
+        try:
+            if self.use_upstash_rest:
+                return self._upstash_command("EVAL", self.CLAIM_DUE_SCRIPT, 1, key, now, lease_until)
+            return self.redis_client.eval(self.CLAIM_DUE_SCRIPT, 1, key, now, lease_until)
+        except Exception as e:
+            print(f"Redis claim error: {e}")
+            return None
+    
+    def schedule_size(self, key: str) -> int:
+        """Number of members in a sorted set (ZCARD)"""
+        try:
+            if self.use_upstash_rest:
+                return int(self._upstash_command("ZCARD", key) or 0)
+            return int(self.redis_client.zcard(key))
+        except Exception as e:
+            print(f"Redis zcard error: {e}")
+            return 0
+    
+    def user_namespace(self, user_id: int) -> Optional[int]:
+        """A user's current cache namespace version (0 if never bumped), None if Redis is unreachable"""
+        try:
+            if self.use_upstash_rest:
+                return int(self._upstash_command("GET", namespace_key(user_id)) or 0)
+            return int(self.redis_client.get(namespace_key(user_id)) or 0)
+        except Exception as e:
+            print(f"Redis namespace error: {e}")
+            return None
+    
+    def clear_user_cache(self, user_id: int) -> Optional[int]:
+        """
+        Invalidate every cache entry for a user with a single INCR of their
+        namespace version. Returns the new version, None on failure.
+        """
+        results = self.pipeline(_bump_commands(user_id), transaction=True)
+        if not results or results[0] is None:
+            return None
+        return int(results[0])
+
+
+
+class AsyncRedisCache:
+    """
+    Non-blocking counterpart of RedisCache for async code: redis.asyncio on a
+    shared connection pool, or a pooled httpx client for the Upstash REST API.
+    Same methods and failure behaviour (errors are logged, never raised).
+    """
+    
+    RELEASE_LOCK_SCRIPT = RedisCache.RELEASE_LOCK_SCRIPT
+    CLAIM_DUE_SCRIPT = RedisCache.CLAIM_DUE_SCRIPT
+    COMPARE_AND_SET_SCRIPT = RedisCache.COMPARE_AND_SET_SCRIPT
+    
+    def __init__(self):
+        self.use_upstash_rest = bool(settings.UPSTASH_REDIS_REST_URL and settings.UPSTASH_REDIS_REST_TOKEN)
+        self.upstash_url = settings.UPSTASH_REDIS_REST_URL.rstrip('/')
+        self.upstash_token = settings.UPSTASH_REDIS_REST_TOKEN
+        # One client per event loop: pools cannot cross loops, and a loop in
+        # another thread keeps using its own client
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+    
+    def _get_client(self):
+        """Lazily build the running loop's client"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # A closed loop's transports can't be closed through asyncio any
+            # more; drop its client and leave the sockets to their finalizers
+            for stale in [owner for owner in self._clients if owner.is_closed()]:
+                del self._clients[stale]
+            if self.use_upstash_rest:
+                client = httpx.AsyncClient(
+                    headers={"Authorization": f"Bearer {self.upstash_token}"},
+                    timeout=httpx.Timeout(settings.REDIS_SOCKET_TIMEOUT, connect=settings.REDIS_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=settings.REDIS_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.REDIS_MAX_CONNECTIONS
+                    )
+                )
+            else:
+                client = aioredis.Redis(connection_pool=_redis_pool(aioredis))
+            self._clients[loop] = client
+        return client
+    
+    async def _close_client(self, client):
+        try:
+            await client.aclose()
+            if not self.use_upstash_rest:
+                await client.connection_pool.disconnect()
+        except Exception as e:
+            print(f"Redis close error: {e}")
+    
+    async def _upstash_command(self, *args) -> Any:
+        """Run one command via the Upstash REST API (JSON body)"""
+        response = await self._get_client().post(self.upstash_url, json=[str(arg) for arg in args])
+        response.raise_for_status()
+        return response.json().get('result')
+    
+    async def _command(self, *args) -> Any:
+        """Run one raw Redis command on whichever backend is configured"""
+        if self.use_upstash_rest:
+            return await self._upstash_command(*args)
+        return await self._get_client().execute_command(*args)
+    
+    async def _upstash_batch(self, commands: List[List[Any]], transaction: bool) -> List[Any]:
+        """Send several commands in one request via /pipeline or /multi-exec"""
+        response = await self._get_client().post(
+            f"{self.upstash_url}/{'multi-exec' if transaction else 'pipeline'}",
+            json=[[str(arg) for arg in command] for command in commands]
+        )
+        response.raise_for_status()
+        return _batch_results(response.json())
+    
+    async def pipeline(self, commands: List[List[Any]], transaction: bool = False) -> Optional[List[Any]]:
+        """Run several raw commands in one round trip, as RedisCache.pipeline"""
+        if not commands:
+            return []
+        try:
+            if self.use_upstash_rest:
+                return await self._upstash_batch(commands, transaction)
+            async with self._get_client().pipeline(transaction=transaction) as pipe:
+                for command in commands:
+                    pipe.execute_command(*command)
+                return _batch_results(await pipe.execute(raise_on_error=False))
+        except Exception as e:
+            print(f"Redis pipeline error: {e}")
+            return None
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values in one round trip (None for missing keys)"""
+        if not keys:
+            return []
+        try:
+            values = await self._command("MGET", *keys)
+            return [cache_serializer.loads(key, value) if value else None for key, value in zip(keys, values)]
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+    
+    async def set_many(self, items: Dict[str, Any], expire: int = 3600) -> bool:
+        """Set several values with the same expiration in one round trip (cache warming)"""
+        results = await self.pipeline(_set_commands(items, expire))
+        return results is not None and all(result is not None for result in results)
+    
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete several keys in one command"""
+        if not keys:
+            return True
+        try:
+            await self._command("DEL", *keys)
+            return True
+        except Exception as e:
+            print(f"Redis delete error: {e}")
+            return False
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache"""
+        try:
+            value = await self._command("GET", key)
+            if value:
+                return cache_serializer.loads(key, value)
+            return None
+        except Exception as e:
+            print(f"Redis get error: {e}")
+            return None
+    
+    async def set(self, key: str, value: Any, expire: int = 3600) -> bool:
+        """Set value in cache with expiration (default 1 hour)"""
+        try:
+            await self._command("SET", key, cache_serializer.dumps(key, value), "EX", expire)
+            return True
+        except Exception as e:
+            print(f"Redis set error: {e}")
+            return False
+    
+    async def delete(self, key: str) -> bool:
+        """Delete key from cache"""
+        try:
+            await self._command("DEL", key)
+            return True
         except Exception as e:
-            print(f"Redis clear user cache error: {e}")
+            print(f"Redis delete error: {e}")
             return False
+    
+    async def exists(self, key: str) -> bool:
+        """Check if key exists"""
+        try:
+            return int(await self._command("EXISTS", key) or 0) > 0
+        except Exception as e:
+            print(f"Redis exists error: {e}")
+            return False
+    
+    async def acquire_lock(self, key: str, owner: str, ttl: int) -> Optional[bool]:
+        """
+        SET key owner NX EX ttl. Returns True if acquired, False if held
+        elsewhere, None if Redis is unreachable.
+        """
+        try:
+            return await self._command("SET", key, owner, "NX", "EX", ttl) in ("OK", True)
+        except Exception as e:
+            print(f"Redis lock error: {e}")
+            return None
+    
+    async def release_lock(self, key: str, owner: str) -> bool:
+        """Release a lock if this owner still holds it"""
+        try:
+            await self._command("EVAL", self.RELEASE_LOCK_SCRIPT, 1, key, owner)
+            return True
+        except Exception as e:
+            print(f"Redis unlock error: {e}")
+            return False
+    
+    async def publish(self, channel: str, value: Any) -> bool:
+        """Publish a JSON message on a channel"""
+        try:
+            await self._command("PUBLISH", channel, json.dumps(value, cls=DateTimeEncoder))
+            return True
+        except Exception as e:
+            print(f"Redis publish error: {e}")
+            return False
+    
+    async def subscribe(self, channel: str):
+        """
+        Subscribe to a channel and return the PubSub handle, or None when
+        subscriptions are unavailable (Upstash REST, Redis down)
+        """
+        if self.use_upstash_rest:
+            return None
+        try:
+            pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(channel)
+            return pubsub
+        except Exception as e:
+            print(f"Redis subscribe error: {e}")
+            return None
+    
+    async def next_message(self, pubsub, timeout: float) -> Optional[Any]:
+        """Wait up to timeout for the next JSON message on a subscription"""
+        if pubsub is None:
+            await asyncio.sleep(timeout)
+            return None
+        try:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+            if message and message.get('type') == 'message':
+                return json.loads(message['data'])
+            return None
+        except Exception as e:
+            print(f"Redis subscribe error: {e}")
+            await asyncio.sleep(timeout)
+            return None
+    
+    async def unsubscribe(self, pubsub):
+        """Close a subscription and return its connection to the pool"""
+        if pubsub is None:
+            return
+        try:
+            await pubsub.aclose()
+        except Exception as e:
+            print(f"Redis unsubscribe error: {e}")
+    
+    async def schedule(self, key: str, member: str, score: float) -> bool:
+        """Add or move a member of a sorted set (ZADD)"""
+        try:
+            await self._command("ZADD", key, score, member)
+            return True
+        except Exception as e:
+            print(f"Redis schedule error: {e}")
+            return False
+    
+    async def unschedule(self, key: str, member: str) -> bool:
+        """Remove a member from a sorted set; True if it was there"""
+        try:
+            return bool(await self._command("ZREM", key, member))
+        except Exception as e:
+            print(f"Redis unschedule error: {e}")
+            return False
+    
+    async def claim_due(self, key: str, now: float, lease_until: float) -> Optional[str]:
+        """Atomically take the earliest member scored <= now, re-scoring it to lease_until"""
+        try:
+            return await self._command("EVAL", self.CLAIM_DUE_SCRIPT, 1, key, now, lease_until)
+        except Exception as e:
+            print(f"Redis claim error: {e}")
+            return None
+    
+    async def get_versioned(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """Value plus its raw stored form, to pass to compare_and_set"""
+        try:
+            raw = await self._command("GET", key)
+            return (cache_serializer.loads(key, raw), raw) if raw else (None, None)
+        except Exception as e:
+            print(f"Redis get error: {e}")
+            return None, None
+    
+    async def compare_and_set(self, key: str, expected: str, value: Any, expire: int = 3600) -> Optional[bool]:
+        """
+        Store value only if the key still holds expected (from get_versioned).
+        True if written, False if it changed meanwhile, None if Redis is unreachable.
+        """
+        try:
+            data = cache_serializer.dumps(key, value)
+            return bool(int(await self._command("EVAL", self.COMPARE_AND_SET_SCRIPT, 1, key, expected, data, expire)))
+        except Exception as e:
+            print(f"Redis compare-and-set error: {e}")
+            return None
+    
+    async def schedule_size(self, key: str) -> int:
+        """Number of members in a sorted set (ZCARD)"""
+        try:
+            return int(await self._command("ZCARD", key) or 0)
+        except Exception as e:
+            print(f"Redis zcard error: {e}")
+            return 0
+    
+    async def user_namespace(self, user_id: int) -> Optional[int]:
+        """A user's current cache namespace version (0 if never bumped), None if Redis is unreachable"""
+        try:
+            return int(await self._command("GET", namespace_key(user_id)) or 0)
+        except Exception as e:
+            print(f"Redis namespace error: {e}")
+            return None
+    
+    async def clear_user_cache(self, user_id: int) -> Optional[int]:
+        """Invalidate every cache entry for a user (one INCR); returns the new version"""
+        results = await self.pipeline(_bump_commands(user_id), transaction=True)
+        if not results or results[0] is None:
+            return None
+        return int(results[0])
+    
+    async def close(self):
+        """Close pooled connections (call on shutdown)"""
+        loop = asyncio.get_running_loop()
+        clients, self._clients = dict(self._clients), weakref.WeakKeyDictionary()
+        for owner, client in clients.items():
+            if owner is loop:
+                await self._close_client(client)
+            elif owner.is_running():
+                # Still serving another thread - close it there
+                asyncio.run_coroutine_threadsafe(self._close_client(client), owner)
+
+
+
+class TieredCache:
+    """
+    Process-local LRU (L1) in front of Redis (L2) for hot per-user reads.
+    Keys built with user_key() carry the user's namespace version, which L1
+    also caches. clear_user_cache bumps the version in Redis (one INCR) and
+    broadcasts it over pub/sub so every worker switches to the new namespace
+    at once. L1 entries live at most CACHE_L1_TTL seconds, which bounds
+    staleness when pub/sub is unavailable (Upstash REST) or a message is missed.
+    """
+    
+    CHANNEL = "cache:invalidate"
+    
+    def __init__(self, backend: RedisCache, async_backend: AsyncRedisCache):
+        self.backend = backend
+        self.async_backend = async_backend
+        self.local = LocalLRUCache(max_size=settings.CACHE_L1_SIZE)
+        self.instance_id = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0
+        }
+    
+    def user_key(self, user_id: int, suffix: str) -> str:
+        """Cache key inside the user's current namespace"""
+        return f"user:{user_id}:v{self._namespace(user_id)}:{suffix}"
+    
+    def get(self, key: str) -> Optional[Any]:
+        """L1, then Redis (promoting hits into L1)"""
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        
+        value = self.backend.get(key)
+        if value is not None:
+            self.stats["l2_hits"] += 1
+            self.local.set(key, value, expire=settings.CACHE_L1_TTL)
+            return value
+        
+        self.stats["misses"] += 1
+        return None
+    
+    def set(self, key: str, value: Any, expire: int = 3600) -> bool:
+        """Store in both tiers"""
+        self.local.set(key, value, expire=min(expire, settings.CACHE_L1_TTL))
+        return self.backend.set(key, value, expire)
+    
+    def clear_user_cache(self, user_id: int) -> Optional[int]:
+        """Move a user to a new namespace here, in Redis and in every other worker"""
+        version = self.backend.clear_user_cache(user_id)
+        self._set_namespace(user_id, version)
+        if self.backend.publish(self.CHANNEL, self._invalidation(user_id, version)):
+            self.stats["invalidations_sent"] += 1
+        return version
+    
+    async def aclear_user_cache(self, user_id: int) -> Optional[int]:
+        """clear_user_cache for async routes"""
+        version = await self.async_backend.clear_user_cache(user_id)
+        self._set_namespace(user_id, version)
+        if await self.async_backend.publish(self.CHANNEL, self._invalidation(user_id, version)):
+            self.stats["invalidations_sent"] += 1
+        return version
+    
+    def start(self):
+        """Start the pub/sub invalidation listener thread (no-op without pub/sub)"""
+        if self._listener is not None or self.backend.use_upstash_rest:
+            return
+        self._stopping.clear()
+        self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._listener.start()
+    
+    def stop(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            self._stopping.set()
+            listener.join(timeout=2)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
+        l1_misses = lookups - self.stats["l1_hits"]
+        return {
+            **self.stats,
+            "l1_size": len(self.local),
+            "l1_hit_ratio": round(self.stats["l1_hits"] / lookups, 3) if lookups else 0.0,
+            "l2_hit_ratio": round(self.stats["l2_hits"] / l1_misses, 3) if l1_misses else 0.0,
+            "hit_ratio": round((lookups - self.stats["misses"]) / lookups, 3) if lookups else 0.0,
+            "invalidation_listener": self._listener is not None
+        }
+    
+    def _namespace(self, user_id: int) -> int:
+        key = namespace_key(user_id)
+        version = self.local.get(key)
+        if version is None:
+            version = self.backend.user_namespace(user_id)
+            if version is None:
+                # Redis is down, so nothing can be read or written there anyway
+                return 0
+            self.local.set(key, version, expire=settings.CACHE_L1_TTL)
+        return version
+    
+    def _set_namespace(self, user_id: int, version: Optional[int]):
+        """Adopt a bumped version; never go back to an older one"""
+        key = namespace_key(user_id)
+        if version is None:
+            # Unknown outcome - re-read from Redis next time
+            self.local.delete(key)
+            return
+        current = self.local.get(key)
+        self.local.set(key, max(version, current or 0), expire=settings.CACHE_L1_TTL)
+    
+    def _invalidation(self, user_id: int, version: Optional[int]) -> Dict[str, Any]:
+        return {"user_id": user_id, "version": version, "origin": self.instance_id}
+    
+    def _listen(self):
+        pubsub = None
+        while not self._stopping.is_set():
+            if pubsub is None:
+                pubsub = self.backend.subscribe(self.CHANNEL)
+                if pubsub is None:
+                    # Redis unreachable - L1 TTLs bound staleness until we resubscribe
+                    self._stopping.wait(1.0)
+                    continue
+            message = self.backend.next_message(pubsub, 1.0)
+            if not isinstance(message, dict) or message.get("origin") == self.instance_id:
+                continue
+            self._set_namespace(message["user_id"], message.get("version"))
+            self.stats["invalidations_received"] += 1
+        if pubsub is not None:
+            pubsub.close()
 
 
-# Global cache instance
+# Global cache instances (sync for sync routes, async for coroutines)
 cache = RedisCache()
+async_cache = AsyncRedisCache()
+tiered_cache = TieredCache(cache, async_cache)
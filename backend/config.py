@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, List, Optional, Dict
 import json
 
 
@@ -12,6 +12,18 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = ""
+    REDIS_MAX_CONNECTIONS: int = 50  # Connection pool size per client (sync, async, Upstash HTTP)
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # Seconds per command / Upstash request
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    
+    # In-process L1 in front of Redis for per-user list reads
+    CACHE_L1_SIZE: int = 2048  # Entries per worker
+    CACHE_L1_TTL: int = 30  # Seconds; bounds staleness if an invalidation message is missed
+    
+    # Cache value encoding (readers accept every format, so these can change at any time)
+    CACHE_SERIALIZER: str = "orjson"  # orjson or msgpack; stdlib json when the library is missing
+    CACHE_COMPRESSION: str = "zstd"  # zstd, zlib or none; zlib when zstandard is missing
+    CACHE_COMPRESS_MIN_BYTES: int = 1024  # Smaller values are stored uncompressed
     
     # Upstash Redis REST API (alternative to standard Redis)
     UPSTASH_REDIS_REST_URL: str = ""
@@ -25,6 +37,71 @@ class Settings(BaseSettings):
     # AI API Keys
     GROQ_API_KEY: str = ""
     OPENAI_API_KEY: str = ""
+    GROQ_BASE_URL: str = ""  # Override to point at a stub/proxy
+    OPENAI_BASE_URL: str = ""
+    
+    # LLM Gateway (shared pooled client)
+    LLM_MAX_CONCURRENCY: int = 16  # Max in-flight completions per worker
+    LLM_TIMEOUT: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_KEEPALIVE: int = 16
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_RETRY_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    LLM_RETRY_DEADLINE: float = 20.0  # Seconds a call may spend retrying before giving up
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before failing fast
+    LLM_BREAKER_RESET_TIMEOUT: float = 30.0
+    LLM_STRUCTURED_OUTPUTS: bool = False  # Send JSON schemas as response_format (model must support json_schema); else JSON object mode
+    
+    # Model routing (tier per task, small falls back to large on invalid output)
+    MODEL_SMALL: str = "llama-3.1-8b-instant"
+    MODEL_LARGE: str = "llama-3.3-70b-versatile"
+    MODEL_ROUTES: str = ""  # Per-task tier overrides, e.g. "email=small,ats_score=large"
+    
+    # Hedged requests to the secondary provider (needs OPENAI_API_KEY)
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_DELAY: float = 0.0  # Seconds before hedging; 0 = adaptive per-task p95
+    LLM_HEDGE_MIN_DELAY: float = 1.0
+    LLM_HEDGE_MAX_DELAY: float = 8.0
+    SECONDARY_MODEL_SMALL: str = "gpt-4o-mini"
+    SECONDARY_MODEL_LARGE: str = "gpt-4o"
+    
+    # Coalescing of identical in-flight generations across workers
+    SINGLEFLIGHT_ENABLED: bool = True
+    SINGLEFLIGHT_LOCK_TTL: int = 120  # Seconds; must exceed the slowest generation
+    SINGLEFLIGHT_WAIT_TIMEOUT: float = 90.0
+    SINGLEFLIGHT_POLL_INTERVAL: float = 0.5
+    SINGLEFLIGHT_RESULT_TTL: int = 30  # Seconds a leader's result stays readable for late waiters
+    
+    # Batch generation
+    BATCH_MAX_JOBS: int = 100
+    BATCH_CONCURRENCY: int = 4  # Default parallel jobs per batch
+    BATCH_MAX_CONCURRENCY: int = 10
+    
+    # Background generation jobs (submit now, poll or stream the result later)
+    JOB_QUEUE_BACKEND: str = "redis"  # "redis" (shared by every API process) or "memory" (single process, tests)
+    JOB_WORKERS: int = 2  # Worker tasks per API process; 0 = accept jobs only (run `python job_queue.py` elsewhere)
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 2.0  # Seconds before the first retry, doubled per attempt
+    JOB_TIMEOUT: float = 300.0  # Seconds one attempt may run
+    JOB_LEASE: int = 60  # Seconds before a job whose worker vanished is claimed again (renewed while running)
+    JOB_RESULT_TTL: int = 3600  # Seconds job records and results are kept
+    JOB_POLL_INTERVAL: float = 0.5  # Queue poll, cancellation check and status stream interval
+    
+    # Usage accounting (buffered in process, bulk-inserted by a background flusher)
+    USAGE_FLUSH_INTERVAL: float = 2.0  # Seconds between flushes
+    USAGE_FLUSH_BATCH: int = 500  # Rows per insert; a full batch triggers an early flush
+    USAGE_BUFFER_MAX: int = 20000  # Events kept while the DB is unreachable; oldest dropped beyond this
+    USAGE_RETRY_MAX_DELAY: float = 30.0  # Flush backoff ceiling while the DB is failing
+    
+    # Generation cache (LLM responses keyed by prompt hash)
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_L1_SIZE: int = 512
+    GENERATION_CACHE_TTLS: str = ""  # Per-service overrides, e.g. "analysis=604800,email=3600"
+    
+    # Prompt token budgets (resume + job description), e.g. "cover_letter=1200,latex=1500"
+    PROMPT_TOKEN_BUDGETS: str = ""
     
     # App Settings
     ENVIRONMENT: str = "development"
@@ -37,6 +114,30 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(',')]
         return self.ALLOWED_ORIGINS
     
+    @property
+    def generation_cache_ttls(self) -> Dict[str, int]:
+        """Parse GENERATION_CACHE_TTLS ("task=seconds,...") into a dict"""
+        return self._parse_task_values(self.GENERATION_CACHE_TTLS)
+    
+    @property
+    def prompt_token_budgets(self) -> Dict[str, int]:
+        """Parse PROMPT_TOKEN_BUDGETS ("task=tokens,...") into a dict"""
+        return self._parse_task_values(self.PROMPT_TOKEN_BUDGETS)
+    
+    @property
+    def model_routes(self) -> Dict[str, str]:
+        """Parse MODEL_ROUTES ("task=tier,...") into a dict"""
+        return self._parse_task_values(self.MODEL_ROUTES, cast=lambda v: v.strip().lower())
+    
+    @staticmethod
+    def _parse_task_values(raw: str, cast=int) -> Dict[str, Any]:
+        values = {}
+        for item in raw.split(','):
+            if '=' in item:
+                task, value = item.split('=', 1)
+                values[task.strip()] = cast(value)
+        return values
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,94 @@
+"""
+Content-addressed cache for LLM generations
+- Key: hash of model, system prompt, rendered user prompt and sampling params
+- In-process LRU tier in front of Redis
+- Per-service TTLs (overridable via GENERATION_CACHE_TTLS)
+"""
+
+import hashlib
+import json
+from typing import Dict, Any, Optional
+from cache import async_cache, LocalLRUCache
+from config import settings
+
+
+# Default TTLs in seconds per generation task
+DEFAULT_TTLS = {
+    "email": 86400,
+    "quick_email": 86400,
+    "cover_letter": 86400,
+    "analysis": 7 * 86400,
+    "ats_score": 7 * 86400,
+    "interview_prep": 7 * 86400,
+    "latex": 7 * 86400,
+    "bundle": 86400,
+    "resume_profile": 30 * 86400,
+    "default": 3600
+}
+
+
+class GenerationCache:
+    """Two-tier (process LRU + Redis) cache for completion results"""
+
+    def __init__(self):
+        self.local = LocalLRUCache(max_size=settings.GENERATION_CACHE_L1_SIZE)
+        self.ttls = {**DEFAULT_TTLS, **settings.generation_cache_ttls}
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GENERATION_CACHE_ENABLED
+
+    def ttl_for(self, task: str) -> int:
+        return self.ttls.get(task, self.ttls["default"])
+
+    def make_key(
+        self,
+        task: str,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        params: Dict[str, Any]
+    ) -> str:
+        """Build a stable cache key from everything that shapes the output"""
+        material = json.dumps(
+            {
+                "model": model,
+                "system": system_prompt,
+                "prompt": user_prompt,
+                "params": params
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        return f"gen:{task}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached generation, promoting Redis hits into the LRU"""
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+
+        value = await async_cache.get(key)
+        if value is not None:
+            self.stats["l2_hits"] += 1
+            self.local.set(key, value, expire=self._ttl_from_key(key))
+            return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Store a generation in both tiers"""
+        ttl = self._ttl_from_key(key)
+        self.local.set(key, value, expire=ttl)
+        await async_cache.set(key, value, ttl)
+
+    def _ttl_from_key(self, key: str) -> int:
+        return self.ttl_for(key.split(":")[1])
+
+
+# Global generation cache instance
+generation_cache = GenerationCache()
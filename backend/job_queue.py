@@ -0,0 +1,451 @@
+"""
+Background generation jobs for long-running requests
+- Submitting returns a job ID at once; a pool of async workers runs the generation
+- Redis backend (sorted set of job IDs scored by when they may run, plus one
+  JSON record per job) shared by every API process; in-memory backend for
+  tests and single-process development
+- Claims are leases: a job whose worker died is picked up again once its
+  lease runs out (running workers keep renewing it)
+- Status changes are compare-and-set, so a cancel racing a finishing worker
+  (or a worker that lost its lease) can't overwrite the other's outcome
+- Retries with exponential backoff, honouring a provider's retry-after
+- Cancellation of queued and running jobs; records and results expire after JOB_RESULT_TTL
+
+Run standalone workers (e.g. with JOB_WORKERS=0 on the API) with:
+    python job_queue.py
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Callable, Awaitable
+from cache import async_cache, LocalLRUCache, DateTimeEncoder
+from config import settings
+from resilience import LLMUnavailableError
+from usage import usage_recorder
+from services_enhanced import (
+    latex_resume_service,
+    cover_letter_service,
+    resume_analyzer,
+    interview_prep_service,
+    quick_generator
+)
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+# Job kind -> service coroutine called with the submitted params
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Dict[str, Any]]]] = {
+    "latex_resume": latex_resume_service.generate_latex_resume,
+    "interview_prep": interview_prep_service.generate_interview_questions,
+    "quick_generate": quick_generator.quick_generate_all,
+    "cover_letter": cover_letter_service.generate_cover_letter,
+    "analysis": resume_analyzer.analyze_resume
+}
+
+# Failures that a retry cannot fix (bad parameters, missing API key)
+PERMANENT_ERRORS = (ValueError, TypeError)
+
+
+class JobQueueUnavailableError(Exception):
+    """The job store could not be written"""
+
+
+# Compare-and-set attempts before an update gives up on a contended record
+UPDATE_ATTEMPTS = 5
+
+
+class MemoryJobBackend:
+    """Single-process job store; records expire like their Redis counterparts"""
+
+    def __init__(self, max_jobs: int = 10000):
+        self._records = LocalLRUCache(max_size=max_jobs)
+        self._schedule: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def save(self, record: Dict[str, Any], ttl: int) -> bool:
+        # Stored serialized so callers never share a mutable record
+        self._records.set(record["id"], json.dumps(record, cls=DateTimeEncoder), expire=ttl)
+        return True
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._records.get(job_id)
+        return json.loads(raw) if raw is not None else None
+
+    async def update(
+        self,
+        job_id: str,
+        change: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        ttl: int
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Apply change() to the current record atomically; see RedisJobBackend.update"""
+        async with self._lock:
+            current = await self.load(job_id)
+            if current is None:
+                return None, False
+            updated = change(dict(current))
+            if updated is None:
+                return current, False
+            await self.save(updated, ttl)
+            return updated, True
+
+    async def schedule(self, job_id: str, ready_at: float) -> bool:
+        self._schedule[job_id] = ready_at
+        return True
+
+    async def unschedule(self, job_id: str) -> bool:
+        return self._schedule.pop(job_id, None) is not None
+
+    async def claim(self, now: float, lease_until: float) -> Optional[str]:
+        due = [(ready_at, job_id) for job_id, ready_at in self._schedule.items() if ready_at <= now]
+        if not due:
+            return None
+        _, job_id = min(due)
+        self._schedule[job_id] = lease_until
+        return job_id
+
+    async def depth(self) -> int:
+        return len(self._schedule)
+
+
+class RedisJobBackend:
+    """Job store shared by every API process (standard Redis or Upstash REST)"""
+
+    QUEUE_KEY = "genjobs:queue"
+
+    def _key(self, job_id: str) -> str:
+        return f"genjob:{job_id}"
+
+    async def save(self, record: Dict[str, Any], ttl: int) -> bool:
+        return await async_cache.set(self._key(record["id"]), record, ttl)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await async_cache.get(self._key(job_id))
+
+    async def update(
+        self,
+        job_id: str,
+        change: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        ttl: int
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Apply change() to the current record with compare-and-set, re-reading
+        and retrying if another process wrote it meanwhile. change() returns
+        the new record, or None to leave it as is. Returns (record, applied).
+        """
+        key = self._key(job_id)
+        current = None
+        for _ in range(UPDATE_ATTEMPTS):
+            current, raw = await async_cache.get_versioned(key)
+            if current is None:
+                return None, False
+            updated = change(dict(current))
+            if updated is None:
+                return current, False
+            written = await async_cache.compare_and_set(key, raw, updated, ttl)
+            if written:
+                return updated, True
+            if written is None:
+                break
+        return current, False
+
+    async def schedule(self, job_id: str, ready_at: float) -> bool:
+        return await async_cache.schedule(self.QUEUE_KEY, job_id, ready_at)
+
+    async def unschedule(self, job_id: str) -> bool:
+        return await async_cache.unschedule(self.QUEUE_KEY, job_id)
+
+    async def claim(self, now: float, lease_until: float) -> Optional[str]:
+        return await async_cache.claim_due(self.QUEUE_KEY, now, lease_until)
+
+    async def depth(self) -> int:
+        return await async_cache.schedule_size(self.QUEUE_KEY)
+
+
+class GenerationJobQueue:
+    """Submit, run, watch and cancel background generations"""
+
+    def __init__(self):
+        self.backend = MemoryJobBackend() if settings.JOB_QUEUE_BACKEND == "memory" else RedisJobBackend()
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "retried": 0, "reclaimed": 0}
+
+    async def submit(self, kind: str, params: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Store and enqueue a job; returns its public record"""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        record = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "user_id": user_id,
+            "params": params,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": settings.JOB_MAX_ATTEMPTS,
+            "result": None,
+            "error": None,
+            "cancel_requested": False,
+            "lease_id": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "next_attempt_at": None
+        }
+        if not await self.backend.save(record, settings.JOB_RESULT_TTL):
+            raise JobQueueUnavailableError("Job queue is unavailable")
+        await self.backend.schedule(record["id"], time.time())
+        self.stats["submitted"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.public(await self.backend.load(record["id"]) or record)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Full job record (including params and owner), or None once expired"""
+        return await self.backend.load(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job (a running worker stops within
+        JOB_POLL_INTERVAL). Finished jobs are returned unchanged.
+        """
+        def change(current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if current["status"] in FINISHED:
+                return None
+            current.update(status=CANCELLED, cancel_requested=True, finished_at=datetime.utcnow())
+            return current
+
+        record, applied = await self.backend.update(job_id, change, settings.JOB_RESULT_TTL)
+        if applied:
+            await self.backend.unschedule(job_id)
+            self.stats["cancelled"] += 1
+        return record
+
+    async def events(self, job_id: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Watch a job: ("status", record) whenever its status or attempt count
+        changes, ending with ("done", record), ("failed", record) or
+        ("cancelled", record)
+        """
+        last = None
+        while True:
+            record = await self.backend.load(job_id)
+            if record is None:
+                raise Exception("Job not found or expired")
+            state = (record["status"], record["attempts"])
+            if state != last:
+                last = state
+                public = self.public(record)
+                if record["status"] == SUCCEEDED:
+                    yield "done", public
+                    return
+                if record["status"] in (FAILED, CANCELLED):
+                    yield record["status"], public
+                    return
+                yield "status", public
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    def public(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """A record as returned to clients (no submitted params or internals)"""
+        hidden = {"params", "user_id", "cancel_requested", "lease_id"}
+        return {key: value for key, value in record.items() if key not in hidden}
+
+    def start(self, workers: Optional[int] = None):
+        """Spawn worker tasks on the running event loop"""
+        count = settings.JOB_WORKERS if workers is None else workers
+        if self._workers or count <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker(index)) for index in range(count)]
+
+    async def stop(self):
+        """Stop workers; jobs they were running are reclaimed once their lease expires"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": settings.JOB_QUEUE_BACKEND,
+            "workers": len(self._workers),
+            "scheduled": await self.backend.depth(),
+            **self.stats
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                now = time.time()
+                job_id = await self.backend.claim(now, now + settings.JOB_LEASE)
+                if job_id is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker {index} error: {e}")
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    async def _run(self, job_id: str):
+        """Run one claimed job to success, retry, failure or cancellation"""
+        record = await self.backend.load(job_id)
+        if record is None or record["status"] in FINISHED:
+            # Expired, cancelled, or finished by a worker that lost its lease
+            await self.backend.unschedule(job_id)
+            return
+        if record["status"] == RUNNING:
+            # The previous worker died mid-run
+            self.stats["reclaimed"] += 1
+            if record["attempts"] >= record["max_attempts"]:
+                await self._finish(job_id, record.get("lease_id"), FAILED, error="Worker stopped while running the job")
+                return
+
+        # Take over the job under a fresh lease id; fails if it was cancelled
+        # or taken over since we read it
+        lease_id = uuid.uuid4().hex
+
+        def start(current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if current["status"] in FINISHED or current.get("cancel_requested"):
+                return None
+            if current.get("lease_id") != record.get("lease_id"):
+                return None
+            current.update(
+                status=RUNNING, attempts=current["attempts"] + 1, lease_id=lease_id,
+                started_at=datetime.utcnow(), next_attempt_at=None
+            )
+            return current
+
+        record, applied = await self.backend.update(job_id, start, settings.JOB_RESULT_TTL)
+        if not applied:
+            if record is None or record["status"] in FINISHED:
+                await self.backend.unschedule(job_id)
+            return
+
+        task = asyncio.ensure_future(asyncio.wait_for(
+            self._call(record["kind"], record["params"], record.get("user_id")), timeout=settings.JOB_TIMEOUT
+        ))
+        lease_renewed = time.time()
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=settings.JOB_POLL_INTERVAL)
+                if task.done():
+                    break
+                current = await self.backend.load(job_id)
+                if current is None or current.get("cancel_requested") or current.get("lease_id") != lease_id:
+                    # Cancelled, expired, or reclaimed by another worker after our lease lapsed
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    if current is None or current.get("cancel_requested"):
+                        await self.backend.unschedule(job_id)
+                    return
+                if time.time() - lease_renewed > settings.JOB_LEASE / 2:
+                    lease_renewed = time.time()
+                    await self.backend.schedule(job_id, lease_renewed + settings.JOB_LEASE)
+        except asyncio.CancelledError:
+            # Worker shutdown: leave the job leased so another worker reclaims it
+            task.cancel()
+            raise
+
+        try:
+            result, error = task.result(), None
+        except asyncio.TimeoutError:
+            result, error = None, TimeoutError(f"Timed out after {settings.JOB_TIMEOUT:g}s")
+        except Exception as e:
+            result, error = None, e
+
+        # Cancellation wins over anything the handler produced (the
+        # compare-and-set in _finish / the retry update enforces it)
+        if error is None:
+            await self._finish(job_id, lease_id, SUCCEEDED, result=result)
+            return
+
+        message = str(error) or error.__class__.__name__
+        if not isinstance(error, PERMANENT_ERRORS) and record["attempts"] < record["max_attempts"]:
+            delay = settings.JOB_RETRY_BACKOFF * (2 ** (record["attempts"] - 1))
+            if isinstance(error, LLMUnavailableError) and error.retry_after:
+                delay = max(delay, error.retry_after)
+            ready_at = time.time() + delay
+
+            def retry(current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                if not self._holds(current, lease_id):
+                    return None
+                current.update(status=QUEUED, error=message, next_attempt_at=datetime.utcfromtimestamp(ready_at))
+                return current
+
+            current, applied = await self.backend.update(job_id, retry, settings.JOB_RESULT_TTL)
+            if applied:
+                await self.backend.schedule(job_id, ready_at)
+                self.stats["retried"] += 1
+            elif current is None or current["status"] in FINISHED:
+                await self.backend.unschedule(job_id)
+            return
+
+        await self._finish(job_id, lease_id, FAILED, error=message)
+
+    async def _call(self, kind: str, params: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        # Bad params raise TypeError here, inside the task, so they fail the job
+        with usage_recorder.track(f"job:{kind}", kind, user_id):
+            return await JOB_HANDLERS[kind](**params)
+
+    def _holds(self, record: Dict[str, Any], lease_id: Optional[str]) -> bool:
+        """The record is still running under this worker's lease and not cancelled"""
+        return (
+            record["status"] == RUNNING
+            and record.get("lease_id") == lease_id
+            and not record.get("cancel_requested")
+        )
+
+    async def _finish(
+        self,
+        job_id: str,
+        lease_id: Optional[str],
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """Record the outcome if this lease still holds the job; False if it was cancelled or taken over"""
+        def change(current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if not self._holds(current, lease_id):
+                return None
+            current.update(status=status, result=result, error=error, finished_at=datetime.utcnow())
+            return current
+
+        current, applied = await self.backend.update(job_id, change, settings.JOB_RESULT_TTL)
+        if applied:
+            await self.backend.unschedule(job_id)
+            self.stats[status] += 1
+        elif current is None or current["status"] in FINISHED:
+            await self.backend.unschedule(job_id)
+        return applied
+
+
+# Global job queue instance
+generation_jobs = GenerationJobQueue()
+
+
+async def _serve():
+    usage_recorder.start()
+    generation_jobs.start(settings.JOB_WORKERS or 1)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await generation_jobs.stop()
+        await usage_recorder.stop()
+        await async_cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_serve())
@@ -0,0 +1,395 @@
+"""
+Shared async LLM gateway for LanditAI
+- Pooled provider clients (keep-alive HTTP connections, see providers.py)
+- Concurrency cap across every generation service
+- Content-addressed response cache (see generation_cache.py)
+- Retries, backoff and circuit breaking (see resilience.py)
+- Task-based model routing (see routing.py)
+- Identical in-flight requests coalesced across workers (see singleflight.py)
+- Hedged requests to a secondary provider when the primary is slow
+- Token usage per prompt template version (see prompts.py)
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Tuple, Awaitable
+from config import settings
+from generation_cache import generation_cache
+from prompts import prompt_registry
+from providers import ChatProvider, HedgePolicy, build_primary, build_secondary
+from resilience import LLMUnavailableError
+from routing import model_router
+from singleflight import single_flight
+from usage import usage_recorder
+
+
+class LLMGateway:
+    """Single async entry point for chat completions"""
+
+    def __init__(self):
+        self.primary = build_primary()
+        self.secondary = build_secondary()
+        self.hedge = HedgePolicy()
+
+    @property
+    def is_configured(self) -> bool:
+        return self.primary.is_configured
+
+    @property
+    def hedging_enabled(self) -> bool:
+        return settings.LLM_HEDGE_ENABLED and self.secondary.is_configured
+
+    def _messages(self, system_prompt: str, user_prompt: str) -> list:
+        return [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ]
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        task: str = "default",
+        use_cache: bool = True,
+        json_mode: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        prompt_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a chat completion and return its content and token usage.
+        Identical requests are served from the generation cache at zero
+        token cost; use_cache=False forces a fresh generation.
+        json_mode asks the provider to constrain output to a JSON object;
+        response_schema ({"name", "schema"}) is sent as a json_schema
+        response format when LLM_STRUCTURED_OUTPUTS is on.
+        prompt_version (see prompts.py) is echoed in the result and counted
+        in the template's token stats.
+        Without an explicit model the task's route picks one; if validate()
+        rejects a small-tier answer the request is retried on the large tier.
+        """
+        models = [model] if model else model_router.candidates(task)
+
+        for index, candidate in enumerate(models):
+            is_last = index == len(models) - 1
+            started = time.perf_counter()
+
+            def keep(result: Dict[str, Any], is_last: bool = is_last) -> bool:
+                # Output we are about to throw away should not be served from cache later
+                return is_last or validate is None or self._is_valid(validate, result["content"])
+
+            result, cache_key = await self._complete_with(
+                candidate, system_prompt, user_prompt, temperature, max_tokens, task, use_cache, json_mode,
+                response_schema, keep, prompt_version
+            )
+            result = {**result, "prompt_version": prompt_version}
+            if prompt_version:
+                prompt_registry.record_generation(prompt_version, result)
+            usage_recorder.add_generation(result)
+            valid = validate is None or self._is_valid(validate, result["content"])
+            model_router.record(
+                task, result.get("model", candidate), (time.perf_counter() - started) * 1000, result,
+                valid=valid, fallback=index > 0
+            )
+            if valid or is_last:
+                return result
+
+    async def _complete_with(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        task: str,
+        use_cache: bool,
+        json_mode: bool,
+        response_schema: Optional[Dict[str, Any]] = None,
+        keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        prompt_version: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        One completion on one model, from cache when possible.
+        A fresh result that keep() accepts is cached before single-flight
+        publishes it and releases the lock, so late waiters find it.
+        """
+        cache_key = self._cache_key(task, model, system_prompt, user_prompt, temperature, max_tokens, json_mode)
+        if cache_key and use_cache:
+            cached = await generation_cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached), cache_key
+
+        # Double-clicks and client retries wait on the first request's generation
+        flight_key = cache_key or generation_cache.make_key(
+            task, model, system_prompt, user_prompt,
+            {"temperature": temperature, "max_tokens": max_tokens, "json_mode": json_mode}
+        )
+        async def cached_result() -> Optional[Dict[str, Any]]:
+            cached = await generation_cache.get(cache_key)
+            return self._from_cache(cached) if cached is not None else None
+
+        lookup = cached_result if cache_key and use_cache else None
+        if lookup is None:
+            # Regenerations only share with other regenerations, never the cache
+            flight_key = f"{flight_key}:fresh"
+
+        async def generate() -> Dict[str, Any]:
+            result = await self._generate(
+                model, system_prompt, user_prompt, temperature, max_tokens, json_mode, task, response_schema
+            )
+            if cache_key and (keep is None or keep(result)):
+                await generation_cache.set(cache_key, {**result, "prompt_version": prompt_version})
+            return result
+
+        result = await single_flight.run(flight_key, generate, lookup)
+        return result, cache_key
+
+    async def _generate(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool,
+        task: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Call the provider(s)"""
+        messages = self._messages(system_prompt, user_prompt)
+        if not self.hedging_enabled:
+            return await self.primary.complete(messages, model, temperature, max_tokens, json_mode, response_schema)
+
+        _, result = await self._race(
+            task,
+            lambda provider: provider.complete(messages, model, temperature, max_tokens, json_mode, response_schema)
+        )
+        return result
+
+    async def _race(
+        self,
+        key: str,
+        start: Callable[[ChatProvider], Awaitable[Any]]
+    ) -> Tuple[ChatProvider, Any]:
+        """
+        Run start(primary). If it hasn't finished within the hedge delay, also
+        run start(secondary) and take whichever succeeds first, cancelling the
+        other. A primary that is rate limited or circuit-open fails over
+        straight away.
+        """
+        self.hedge.stats["requests"] += 1
+        started = time.perf_counter()
+        primary_task = asyncio.ensure_future(start(self.primary))
+        tasks = {primary_task: self.primary}
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.hedge.delay(key))
+            if done:
+                error = primary_task.exception()
+                if error is None:
+                    self.hedge.observe(key, time.perf_counter() - started)
+                    return self.primary, primary_task.result()
+                if not isinstance(error, LLMUnavailableError):
+                    raise error
+                self.hedge.stats["failovers"] += 1
+                try:
+                    return self.secondary, await start(self.secondary)
+                except Exception as e:
+                    print(f"Secondary provider error: {e}")
+                    raise error
+
+            self.hedge.stats["hedged"] += 1
+            tasks[asyncio.ensure_future(start(self.secondary))] = self.secondary
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks[task]
+                    error = task.exception()
+                    if error is None:
+                        # A losing primary took at least this long - keep it as a sample
+                        self.hedge.observe(key, time.perf_counter() - started)
+                        if provider is self.primary:
+                            self.hedge.stats["primary_wins"] += 1
+                        else:
+                            self.hedge.stats["secondary_wins"] += 1
+                        return provider, task.result()
+                    if first_error is None or provider is self.primary:
+                        first_error = error
+            raise first_error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let cancelled requests unwind so their streams can be closed
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    def _is_valid(self, validate: Callable[[str], bool], content: str) -> bool:
+        try:
+            return bool(validate(content))
+        except Exception:
+            return False
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        task: str = "default",
+        use_cache: bool = True,
+        validate: Optional[Callable[[str], bool]] = None,
+        json_mode: bool = False,
+        prompt_version: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat completion.
+        Yields {"type": "delta", "content": ...} for each token chunk, then a
+        final {"type": "done", ...} carrying the same fields as complete().
+        A cache hit is replayed as a single delta. Streams use the task's
+        routed model without validation fallback (tokens are already sent);
+        output failing validate() is returned but not cached. json_mode asks
+        for a JSON object, as in complete().
+        """
+        model = model or model_router.candidates(task)[0]
+        started = time.perf_counter()
+        cache_key = self._cache_key(task, model, system_prompt, user_prompt, temperature, max_tokens, json_mode)
+        if cache_key and use_cache:
+            cached = await generation_cache.get(cache_key)
+            if cached is not None:
+                result = {**self._from_cache(cached), "prompt_version": prompt_version}
+                if prompt_version:
+                    prompt_registry.record_generation(prompt_version, result)
+                usage_recorder.add_generation(result)
+                model_router.record(task, model, (time.perf_counter() - started) * 1000, result)
+                yield {"type": "delta", "content": result["content"]}
+                yield {"type": "done", **result}
+                return
+
+        messages = self._messages(system_prompt, user_prompt)
+        if self.hedging_enabled:
+            events = self._hedged_stream(task, messages, model, temperature, max_tokens, json_mode)
+        else:
+            events = self.primary.stream(messages, model, temperature, max_tokens, json_mode)
+
+        parts = []
+        usage: Dict[str, Any] = {}
+        try:
+            async for event in events:
+                if event["type"] == "delta":
+                    parts.append(event["content"])
+                    yield event
+                else:
+                    usage = event
+        finally:
+            await events.aclose()
+
+        result = {
+            "content": "".join(parts),
+            "model": usage.get("model", model),
+            "provider": usage.get("provider", self.primary.name),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "tokens_used": usage.get("tokens_used", 0),
+            "cached_prompt_tokens": usage.get("cached_prompt_tokens", 0),
+            "cached": False,
+            "prompt_version": prompt_version
+        }
+        if prompt_version:
+            prompt_registry.record_generation(prompt_version, result)
+        usage_recorder.add_generation(result)
+        valid = validate is None or self._is_valid(validate, result["content"])
+        model_router.record(task, result["model"], (time.perf_counter() - started) * 1000, result, valid)
+        if cache_key and valid:
+            await generation_cache.set(cache_key, result)
+        yield {"type": "done", **result}
+
+    async def _hedged_stream(
+        self,
+        task: str,
+        messages: list,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Hedge on time-to-first-token, then keep streaming from the winner"""
+        streams: Dict[str, AsyncIterator[Dict[str, Any]]] = {}
+
+        async def first_event(provider: ChatProvider) -> Dict[str, Any]:
+            stream = provider.stream(messages, model, temperature, max_tokens, json_mode)
+            streams[provider.name] = stream
+            return await stream.__anext__()
+
+        try:
+            winner, first = await self._race(f"{task}:stream", first_event)
+            for name, stream in streams.items():
+                if name != winner.name:
+                    await stream.aclose()
+            yield first
+            async for event in streams[winner.name]:
+                yield event
+        finally:
+            for stream in streams.values():
+                await stream.aclose()
+
+    def _cache_key(
+        self,
+        task: str,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool
+    ) -> Optional[str]:
+        if not generation_cache.enabled:
+            return None
+        params = {"temperature": temperature, "max_tokens": max_tokens}
+        if json_mode:
+            params["json_mode"] = True
+        return generation_cache.make_key(task, model, system_prompt, user_prompt, params)
+
+    def _from_cache(self, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """A cache hit spends no tokens"""
+        return {
+            **cached,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tokens_used": 0,
+            "cached_prompt_tokens": 0,
+            "cached": True
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Provider health, hedging, cache and routing counters for monitoring"""
+        providers = {self.primary.name: self.primary.resilience.snapshot()}
+        if self.secondary.is_configured:
+            providers[self.secondary.name] = self.secondary.resilience.snapshot()
+        return {
+            "providers": providers,
+            "hedging": {"enabled": self.hedging_enabled, **self.hedge.snapshot()},
+            "generation_cache": dict(generation_cache.stats),
+            "single_flight": dict(single_flight.stats),
+            "routing": model_router.stats(),
+            "prompts": prompt_registry.stats()
+        }
+
+    async def close(self):
+        """Release pooled connections"""
+        await self.primary.close()
+        await self.secondary.close()
+
+
+# Global gateway instance
+llm_gateway = LLMGateway()
@@ -3,10 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from database import engine, Base
 from config import settings
+from llm import llm_gateway
+from cache import async_cache, tiered_cache
+from serialization import cache_serializer
+from job_queue import generation_jobs
+from usage import usage_recorder, UsageMiddleware, upgrade_usage_table
+from resilience import LLMUnavailableError
 from routers import auth, resumes, jobs, emails, enhanced
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+upgrade_usage_table(engine)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -24,6 +31,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Usage accounting for every request (buffered, flushed in the background)
+app.add_middleware(UsageMiddleware)
+
 
 # Health check endpoint
 @app.get("/")
@@ -40,6 +50,66 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/llm")
+def llm_health():
+    """Circuit breaker state, retry counters and cache hit counts"""
+    return llm_gateway.stats()
+
+
+@app.get("/health/jobs")
+async def jobs_health():
+    """Background job queue depth and outcome counters"""
+    return await generation_jobs.snapshot()
+
+
+@app.get("/health/cache")
+def cache_health():
+    """L1/L2 hit ratios for per-user list caching, value encoding stats per key prefix"""
+    return {**tiered_cache.snapshot(), "serialization": cache_serializer.snapshot()}
+
+
+@app.get("/health/usage")
+def usage_health():
+    """Usage event buffer depth and flush counters"""
+    return usage_recorder.snapshot()
+
+
+@app.on_event("startup")
+async def start_cache_invalidation():
+    tiered_cache.start()
+
+
+@app.on_event("startup")
+async def start_usage_recorder():
+    usage_recorder.start()
+
+
+@app.on_event("startup")
+async def start_generation_jobs():
+    generation_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_generation_jobs():
+    await generation_jobs.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    await llm_gateway.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_usage_recorder():
+    await usage_recorder.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_cache():
+    tiered_cache.stop()
+    await async_cache.close()
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(resumes.router)
@@ -48,6 +118,21 @@ app.include_router(emails.router)
 app.include_router(enhanced.router)
 
 
+# Provider rate limited or circuit open - tell clients when to come back
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(request, exc):
+    headers = {"Retry-After": str(max(1, int(exc.retry_after + 0.999)))} if exc.retry_after else None
+    return JSONResponse(
+        status_code=503,
+        content={
+            "message": "AI provider is temporarily unavailable, please retry shortly",
+            "detail": str(exc),
+            "retry_after": round(exc.retry_after, 1) if exc.retry_after else None
+        },
+        headers=headers
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -78,8 +78,13 @@ class UsageTracking(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     endpoint = Column(String, nullable=False)
     action = Column(String, nullable=False)  # e.g., "email_generation", "resume_upload"
+    model = Column(String, nullable=True)  # Comma-separated when a request used several
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
     tokens_used = Column(Integer, default=0)
     cost = Column(Float, default=0.0)
+    latency_ms = Column(Float, nullable=True)
+    status_code = Column(Integer, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -0,0 +1,133 @@
+"""
+Job description normalization and fingerprinting
+- Canonical job URLs (tracking parameters removed)
+- Whitespace / boilerplate normalization of descriptions
+- Shingle-based SimHash fingerprints for near-duplicate detection
+- Exact content hashes for keying parses of the same description
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Optional, List
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+
+# Query parameters that only identify the click, not the posting
+TRACKING_PARAMS = {
+    "refid", "trackingid", "trk", "trkinfo", "ref", "src",
+    "gclid", "fbclid", "msclkid", "mc_cid", "mc_eid"
+}
+
+# Lines that are page chrome or legal boilerplate rather than the role itself
+BOILERPLATE_PATTERNS = [
+    r"^show (more|less)$",
+    r"^see (more|less)$",
+    r"^(apply|apply now|easy apply|save|save job|share|share this job|report this job)$",
+    r"^(sign in|join now|log in)( to .*)?$",
+    r"^\d+ (applicants|people clicked apply)$",
+    r"^(posted|reposted) \d+ \w+ ago$",
+    r".*\b(equal (employment )?opportunity employer|eeo)\b.*",
+    r".*\bwithout regard to (race|color|religion)\b.*",
+    r".*\breasonable accommodations?\b.*\b(disabilit|applicants)\w*.*",
+    r".*\b(we|this site) uses? cookies\b.*",
+    r"^(referrals increase your chances|get notified about new)\b.*",
+]
+_BOILERPLATE_RE = [re.compile(p, re.I) for p in BOILERPLATE_PATTERNS]
+
+SHINGLE_SIZE = 4
+FINGERPRINT_BITS = 64
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a job URL so re-shared links map to the same posting"""
+    if not url:
+        return url
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = re.sub(r"/{2,}", "/", parsed.path).rstrip("/") or "/"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=False)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+
+    # LinkedIn: the numeric id in /jobs/view/<slug>-<id> fully identifies the posting
+    if "linkedin." in host:
+        match = re.search(r"/jobs/view/(?:[^/]*-)?(\d+)", path)
+        if match:
+            path = f"/jobs/view/{match.group(1)}"
+            query = []
+    return urlunparse(((parsed.scheme or "https").lower(), host, path, "", urlencode(query), ""))
+
+
+def normalize_whitespace(text: str) -> str:
+    """Unicode-normalize and collapse runs of whitespace and blank lines"""
+    text = unicodedata.normalize("NFKC", text or "")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    collapsed = []
+    for line in lines:
+        if line or (collapsed and collapsed[-1]):
+            collapsed.append(line)
+    return "\n".join(collapsed).strip()
+
+
+def strip_boilerplate(text: str) -> str:
+    """Drop page chrome and legal boilerplate lines"""
+    kept = [
+        line for line in text.split("\n")
+        if not any(pattern.match(line.strip()) for pattern in _BOILERPLATE_RE)
+    ]
+    return "\n".join(kept).strip()
+
+
+def normalize_job_description(text: Optional[str]) -> Optional[str]:
+    """Canonical form of a job description used for prompts and cache keys"""
+    if not text:
+        return text
+    return strip_boilerplate(normalize_whitespace(text))
+
+
+def content_hash(text: str) -> str:
+    """Exact key for a description; unlike the SimHash fingerprint it never collides in practice"""
+    return hashlib.sha256((normalize_job_description(text) or "").encode("utf-8")).hexdigest()
+
+
+def _fold_tokens(text: str) -> List[str]:
+    """Case-folded word tokens with punctuation removed"""
+    return re.findall(r"[a-z0-9+#]+", (normalize_job_description(text) or "").casefold())
+
+
+def job_fingerprint(text: str) -> str:
+    """
+    64-bit SimHash over word shingles, as hex.
+    Small edits flip few bits, so near-duplicates have a small Hamming distance.
+    """
+    tokens = _fold_tokens(text)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return f"{fingerprint:016x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def is_near_duplicate(a: str, b: str, max_distance: int = 3) -> bool:
+    """Compare two fingerprints"""
+    return hamming_distance(a, b) <= max_distance
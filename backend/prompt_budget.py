@@ -0,0 +1,187 @@
+"""
+Token-budgeted prompt context builder
+- Local token estimation (no tokenizer download)
+- Per-task budgets split between resume and job description
+- Keeps the most relevant sections (keyword overlap) instead of the first N chars
+"""
+
+import math
+import re
+from typing import List, Optional, Set, Tuple
+from config import settings
+
+
+# Total input budget (tokens) per task and the share given to the resume.
+# Defaults roughly match the old fixed character slices (~4 chars/token).
+TASK_BUDGETS = {
+    "email": 650,
+    "quick_email": 900,
+    "cover_letter": 1000,
+    "analysis": 1250,
+    "interview_prep": 1000,
+    "latex": 1250,
+    "bundle": 1300,
+    "resume_profile": 2000,
+    "default": 1000
+}
+
+RESUME_SHARE = {
+    "email": 0.6,
+    "quick_email": 0.55,
+    "cover_letter": 0.5,
+    "analysis": 0.6,
+    "interview_prep": 0.5,
+    "latex": 0.7,
+    "bundle": 0.6,
+    "resume_profile": 1.0,
+    "default": 0.5
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "its", "of", "on", "or", "our", "that", "the", "their", "this",
+    "to", "we", "will", "with", "you", "your", "who", "what", "about", "all", "can",
+    "into", "more", "other", "than", "they", "us", "was", "were", "which", "while",
+    "work", "working", "team", "role", "job", "company", "experience", "years",
+    "ability", "strong", "including", "using", "such", "etc", "also", "must",
+    "should", "well", "new", "may", "per", "not", "but", "out", "any", "one"
+}
+
+# Lines in a JD that usually carry the actual requirements
+REQUIREMENT_CUES = re.compile(
+    r"\b(require|qualification|must|need|experience (with|in)|proficien|familiar|knowledge of|skills?)\w*",
+    re.I
+)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local estimate of BPE token count.
+    Word pieces and punctuation with a small inflation for sub-word splits
+    track Llama tokenizers within ~10% on English resume/JD text.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(_TOKEN_RE.findall(text)) * 1.15)
+
+
+def extract_keywords(text: str) -> Set[str]:
+    """Lower-cased content words and adjacent pairs (e.g. "machine learning")"""
+    words = [w for w in _WORD_RE.findall((text or "").lower()) if w not in STOPWORDS and len(w) > 1]
+    pairs = {f"{a} {b}" for a, b in zip(words, words[1:])}
+    return set(words) | pairs
+
+
+def split_sections(text: str) -> List[str]:
+    """Split text into paragraph / bullet sized chunks, preserving order"""
+    chunks: List[str] = []
+    current: List[str] = []
+    for line in (text or "").splitlines():
+        stripped = line.strip()
+        is_bullet = bool(re.match(r"^([-*•·▪●]|\d+[.)])\s+", stripped))
+        is_heading = bool(stripped) and len(stripped) < 40 and (stripped.isupper() or stripped.endswith(":"))
+        if not stripped or is_bullet or is_heading:
+            if current:
+                chunks.append("\n".join(current))
+                current = []
+        if stripped:
+            current.append(stripped)
+            if is_bullet:
+                chunks.append("\n".join(current))
+                current = []
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def fit_to_budget(
+    text: str,
+    budget: int,
+    keywords: Set[str],
+    keep_first: bool = True,
+    boost: Optional[re.Pattern] = None
+) -> str:
+    """
+    Return text trimmed to roughly `budget` tokens, keeping the chunks that
+    overlap most with `keywords`. Chunks keep their original order.
+    """
+    if not text or estimate_tokens(text) <= budget:
+        return text or ""
+
+    chunks = split_sections(text)
+    costs = [estimate_tokens(chunk) for chunk in chunks]
+
+    def score(index: int) -> float:
+        chunk_keywords = extract_keywords(chunks[index])
+        overlap = len(chunk_keywords & keywords)
+        value = overlap / math.sqrt(costs[index] + 1)
+        if boost is not None and boost.search(chunks[index]):
+            value += 0.5
+        return value
+
+    selected: Set[int] = set()
+    used = 0
+    # The opening chunk (name/contact, or the role summary) anchors the context
+    if keep_first and chunks and costs[0] <= budget // 3:
+        selected.add(0)
+        used += costs[0]
+
+    for index in sorted(range(len(chunks)), key=score, reverse=True):
+        if index in selected:
+            continue
+        if used + costs[index] <= budget:
+            selected.add(index)
+            used += costs[index]
+
+    if not selected:
+        # Single oversized chunk - fall back to a proportional character cut
+        return text[:budget * 4]
+
+    return "\n".join(chunks[i] for i in sorted(selected))
+
+
+def task_budget(task: str) -> int:
+    overrides = settings.prompt_token_budgets
+    if task in overrides:
+        return overrides[task]
+    return TASK_BUDGETS.get(task, TASK_BUDGETS["default"])
+
+
+def build_prompt_context(
+    task: str,
+    resume_content: str,
+    job_description: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Fit resume and job description into the task's token budget.
+    Resume sections are ranked by overlap with JD keywords and vice versa;
+    unused budget on one side is given to the other.
+    """
+    total = task_budget(task)
+    job_description = job_description or ""
+
+    if not job_description:
+        return fit_to_budget(resume_content, total, set()), ""
+
+    resume_budget = int(total * RESUME_SHARE.get(task, RESUME_SHARE["default"]))
+    job_budget = total - resume_budget
+
+    resume_tokens = estimate_tokens(resume_content)
+    job_tokens = estimate_tokens(job_description)
+    if resume_tokens < resume_budget:
+        job_budget += resume_budget - resume_tokens
+        resume_budget = resume_tokens
+    elif job_tokens < job_budget:
+        resume_budget += job_budget - job_tokens
+        job_budget = job_tokens
+
+    job_keywords = extract_keywords(job_description)
+    resume_keywords = extract_keywords(resume_content)
+
+    return (
+        fit_to_budget(resume_content, resume_budget, job_keywords),
+        fit_to_budget(job_description, job_budget, resume_keywords, boost=REQUIREMENT_CUES)
+    )
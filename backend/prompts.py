@@ -0,0 +1,371 @@
+"""
+Versioned prompt templates for the generation services
+- Static system prompt and instructions first, request content last, so
+  requests share the longest possible prefix for provider-side prompt caching
+- Templates are compiled once at import; placeholders are checked on render
+- Version ("name@vN") travels with each generation as prompt_version
+- Per-template token counts: static prefix size vs rendered and billed prompts
+
+Bump a template's version whenever its text changes. Only the context block
+may contain {placeholders}; instructions are sent verbatim (JSON braces and all).
+Request options (tone, length, ...) come first in the context because they
+have few distinct values and so extend the shared prefix further than the
+job description and resume do.
+"""
+
+from string import Formatter
+from typing import Dict, Any, List, Optional
+from prompt_budget import estimate_tokens
+
+
+class PromptTemplate:
+    """One compiled prompt: static system + instructions, then a context block"""
+
+    def __init__(self, name: str, version: int, system: str, instructions: str, context: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.prefix = instructions.strip() + "\n\n"
+        self.context = context.strip()
+        self.fields = [field for _, field, _, _ in Formatter().parse(self.context) if field]
+        invalid = [field for field in self.fields if not field.isidentifier()]
+        if invalid:
+            raise ValueError(f"Prompt {self.id} has invalid placeholders: {', '.join(invalid)}")
+        self.prefix_tokens = estimate_tokens(self.system) + estimate_tokens(self.prefix)
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **values: Any) -> Dict[str, str]:
+        """Returns {"system_prompt", "user_prompt", "prompt_version"} for the gateway"""
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise ValueError(f"Prompt {self.id} is missing values for: {', '.join(missing)}")
+        user_prompt = self.prefix + self.context.format(**values)
+        prompt_registry.record_render(self, user_prompt)
+        return {
+            "system_prompt": self.system,
+            "user_prompt": user_prompt,
+            "prompt_version": self.id
+        }
+
+
+class PromptRegistry:
+    """All templates by name and version, with per-template token counters"""
+
+    def __init__(self):
+        self._templates: Dict[str, Dict[int, PromptTemplate]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        versions = self._templates.setdefault(template.name, {})
+        if template.version in versions:
+            raise ValueError(f"Prompt {template.id} is already registered")
+        versions[template.version] = template
+        self._stats[template.id] = {
+            "renders": 0,
+            "rendered_tokens": 0,
+            "generations": 0,
+            "cache_hits": 0,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0
+        }
+        return template
+
+    def get(self, name: str, version: Optional[int] = None) -> PromptTemplate:
+        """A template by name; the latest version unless one is pinned"""
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"Unknown prompt template: {name}")
+        if version is None:
+            return versions[max(versions)]
+        if version not in versions:
+            raise KeyError(f"Unknown prompt template: {name}@v{version}")
+        return versions[version]
+
+    def record_render(self, template: PromptTemplate, user_prompt: str):
+        counters = self._stats[template.id]
+        counters["renders"] += 1
+        counters["rendered_tokens"] += estimate_tokens(template.system) + estimate_tokens(user_prompt)
+
+    def record_generation(self, prompt_version: str, result: Dict[str, Any]):
+        """Provider-reported usage for one generation made from a template"""
+        counters = self._stats.get(prompt_version)
+        if counters is None:
+            return
+        counters["generations"] += 1
+        if result.get("cached"):
+            counters["cache_hits"] += 1
+        counters["prompt_tokens"] += int(result.get("prompt_tokens") or 0)
+        counters["cached_prompt_tokens"] += int(result.get("cached_prompt_tokens") or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per template: static prefix tokens, average rendered prompt tokens and
+        the share of it that is static (the cacheable part), plus billed and
+        provider-cached prompt tokens
+        """
+        report: Dict[str, Any] = {}
+        for versions in self._templates.values():
+            for template in versions.values():
+                counters = self._stats[template.id]
+                average = counters["rendered_tokens"] / counters["renders"] if counters["renders"] else 0.0
+                billed = counters["prompt_tokens"]
+                report[template.id] = {
+                    **counters,
+                    "prefix_tokens": template.prefix_tokens,
+                    "avg_prompt_tokens": round(average, 1),
+                    "static_share": round(template.prefix_tokens / average, 3) if average else 0.0,
+                    "provider_cache_ratio": round(counters["cached_prompt_tokens"] / billed, 3) if billed else 0.0
+                }
+        return report
+
+    def templates(self) -> List[str]:
+        return sorted(template.id for versions in self._templates.values() for template in versions.values())
+
+
+# Global registry instance
+prompt_registry = PromptRegistry()
+
+
+COLD_EMAIL = prompt_registry.register(PromptTemplate(
+    name="cold_email",
+    version=1,
+    system="You are an expert email writer specializing in cold emails for job applications. Generate professional, personalized emails that highlight relevant skills and experience.",
+    instructions="""Generate a personalized cold email for the job application described at the end of this message.
+
+**Requirements:**
+1. Follow the tone and length given under **Style**
+2. Highlight 2-3 relevant skills/experiences from the resume that match the job description
+3. Show genuine interest in the company and role
+4. Include a clear call-to-action
+5. Make it personalized and avoid generic phrases
+
+**Format:**
+Subject: [Write an engaging subject line]
+
+Body:
+[Write the email body]
+
+Make sure to start with "Subject:" on its own line.""",
+    context="""**Style:**
+- {tone}
+- {length}
+
+**Job Information:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Candidate Resume Summary:**
+{resume_content}"""
+))
+
+QUICK_EMAIL = prompt_registry.register(PromptTemplate(
+    name="quick_email",
+    version=1,
+    system="You are an expert email writer specializing in cold emails for job applications.",
+    instructions="""Generate a personalized cold email for the job application described at the end of this message.
+
+**Requirements:**
+1. Follow the tone and length given under **Style**
+2. Highlight 2-3 relevant skills/experiences
+3. Show genuine interest in the company
+4. Include a clear call-to-action
+5. Avoid generic phrases
+
+**Format:**
+Subject: [Write engaging subject line]
+
+Body:
+[Write the email body]""",
+    context="""**Style:**
+- {tone}
+- {length}
+
+**Job Information:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Candidate Resume:**
+{resume_content}"""
+))
+
+LATEX_RESUME = prompt_registry.register(PromptTemplate(
+    name="latex",
+    version=1,
+    system="You are an expert LaTeX resume designer. Generate clean, professional, ATS-friendly LaTeX resumes that compile without errors.",
+    instructions="""Generate a complete, compilable LaTeX resume from the resume content at the end of this message.
+
+**Technical Requirements:**
+1. Use standard LaTeX packages (geometry, hyperref, fontspec if needed, titlesec, enumitem)
+2. Ensure the code compiles without errors
+3. Include proper sections: Contact Info, Summary/Objective, Experience, Education, Skills
+4. Use professional formatting with consistent spacing
+5. Make it ATS-friendly (no graphics, simple structure)
+6. Add comments for easy customization
+
+**Job-Specific Tuning (when a target job description is given):**
+- Reorder sections to highlight most relevant experience first
+- Use keywords from the job description naturally
+- Quantify achievements that align with job requirements
+- Adjust skill emphasis to match job needs
+
+**Output Format:**
+Return ONLY the complete LaTeX code, starting with \\documentclass and ending with \\end{document}.
+Do not include any explanations or markdown code blocks.""",
+    context="""**Style Requirements:**
+- Template Style: {template_style}{skills_emphasis}
+{job_section}
+**Resume Content:**
+{resume_content}"""
+))
+
+COVER_LETTER = prompt_registry.register(PromptTemplate(
+    name="cover_letter",
+    version=1,
+    system="You are an expert career coach and cover letter writer. Generate compelling, personalized cover letters that get interviews.",
+    instructions="""Generate a professional cover letter for the job application described at the end of this message.
+
+**Writing Requirements:**
+- Tone: as given under **Style**
+- Length: 3-4 paragraphs (300-400 words)
+- Structure: Opening hook → Relevant experience/skills → Why this company → Call to action
+
+**Guidelines:**
+1. Start with an engaging opening that shows genuine interest
+2. Connect specific resume achievements to job requirements
+3. Demonstrate knowledge of the company
+4. End with a confident call to action
+5. Avoid generic phrases like "I am writing to apply..."
+6. Use specific, quantified achievements where possible
+
+**Output Format:**
+Return only the cover letter text, ready to copy-paste. Do not include any headers or signatures (the candidate will add those).""",
+    context="""**Style:**
+- Tone: {tone}{salary_section}{custom_section}
+
+**Job Details:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Candidate Resume:**
+{resume_content}"""
+))
+
+RESUME_ANALYSIS = prompt_registry.register(PromptTemplate(
+    name="analysis",
+    version=1,
+    system="You are an expert ATS system and resume analyst. Provide detailed, actionable analysis in valid JSON format only.",
+    instructions="""Analyze the resume at the end of this message against the job description and provide a detailed assessment.
+
+**Provide analysis in the following JSON format (return ONLY valid JSON):**
+{
+    "ats_score": <number 0-100>,
+    "match_score": <number 0-100>,
+    "keyword_match": {
+        "matched_keywords": ["keyword1", "keyword2"],
+        "missing_keywords": ["keyword1", "keyword2"],
+        "match_percentage": <number>
+    },
+    "skills_analysis": {
+        "matched_skills": ["skill1", "skill2"],
+        "missing_skills": ["skill1", "skill2"],
+        "transferable_skills": ["skill1", "skill2"]
+    },
+    "experience_relevance": {
+        "score": <number 0-100>,
+        "relevant_experiences": ["experience1", "experience2"],
+        "gaps": ["gap1", "gap2"]
+    },
+    "ats_issues": [
+        {"issue": "description", "severity": "high|medium|low", "fix": "suggestion"}
+    ],
+    "improvement_suggestions": [
+        {"priority": "high|medium|low", "category": "category", "suggestion": "detailed suggestion"}
+    ],
+    "summary": "2-3 sentence overall assessment",
+    "strengths": ["strength1", "strength2"],
+    "weaknesses": ["weakness1", "weakness2"]
+}""",
+    context="""**Job Details:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Resume Content:**
+{resume_content}"""
+))
+
+INTERVIEW_PREP = prompt_registry.register(PromptTemplate(
+    name="interview_prep",
+    version=1,
+    system="You are an expert interview coach with experience at top companies. Generate realistic, helpful interview preparation materials.",
+    instructions="""Generate interview preparation materials for the job application described at the end of this message.
+
+**Return as JSON with this structure:**
+{
+    "questions": [
+        {
+            "category": "category_name",
+            "question": "interview question",
+            "why_asked": "why interviewer might ask this",
+            "suggested_answer": "framework or key points for answer",
+            "resume_connection": "relevant resume experience to mention"
+        }
+    ],
+    "company_research_tips": ["tip1", "tip2"],
+    "questions_to_ask_interviewer": ["question1", "question2"],
+    "red_flags_to_avoid": ["flag1", "flag2"],
+    "salary_negotiation_tips": ["tip1", "tip2"]
+}
+
+Generate 3-4 questions per requested category.""",
+    context="""**Generate questions for these categories:** {question_types}
+
+**Job Details:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Candidate Resume:**
+{resume_content}"""
+))
+
+BUNDLE = prompt_registry.register(PromptTemplate(
+    name="bundle",
+    version=1,
+    system="You are an expert career coach, cold email writer and ATS resume analyst. Respond with a single valid JSON object only.",
+    instructions="""Prepare job application materials for the candidate described at the end of this message.
+
+**Return ONLY a JSON object with exactly the keys listed under Requested Keys.** Each key has this format:
+    "email": {
+        "subject": "engaging subject line",
+        "body": "cold email body in the requested tone and length, highlights 2-3 relevant skills, clear call-to-action, no generic phrases"
+    }
+    "cover_letter": "complete cover letter text in the requested tone, 300-400 words, 3-4 paragraphs with quantified achievements, no headers or signature"
+    "analysis": {
+        "ats_score": <number 0-100>,
+        "match_score": <number 0-100>,
+        "keyword_match": {"matched_keywords": [], "missing_keywords": [], "match_percentage": <number>},
+        "skills_analysis": {"matched_skills": [], "missing_skills": [], "transferable_skills": []},
+        "ats_issues": [{"issue": "description", "severity": "high|medium|low", "fix": "suggestion"}],
+        "improvement_suggestions": [{"priority": "high|medium|low", "category": "category", "suggestion": "detailed suggestion"}],
+        "summary": "2-3 sentence overall assessment",
+        "strengths": [],
+        "weaknesses": []
+    }""",
+    context="""**Requested Keys:** {artifacts}
+{options}
+
+**Job Information:**
+- Company: {company_name}
+- Position: {job_title}
+- Job Description: {job_description}
+
+**Candidate Resume:**
+{resume_content}"""
+))
@@ -0,0 +1,261 @@
+"""
+Chat completion providers behind the LLM gateway
+- One class for any OpenAI-compatible API (Groq primary, OpenAI secondary)
+- Base URLs are configurable so either side can point at a local stub server
+- Hedge policy: when to fire a backup request, and how often it wins
+"""
+
+import asyncio
+import math
+from collections import deque
+from typing import Dict, Any, Optional, AsyncIterator, Callable, List
+import httpx
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+from config import settings
+from resilience import ResilientCaller
+
+
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """Token counts from an SDK usage object (or the raw dict older SDKs leave on stream chunks)"""
+    def field(source: Any, name: str) -> Any:
+        if source is None:
+            return None
+        return source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+
+    def count(source: Any, name: str) -> int:
+        return int(field(source, name) or 0)
+
+    return {
+        "prompt_tokens": count(usage, "prompt_tokens"),
+        "completion_tokens": count(usage, "completion_tokens"),
+        "tokens_used": count(usage, "total_tokens"),
+        # Prompt prefix served from the provider's prompt cache (0 when not reported)
+        "cached_prompt_tokens": count(field(usage, "prompt_tokens_details"), "cached_tokens")
+    }
+
+
+class ChatProvider:
+    """A pooled client for one OpenAI-compatible chat completions API"""
+
+    def __init__(
+        self,
+        name: str,
+        client_factory: Callable[..., Any],
+        api_key: str,
+        base_url: str = "",
+        model_map: Optional[Dict[str, str]] = None,
+        default_model: str = "",
+        stream_usage_option: bool = False
+    ):
+        self.name = name
+        self._client_factory = client_factory
+        self._api_key = api_key
+        self._base_url = base_url or None
+        # Gateway (primary) model name -> this provider's model; identity when empty
+        self._model_map = model_map or {}
+        self._default_model = default_model
+        # OpenAI only reports streaming usage when asked to
+        self._stream_usage_option = stream_usage_option
+        self._client = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self.resilience = ResilientCaller(name)
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self._api_key)
+
+    def model_for(self, model: str) -> str:
+        if not self._model_map and not self._default_model:
+            return model
+        return self._model_map.get(model, self._default_model or model)
+
+    def _get_client(self):
+        """Lazily build the shared client so import never needs an API key"""
+        if not self.is_configured:
+            raise ValueError(f"{self.name} API key not configured")
+
+        if self._client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+                )
+            )
+            # Retries are handled by self.resilience, not the SDK
+            self._client = self._client_factory(
+                api_key=self._api_key,
+                base_url=self._base_url,
+                http_client=self._http_client,
+                max_retries=0
+            )
+        return self._client
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Non-streaming completion; returns content, model and token usage"""
+        client = self._get_client()
+        model = self.model_for(model)
+        extra = {}
+        if response_schema and settings.LLM_STRUCTURED_OUTPUTS:
+            extra = {"response_format": {"type": "json_schema", "json_schema": response_schema}}
+        elif json_mode or response_schema:
+            extra = {"response_format": {"type": "json_object"}}
+
+        async def attempt():
+            async with self._semaphore:
+                return await client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **extra
+                )
+
+        response = await self.resilience.call(attempt)
+
+        return {
+            "content": response.choices[0].message.content or "",
+            "model": model,
+            "provider": self.name,
+            **usage_counts(response.usage),
+            "cached": False
+        }
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields {"type": "delta", "content": ...} per token chunk, then one
+        {"type": "usage", ...} event with the model and token counts.
+        """
+        client = self._get_client()
+        model = self.model_for(model)
+        extra: Dict[str, Any] = {"extra_body": {"stream_options": {"include_usage": True}}} if self._stream_usage_option else {}
+        if json_mode:
+            extra["response_format"] = {"type": "json_object"}
+        usage = None
+
+        async with self._semaphore:
+            # Only opening the stream is retried; once tokens flow they are not replayed
+            stream = await self.resilience.call(lambda: client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **extra
+            ))
+            try:
+                async for chunk in stream:
+                    # Usage arrives on the last chunk (under x_groq for Groq)
+                    chunk_usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if chunk_usage:
+                        usage = chunk_usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield {"type": "delta", "content": delta}
+            finally:
+                # Free the connection when a hedged stream loses the race
+                await stream.close()
+
+        yield {
+            "type": "usage",
+            "model": model,
+            "provider": self.name,
+            **usage_counts(usage)
+        }
+
+    async def close(self):
+        """Release pooled connections"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._client = None
+        self._http_client = None
+
+
+class HedgePolicy:
+    """
+    Decide when to fire the backup request and track how hedging performs.
+    The delay is the configured LLM_HEDGE_DELAY, or (when 0) the task's
+    recent p95 primary latency clamped to [LLM_HEDGE_MIN_DELAY, LLM_HEDGE_MAX_DELAY].
+    """
+
+    def __init__(self):
+        self._samples: Dict[str, deque] = {}
+        self.stats = {
+            "requests": 0,
+            "hedged": 0,
+            "primary_wins": 0,
+            "secondary_wins": 0,
+            "failovers": 0
+        }
+
+    def delay(self, key: str) -> float:
+        if settings.LLM_HEDGE_DELAY > 0:
+            return settings.LLM_HEDGE_DELAY
+        samples = self._samples.get(key)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_MAX_DELAY
+        ordered = sorted(samples)
+        p95 = ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+        return min(settings.LLM_HEDGE_MAX_DELAY, max(settings.LLM_HEDGE_MIN_DELAY, p95))
+
+    def observe(self, key: str, latency: float):
+        """Record how long the primary took (to first token when streaming)"""
+        self._samples.setdefault(key, deque(maxlen=HEDGE_WINDOW)).append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        hedged = self.stats["hedged"]
+        return {
+            **self.stats,
+            "hedge_rate": round(hedged / requests, 4) if requests else 0.0,
+            "secondary_win_rate": round(self.stats["secondary_wins"] / hedged, 4) if hedged else 0.0,
+            "delays": {key: round(self.delay(key), 2) for key in self._samples}
+        }
+
+
+def build_primary() -> ChatProvider:
+    return ChatProvider(
+        name="groq",
+        client_factory=AsyncGroq,
+        api_key=settings.GROQ_API_KEY,
+        base_url=settings.GROQ_BASE_URL
+    )
+
+
+def build_secondary() -> ChatProvider:
+    return ChatProvider(
+        name="openai",
+        client_factory=AsyncOpenAI,
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        model_map={
+            settings.MODEL_SMALL: settings.SECONDARY_MODEL_SMALL,
+            settings.MODEL_LARGE: settings.SECONDARY_MODEL_LARGE
+        },
+        default_model=settings.SECONDARY_MODEL_LARGE,
+        stream_usage_option=True
+    )
@@ -0,0 +1,233 @@
+"""
+Resilience layer for LLM provider calls
+- Rate-limit header parsing (retry-after, x-ratelimit-*)
+- Jittered exponential backoff within a per-call deadline
+- Circuit breaker that fails fast while the provider is degraded
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+import groq
+import openai
+from config import settings
+
+
+T = TypeVar("T")
+
+# Status codes worth retrying; other 4xx are caller errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+# Both SDKs share the same exception layout
+CONNECTION_ERRORS = (groq.APIConnectionError, openai.APIConnectionError)
+STATUS_ERRORS = (groq.APIStatusError, openai.APIStatusError)
+RATE_LIMIT_ERRORS = (groq.RateLimitError, openai.RateLimitError)
+
+
+class LLMUnavailableError(Exception):
+    """Provider is rate limited or degraded and the call could not complete in time"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse "7.66s", "2m59.56s", "250ms" or plain seconds into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def parse_rate_limit_headers(headers) -> Dict[str, Any]:
+    """Extract rate-limit state from provider response headers"""
+    if not headers:
+        return {}
+    info: Dict[str, Any] = {}
+    retry_after = parse_duration(headers.get("retry-after"))
+    if retry_after is not None:
+        info["retry_after"] = retry_after
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        if remaining is not None and remaining.isdigit():
+            info[f"remaining_{kind}"] = int(remaining)
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        if reset is not None:
+            info[f"reset_{kind}"] = reset
+    return info
+
+
+class CircuitBreaker:
+    """
+    closed -> open after N consecutive provider failures;
+    open -> half_open after reset_timeout, letting one probe through;
+    a successful probe closes the breaker, a failed one re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release(self):
+        """A probe ended without telling us anything about provider health"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1) if self.state != "closed" else 0
+        }
+
+
+class ResilientCaller:
+    """Run provider calls with retries, backoff and a shared circuit breaker"""
+
+    def __init__(self, name: str = "groq"):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BREAKER_RESET_TIMEOUT
+        )
+        # Provider-wide cooldown from a 429's retry-after
+        self.cooldown_until = 0.0
+        self.last_rate_limit: Dict[str, Any] = {}
+        self.stats = {
+            "calls": 0,
+            "succeeded": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "short_circuited": 0
+        }
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, CONNECTION_ERRORS):
+            return True
+        if isinstance(error, STATUS_ERRORS):
+            return error.status_code in RETRYABLE_STATUS
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]"""
+        ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        """
+        Await fn() until it succeeds, the attempts run out or the deadline
+        (seconds from now) would be exceeded. Raises LLMUnavailableError when
+        the provider is rate limited or unhealthy; caller errors (4xx) are
+        re-raised unchanged on the first attempt.
+        """
+        self.stats["calls"] += 1
+        deadline_at = time.monotonic() + (deadline if deadline is not None else settings.LLM_RETRY_DEADLINE)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(max(1, settings.LLM_RETRY_MAX_ATTEMPTS)):
+            wait = self.cooldown_until - time.monotonic()
+            if wait > 0:
+                if time.monotonic() + wait > deadline_at:
+                    self.stats["short_circuited"] += 1
+                    raise LLMUnavailableError(f"{self.name} rate limited", retry_after=wait)
+                await asyncio.sleep(wait)
+
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                raise LLMUnavailableError(
+                    f"{self.name} temporarily unavailable (circuit open)",
+                    retry_after=self.breaker.retry_after()
+                )
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not self._is_retryable(e):
+                    # Bad request / auth errors say nothing about provider health
+                    self.breaker.release()
+                    raise
+                last_error = e
+            else:
+                self.breaker.record_success()
+                self.stats["succeeded"] += 1
+                return result
+
+            delay = self._backoff(attempt)
+            if isinstance(last_error, RATE_LIMIT_ERRORS):
+                # Rate limiting is not an outage - don't trip the breaker
+                self.breaker.release()
+                self.stats["rate_limited"] += 1
+                self.last_rate_limit = parse_rate_limit_headers(last_error.response.headers)
+                retry_after = self.last_rate_limit.get("retry_after")
+                if retry_after is not None:
+                    self.cooldown_until = max(self.cooldown_until, time.monotonic() + retry_after)
+                    delay = max(delay, retry_after)
+            else:
+                self.breaker.record_failure()
+
+            if attempt + 1 >= settings.LLM_RETRY_MAX_ATTEMPTS or time.monotonic() + delay > deadline_at:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        retry_after = self.last_rate_limit.get("retry_after") if isinstance(last_error, RATE_LIMIT_ERRORS) else None
+        raise LLMUnavailableError(f"{self.name} unavailable: {last_error}", retry_after=retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Breaker state and retry counters for monitoring"""
+        return {
+            "breaker": self.breaker.snapshot(),
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+            "last_rate_limit": self.last_rate_limit,
+            **self.stats
+        }
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import json
 from database import get_db
 from models import User, GeneratedEmail, Resume, Job, UsageTracking
@@ -11,23 +12,19 @@ from schemas import (
     UsageStatsResponse
 )
 from auth import get_current_active_user
-from services import email_generator
-from cache import cache
+from services import email_generator, resume_profiles
+from resilience import LLMUnavailableError
+from cache import async_cache
+from usage import usage_recorder
 
 router = APIRouter(prefix="/api/emails", tags=["Emails"])
 
 
-@router.post("/generate", response_model=GeneratedEmailResponse)
-def generate_email(
-    request: EmailGenerateRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Generate a personalized cold email"""
-    # Get resume
+def _load_resume_and_job(db: Session, request: EmailGenerateRequest, user_id: int):
+    """Fetch the user's resume and job for the request, or raise 404"""
     resume = db.query(Resume).filter(
         Resume.id == request.resume_id,
-        Resume.user_id == current_user.id
+        Resume.user_id == user_id
     ).first()
     
     if not resume:
@@ -36,10 +33,9 @@ def generate_email(
             detail="Resume not found"
         )
     
-    # Get job
     job = db.query(Job).filter(
         Job.id == request.job_id,
-        Job.user_id == current_user.id
+        Job.user_id == user_id
     ).first()
     
     if not job:
@@ -48,30 +44,66 @@ def generate_email(
             detail="Job not found"
         )
     
+    return resume, job
+
+
+def _save_email(
+    db: Session,
+    resume: Resume,
+    updated_parsed_data: Optional[str],
+    db_email: GeneratedEmail
+) -> GeneratedEmail:
+    """Persist the generated email (and a refreshed resume profile)"""
+    if updated_parsed_data:
+        resume.parsed_data = updated_parsed_data
+    
+    db.add(db_email)
+    db.commit()
+    db.refresh(db_email)
+    return db_email
+
+
+@router.post("/generate", response_model=GeneratedEmailResponse)
+async def generate_email(
+    request: EmailGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Generate a personalized cold email"""
+    usage_recorder.set_action("email_generation")
+    
+    # Database work runs in the threadpool so it doesn't block the event loop
+    resume, job = await run_in_threadpool(_load_resume_and_job, db, request, current_user.id)
+    
     # Check cache
     cache_key = f"email:{resume.id}:{job.id}:{request.tone}:{request.length}"
-    cached_email = cache.get(cache_key)
+    cached_email = None if request.regenerate else await async_cache.get(cache_key)
     
     if cached_email:
         # Return cached email
         return GeneratedEmailResponse(**cached_email)
     
     try:
+        # Reuse the stored resume profile, persisting it if missing or stale
+        updated_parsed_data = await resume_profiles.sync_parsed_data(resume.content, resume.parsed_data)
+        
         # Generate email using AI
-        result = email_generator.generate_cold_email(
+        result = await email_generator.generate_cold_email(
             resume_content=resume.content,
             job_description=job.job_description,
             company_name=job.company_name,
             job_title=job.job_title,
             tone=request.tone,
-            length=request.length
+            length=request.length,
+            regenerate=request.regenerate or False
         )
         
         # Save to database
         metadata = {
             "tone": request.tone,
             "length": request.length,
-            "tokens_used": result.get("tokens_used", 0)
+            "tokens_used": result.get("tokens_used", 0),
+            "prompt_version": result.get("prompt_version")
         }
         
         db_email = GeneratedEmail(
@@ -83,27 +115,16 @@ def generate_email(
             metadata=json.dumps(metadata)
         )
         
-        db.add(db_email)
-        
-        # Track usage
-        usage = UsageTracking(
-            user_id=current_user.id,
-            endpoint="/api/emails/generate",
-            action="email_generation",
-            tokens_used=result.get("tokens_used", 0),
-            cost=result.get("tokens_used", 0) * 0.0001  # Example cost calculation
-        )
-        
-        db.add(usage)
-        db.commit()
-        db.refresh(db_email)
+        db_email = await run_in_threadpool(_save_email, db, resume, updated_parsed_data, db_email)
         
         # Cache the result
         email_data = GeneratedEmailResponse.from_orm(db_email).dict()
-        cache.set(cache_key, email_data, expire=3600)
+        await async_cache.set(cache_key, email_data, expire=3600)
         
         return db_email
     
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
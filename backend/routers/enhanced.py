@@ -7,13 +7,17 @@ Provides endpoints for:
 - Resume analysis & ATS scoring
 - LaTeX resume generation
 - Interview preparation
+- Background generation jobs (submit, poll/stream, cancel)
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from pydantic import BaseModel, HttpUrl, Field
 from database import get_db
+from config import settings
 from models import User
 from auth import get_current_active_user
 from services_enhanced import (
@@ -24,6 +28,11 @@ from services_enhanced import (
     interview_prep_service,
     quick_generator
 )
+from resilience import LLMUnavailableError
+from ats_scorer import ats_scorer
+from batch import batch_engine
+from job_queue import generation_jobs, JobQueueUnavailableError, FINISHED
+from streaming import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, STREAM_HEADERS, sse_event
 import PyPDF2
 import io
 
@@ -46,6 +55,7 @@ class JobUrlResponse(BaseModel):
     job_type: Optional[str] = ""
     salary: Optional[str] = ""
     experience_level: Optional[str] = ""
+    fingerprint: Optional[str] = ""
 
 
 class QuickGenerateRequest(BaseModel):
@@ -64,11 +74,13 @@ class CoverLetterRequest(BaseModel):
     tone: Optional[str] = "professional"
     include_salary_expectation: Optional[bool] = False
     custom_points: Optional[List[str]] = None
+    regenerate: Optional[bool] = Field(default=False, description="Bypass cached generations")
 
 
 class CoverLetterResponse(BaseModel):
     cover_letter: str
     tokens_used: int
+    prompt_version: Optional[str] = None
 
 
 class ResumeAnalysisRequest(BaseModel):
@@ -76,6 +88,8 @@ class ResumeAnalysisRequest(BaseModel):
     job_description: str
     job_title: Optional[str] = ""
     company_name: Optional[str] = ""
+    regenerate: Optional[bool] = Field(default=False, description="Bypass cached generations")
+    deep: Optional[bool] = Field(default=False, description="/ats-score only: use the LLM instead of the local scorer")
 
 
 class LatexResumeRequest(BaseModel):
@@ -83,12 +97,14 @@ class LatexResumeRequest(BaseModel):
     job_description: Optional[str] = None
     template_style: Optional[str] = "modern"
     emphasis_skills: Optional[List[str]] = None
+    regenerate: Optional[bool] = Field(default=False, description="Bypass cached generations")
 
 
 class LatexResumeResponse(BaseModel):
     latex_code: str
     template_style: str
     tokens_used: int
+    prompt_version: Optional[str] = None
 
 
 class InterviewPrepRequest(BaseModel):
@@ -97,6 +113,21 @@ class InterviewPrepRequest(BaseModel):
     job_title: str
     company_name: str
     question_types: Optional[List[str]] = None
+    regenerate: Optional[bool] = Field(default=False, description="Bypass cached generations")
+
+
+def _sse_response(events) -> StreamingResponse:
+    """Wrap a service event stream as server-sent events, reporting failures in-band"""
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except LLMUnavailableError as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(body(), media_type=SSE_MEDIA_TYPE, headers=STREAM_HEADERS)
 
 
 # ============== Job Scraping Endpoints ==============
@@ -139,6 +170,14 @@ async def quick_generate_all(
     - email_length: short|medium|long
     - cover_letter_tone: professional|enthusiastic|confident|storytelling
     - latex_template: modern|classic|minimal|creative|academic
+    - timeouts: per-artifact seconds, e.g. {"latex_resume": 60}
+    - regenerate: bypass cached generations (default: false)
+    - single_call: produce email, cover letter and analysis from one JSON
+      completion (default: false); sections that fail validation are
+      regenerated individually and listed under bundle.fallbacks
+    
+    Artifacts run concurrently. Failed or timed-out artifacts are listed
+    under "errors" and the remaining results are still returned.
     """
     try:
         result = await quick_generator.quick_generate_all(
@@ -149,6 +188,8 @@ async def quick_generate_all(
             options=request.options or {}
         )
         return result
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -163,15 +204,18 @@ async def quick_generate_email(
 ):
     """Generate a cold email without saving to database"""
     try:
-        result = quick_generator._generate_quick_email(
+        result = await quick_generator.generate_quick_email(
             resume_content=request.resume_content,
             job_description=request.job_description,
             company_name=request.company_name,
             job_title=request.job_title,
             tone=request.options.get("tone", "professional") if request.options else "professional",
-            length=request.options.get("length", "medium") if request.options else "medium"
+            length=request.options.get("length", "medium") if request.options else "medium",
+            regenerate=bool(request.options.get("regenerate", False)) if request.options else False
         )
         return result
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -179,6 +223,27 @@ async def quick_generate_email(
         )
 
 
+@router.post("/quick-email/stream")
+async def quick_generate_email_stream(
+    request: QuickGenerateRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream a cold email as server-sent events.
+    Events: token (raw text), subject (as soon as the Subject: line is complete),
+    done (final subject/body/tokens_used), error
+    """
+    return _sse_response(quick_generator.stream_quick_email(
+        resume_content=request.resume_content,
+        job_description=request.job_description,
+        company_name=request.company_name,
+        job_title=request.job_title,
+        tone=request.options.get("tone", "professional") if request.options else "professional",
+        length=request.options.get("length", "medium") if request.options else "medium",
+        regenerate=bool(request.options.get("regenerate", False)) if request.options else False
+    ))
+
+
 # ============== Cover Letter Endpoints ==============
 
 @router.post("/cover-letter", response_model=CoverLetterResponse)
@@ -188,19 +253,23 @@ async def generate_cover_letter(
 ):
     """Generate a tailored cover letter"""
     try:
-        result = cover_letter_service.generate_cover_letter(
+        result = await cover_letter_service.generate_cover_letter(
             resume_content=request.resume_content,
             job_description=request.job_description,
             company_name=request.company_name,
             job_title=request.job_title,
             tone=request.tone or "professional",
             include_salary_expectation=request.include_salary_expectation or False,
-            custom_points=request.custom_points
+            custom_points=request.custom_points,
+            regenerate=request.regenerate or False
         )
         return CoverLetterResponse(
             cover_letter=result.get("cover_letter", ""),
-            tokens_used=int(result.get("tokens_used", 0))
+            tokens_used=int(result.get("tokens_used", 0)),
+            prompt_version=result.get("prompt_version")
         )
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -208,6 +277,27 @@ async def generate_cover_letter(
         )
 
 
+@router.post("/cover-letter/stream")
+async def generate_cover_letter_stream(
+    request: CoverLetterRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream a tailored cover letter as server-sent events.
+    Events: token, done (final cover_letter/tokens_used), error
+    """
+    return _sse_response(cover_letter_service.stream_cover_letter(
+        resume_content=request.resume_content,
+        job_description=request.job_description,
+        company_name=request.company_name,
+        job_title=request.job_title,
+        tone=request.tone or "professional",
+        include_salary_expectation=request.include_salary_expectation or False,
+        custom_points=request.custom_points,
+        regenerate=request.regenerate or False
+    ))
+
+
 # ============== Resume Analysis Endpoints ==============
 
 @router.post("/analyze-resume")
@@ -223,13 +313,16 @@ async def analyze_resume(
     - Improvement suggestions
     """
     try:
-        result = resume_analyzer.analyze_resume(
+        result = await resume_analyzer.analyze_resume(
             resume_content=request.resume_content,
             job_description=request.job_description,
             job_title=request.job_title or "",
-            company_name=request.company_name or ""
+            company_name=request.company_name or "",
+            regenerate=request.regenerate or False
         )
         return result
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -237,18 +330,50 @@ async def analyze_resume(
         )
 
 
+@router.post("/analyze-resume/stream")
+async def analyze_resume_stream(
+    request: ResumeAnalysisRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream a resume analysis as server-sent events.
+    Events: section ({"name", "value"} for each top-level field such as
+    ats_score or keyword_match, as soon as it is complete), done (the full
+    analysis and tokens_used), error
+    """
+    return _sse_response(resume_analyzer.stream_analysis(
+        resume_content=request.resume_content,
+        job_description=request.job_description,
+        job_title=request.job_title or "",
+        company_name=request.company_name or "",
+        regenerate=request.regenerate or False
+    ))
+
+
 @router.post("/ats-score")
 async def get_ats_score(
     request: ResumeAnalysisRequest,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get ATS compatibility score for a resume against a job description"""
+    """
+    Get ATS compatibility score for a resume against a job description.
+    Scored locally (taxonomy keywords, BM25 weighting, formatting rules) in
+    milliseconds; set deep=true for the LLM analysis.
+    """
     try:
-        result = resume_analyzer.analyze_resume(
+        if not request.deep:
+            return {
+                **ats_scorer.score(request.resume_content, request.job_description),
+                "engine": "local"
+            }
+        
+        result = await resume_analyzer.analyze_resume(
             resume_content=request.resume_content,
             job_description=request.job_description,
             job_title=request.job_title or "",
-            company_name=request.company_name or ""
+            company_name=request.company_name or "",
+            regenerate=request.regenerate or False,
+            task="ats_score"
         )
         # Return simplified ATS-focused response
         return {
@@ -256,8 +381,11 @@ async def get_ats_score(
             "match_score": result.get("match_score", 0),
             "keyword_match": result.get("keyword_match", {}),
             "ats_issues": result.get("ats_issues", []),
-            "summary": result.get("summary", "")
+            "summary": result.get("summary", ""),
+            "engine": "llm"
         }
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -277,17 +405,21 @@ async def generate_latex_resume(
     Template styles: modern, classic, minimal, creative, academic
     """
     try:
-        result = latex_resume_service.generate_latex_resume(
+        result = await latex_resume_service.generate_latex_resume(
             resume_content=request.resume_content,
             job_description=request.job_description,
             template_style=request.template_style or "modern",
-            emphasis_skills=request.emphasis_skills
+            emphasis_skills=request.emphasis_skills,
+            regenerate=request.regenerate or False
         )
         return LatexResumeResponse(
             latex_code=result.get("latex_code", ""),
             template_style=result.get("template_style", "modern"),
-            tokens_used=int(result.get("tokens_used", 0))
+            tokens_used=int(result.get("tokens_used", 0)),
+            prompt_version=result.get("prompt_version")
         )
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -295,6 +427,24 @@ async def generate_latex_resume(
         )
 
 
+@router.post("/latex-resume/stream")
+async def generate_latex_resume_stream(
+    request: LatexResumeRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream LaTeX resume generation as server-sent events.
+    Events: token, done (final latex_code/template_style/tokens_used), error
+    """
+    return _sse_response(latex_resume_service.stream_latex_resume(
+        resume_content=request.resume_content,
+        job_description=request.job_description,
+        template_style=request.template_style or "modern",
+        emphasis_skills=request.emphasis_skills,
+        regenerate=request.regenerate or False
+    ))
+
+
 # ============== Interview Prep Endpoints ==============
 
 @router.post("/interview-prep")
@@ -312,14 +462,17 @@ async def generate_interview_prep(
     Question types: behavioral, technical, situational, company-specific
     """
     try:
-        result = interview_prep_service.generate_interview_questions(
+        result = await interview_prep_service.generate_interview_questions(
             resume_content=request.resume_content,
             job_description=request.job_description,
             job_title=request.job_title,
             company_name=request.company_name,
-            question_types=request.question_types or ["behavioral", "technical", "situational"]
+            question_types=request.question_types or ["behavioral", "technical", "situational"],
+            regenerate=request.regenerate or False
         )
         return result
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -327,6 +480,27 @@ async def generate_interview_prep(
         )
 
 
+@router.post("/interview-prep/stream")
+async def generate_interview_prep_stream(
+    request: InterviewPrepRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream interview preparation materials as server-sent events.
+    Events: question ({"index", "question"} as each question is complete),
+    section ({"name", "value"} for the tips lists), done (the full
+    materials and tokens_used), error
+    """
+    return _sse_response(interview_prep_service.stream_interview_questions(
+        resume_content=request.resume_content,
+        job_description=request.job_description,
+        job_title=request.job_title,
+        company_name=request.company_name,
+        question_types=request.question_types or ["behavioral", "technical", "situational"],
+        regenerate=request.regenerate or False
+    ))
+
+
 # ============== File Upload with Quick Analysis ==============
 
 def extract_text_from_pdf(content_bytes: bytes) -> str:
@@ -387,7 +561,7 @@ async def upload_and_analyze(
         
         # If job description provided, include analysis
         if job_description:
-            analysis = resume_analyzer.analyze_resume(
+            analysis = await resume_analyzer.analyze_resume(
                 resume_content=resume_content,
                 job_description=job_description,
                 job_title=job_title,
@@ -399,6 +573,8 @@ async def upload_and_analyze(
         
     except HTTPException:
         raise
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -410,8 +586,15 @@ async def upload_and_analyze(
 
 class BatchGenerateRequest(BaseModel):
     resume_content: str
-    jobs: List[dict] = Field(..., description="List of {company_name, job_title, job_description}")
-    generate_type: str = Field(default="email", description="email|cover_letter|both")
+    jobs: List[dict] = Field(
+        ...,
+        max_length=settings.BATCH_MAX_JOBS,
+        description="List of {company_name, job_title, job_description}"
+    )
+    generate_type: str = Field(default="email", pattern="^(email|cover_letter|both)$", description="email|cover_letter|both")
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Jobs generated in parallel")
+    stream: Optional[str] = Field(default=None, pattern="^(ndjson|sse)$", description="ndjson|sse to stream results as jobs finish")
+    regenerate: Optional[bool] = Field(default=False, description="Bypass cached generations")
 
 
 @router.post("/batch-generate")
@@ -422,49 +605,152 @@ async def batch_generate(
     """
     Generate emails or cover letters for multiple jobs at once.
     Useful for mass applications.
+    
+    At most BATCH_MAX_JOBS jobs per request (larger batches get a 422).
+    Jobs run in parallel (bounded by `concurrency`). Set `stream` to
+    "ndjson" or "sse" to receive each result as soon as its job finishes,
+    followed by a summary with per-job latency and tokens.
     """
-    results = []
+    concurrency = min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
     
-    for job in request.jobs[:10]:  # Limit to 10 jobs per batch
-        try:
-            job_result = {
-                "company_name": job.get("company_name", ""),
-                "job_title": job.get("job_title", ""),
-                "success": True
-            }
-            
-            if request.generate_type in ["email", "both"]:
-                email = quick_generator._generate_quick_email(
-                    resume_content=request.resume_content,
-                    job_description=job.get("job_description", ""),
-                    company_name=job.get("company_name", ""),
-                    job_title=job.get("job_title", ""),
-                    tone="professional",
-                    length="medium"
-                )
-                job_result["email"] = email
-            
-            if request.generate_type in ["cover_letter", "both"]:
-                cover_letter = cover_letter_service.generate_cover_letter(
-                    resume_content=request.resume_content,
-                    job_description=job.get("job_description", ""),
-                    company_name=job.get("company_name", ""),
-                    job_title=job.get("job_title", "")
-                )
-                job_result["cover_letter"] = cover_letter
-            
-            results.append(job_result)
-            
-        except Exception as e:
-            results.append({
-                "company_name": job.get("company_name", ""),
-                "job_title": job.get("job_title", ""),
-                "success": False,
-                "error": str(e)
-            })
+    if request.stream:
+        return StreamingResponse(
+            batch_engine.stream(
+                resume_content=request.resume_content,
+                jobs=request.jobs,
+                generate_type=request.generate_type,
+                concurrency=concurrency,
+                total_jobs=len(request.jobs),
+                fmt=request.stream,
+                regenerate=request.regenerate or False
+            ),
+            media_type=SSE_MEDIA_TYPE if request.stream == "sse" else NDJSON_MEDIA_TYPE,
+            headers=STREAM_HEADERS
+        )
     
-    return {
-        "total_jobs": len(request.jobs),
-        "processed": len(results),
-        "results": results
-    }
+    return await batch_engine.collect(
+        resume_content=request.resume_content,
+        jobs=request.jobs,
+        generate_type=request.generate_type,
+        concurrency=concurrency,
+        total_jobs=len(request.jobs),
+        regenerate=request.regenerate or False
+    )
+
+
+# ============== Background Generation Jobs ==============
+
+class GenerationJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str = Field(..., description="queued|running|succeeded|failed|cancelled")
+    attempts: int
+    max_attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    next_attempt_at: Optional[datetime] = None
+
+
+async def _submit_job(kind: str, params: dict, current_user: User) -> GenerationJobResponse:
+    try:
+        record = await generation_jobs.submit(kind, params, user_id=current_user.id)
+    except JobQueueUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return GenerationJobResponse(**record)
+
+
+async def _owned_job(job_id: str, current_user: User) -> dict:
+    """The job record if it exists and belongs to the current user"""
+    record = await generation_jobs.get(job_id)
+    if record is None or record.get("user_id") != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found or expired")
+    return record
+
+
+@router.post("/latex-resume/jobs", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_latex_resume_job(
+    request: LatexResumeRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue LaTeX generation in the background; poll or stream /generation-jobs/{id} for the result"""
+    return await _submit_job("latex_resume", {
+        "resume_content": request.resume_content,
+        "job_description": request.job_description,
+        "template_style": request.template_style or "modern",
+        "emphasis_skills": request.emphasis_skills,
+        "regenerate": request.regenerate or False
+    }, current_user)
+
+
+@router.post("/interview-prep/jobs", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_interview_prep_job(
+    request: InterviewPrepRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue interview prep generation in the background"""
+    return await _submit_job("interview_prep", {
+        "resume_content": request.resume_content,
+        "job_description": request.job_description,
+        "job_title": request.job_title,
+        "company_name": request.company_name,
+        "question_types": request.question_types or ["behavioral", "technical", "situational"],
+        "regenerate": request.regenerate or False
+    }, current_user)
+
+
+@router.post("/quick-generate/jobs", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_quick_generate_job(
+    request: QuickGenerateRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue /quick-generate (same options) in the background"""
+    return await _submit_job("quick_generate", {
+        "resume_content": request.resume_content,
+        "job_description": request.job_description,
+        "company_name": request.company_name,
+        "job_title": request.job_title,
+        "options": request.options or {}
+    }, current_user)
+
+
+@router.get("/generation-jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Job status; `result` holds the generation once status is succeeded"""
+    record = await _owned_job(job_id, current_user)
+    return GenerationJobResponse(**generation_jobs.public(record))
+
+
+@router.get("/generation-jobs/{job_id}/events")
+async def stream_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Follow a job as server-sent events.
+    Events: status (on every status/attempt change), then one of done
+    (record with result), failed or cancelled; error if the job expires
+    """
+    await _owned_job(job_id, current_user)
+    return _sse_response(generation_jobs.events(job_id))
+
+
+@router.delete("/generation-jobs/{job_id}", response_model=GenerationJobResponse)
+async def cancel_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cancel a queued or running job"""
+    record = await _owned_job(job_id, current_user)
+    if record["status"] in FINISHED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job already {record['status']}"
+        )
+    record = await generation_jobs.cancel(job_id) or record
+    return GenerationJobResponse(**generation_jobs.public(record))
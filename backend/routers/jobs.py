@@ -7,7 +7,7 @@ from models import User, Job
 from schemas import Job as JobSchema, JobCreate
 from auth import get_current_active_user
 from services import job_parser
-from cache import cache
+from cache import tiered_cache
 
 router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
 
@@ -24,7 +24,8 @@ def create_job(
         parsed_data = job_parser.parse_job_description(
             job.job_description,
             job.company_name,
-            job.job_title
+            job.job_title,
+            job.job_url
         )
         
         # Create job record
@@ -42,7 +43,7 @@ def create_job(
         db.refresh(db_job)
         
         # Clear user cache
-        cache.clear_user_cache(current_user.id)
+        tiered_cache.clear_user_cache(current_user.id)
         
         return db_job
     
@@ -62,10 +63,10 @@ def get_jobs(
 ):
     """Get all jobs for current user"""
     # Try cache first
-    cache_key = f"user:{current_user.id}:jobs:{skip}:{limit}"
-    cached_data = cache.get(cache_key)
+    cache_key = tiered_cache.user_key(current_user.id, f"jobs:{skip}:{limit}")
+    cached_data = tiered_cache.get(cache_key)
     
-    if cached_data:
+    if cached_data is not None:
         return cached_data
     
     # Query database
@@ -74,7 +75,7 @@ def get_jobs(
     ).offset(skip).limit(limit).all()
     
     # Cache results
-    cache.set(cache_key, [JobSchema.from_orm(j).dict() for j in jobs], expire=1800)
+    tiered_cache.set(cache_key, [JobSchema.from_orm(j).dict() for j in jobs], expire=1800)
     
     return jobs
 
@@ -129,7 +130,8 @@ def update_job(
     parsed_data = job_parser.parse_job_description(
         job_update.job_description,
         job_update.company_name,
-        job_update.job_title
+        job_update.job_title,
+        job_update.job_url
     )
     db_job.parsed_data = json.dumps(parsed_data)
     
@@ -137,7 +139,7 @@ def update_job(
     db.refresh(db_job)
     
     # Clear cache
-    cache.clear_user_cache(current_user.id)
+    tiered_cache.clear_user_cache(current_user.id)
     
     return db_job
 
@@ -164,6 +166,6 @@ def delete_job(
     db.commit()
     
     # Clear cache
-    cache.clear_user_cache(current_user.id)
+    tiered_cache.clear_user_cache(current_user.id)
     
     return {"message": "Job deleted successfully"}
@@ -6,8 +6,8 @@ from database import get_db
 from models import User, Resume
 from schemas import Resume as ResumeSchema, ResumeCreate
 from auth import get_current_active_user
-from services import resume_parser
-from cache import cache
+from services import resume_parser, resume_profiles
+from cache import tiered_cache
 import PyPDF2
 import io
 
@@ -49,14 +49,18 @@ async def upload_resume(
             )
         
         # Parse resume
-        parsed_data = resume_parser.parse_resume_text(content)
+        parsed_data = json.dumps(resume_parser.parse_resume_text(content))
+        
+        # Start extracting the structured profile reused by every generation
+        # prompt; it is attached here if already cached, otherwise on first use
+        parsed_data = await resume_profiles.sync_parsed_data(content, parsed_data, wait=False) or parsed_data
         
         # Create resume record
         db_resume = Resume(
             user_id=current_user.id,
             filename=file.filename,
             content=content,
-            parsed_data=json.dumps(parsed_data)
+            parsed_data=parsed_data
         )
         
         db.add(db_resume)
@@ -64,7 +68,7 @@ async def upload_resume(
         db.refresh(db_resume)
         
         # Clear user cache
-        cache.clear_user_cache(current_user.id)
+        await tiered_cache.aclear_user_cache(current_user.id)
         
         return db_resume
     
@@ -84,10 +88,10 @@ def get_resumes(
 ):
     """Get all resumes for current user"""
     # Try cache first
-    cache_key = f"user:{current_user.id}:resumes:{skip}:{limit}"
-    cached_data = cache.get(cache_key)
+    cache_key = tiered_cache.user_key(current_user.id, f"resumes:{skip}:{limit}")
+    cached_data = tiered_cache.get(cache_key)
     
-    if cached_data:
+    if cached_data is not None:
         return cached_data
     
     # Query database
@@ -96,7 +100,7 @@ def get_resumes(
     ).offset(skip).limit(limit).all()
     
     # Cache results
-    cache.set(cache_key, [ResumeSchema.from_orm(r).dict() for r in resumes], expire=1800)
+    tiered_cache.set(cache_key, [ResumeSchema.from_orm(r).dict() for r in resumes], expire=1800)
     
     return resumes
 
@@ -144,7 +148,7 @@ def delete_resume(
     db.commit()
     
     # Clear cache
-    cache.clear_user_cache(current_user.id)
+    tiered_cache.clear_user_cache(current_user.id)
     
     return {"message": "Resume deleted successfully"}
 
@@ -0,0 +1,122 @@
+"""
+Task-based model routing
+- Each generation task maps to a model tier (small / large)
+- Small-tier output that fails validation is retried on the large tier
+- Per-route latency, token and cost counters for tuning the policy
+"""
+
+import math
+from collections import deque
+from typing import Dict, Any, List
+from config import settings
+
+
+# Tier per task; override with MODEL_ROUTES ("task=tier,...")
+DEFAULT_ROUTES = {
+    "ats_score": "small",
+    "resume_profile": "small",
+    "email": "large",
+    "quick_email": "large",
+    "cover_letter": "large",
+    "analysis": "large",
+    "interview_prep": "large",
+    "latex": "large",
+    "bundle": "large",
+    "default": "large"
+}
+
+# USD per million tokens (input, output)
+MODEL_PRICING = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00)
+}
+
+LATENCY_WINDOW = 200
+
+
+class ModelRouter:
+    """Pick a model per task and keep per-route stats"""
+
+    def __init__(self):
+        self.routes = {**DEFAULT_ROUTES, **settings.model_routes}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def tiers(self) -> Dict[str, str]:
+        return {"small": settings.MODEL_SMALL, "large": settings.MODEL_LARGE}
+
+    def tier_for(self, task: str) -> str:
+        tier = self.routes.get(task, self.routes["default"])
+        return tier if tier in self.tiers else "large"
+
+    def candidates(self, task: str) -> List[str]:
+        """Models to try in order: the routed tier, then the large tier"""
+        tier = self.tier_for(task)
+        if tier == "large":
+            return [self.tiers["large"]]
+        return [self.tiers[tier], self.tiers["large"]]
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def record(
+        self,
+        task: str,
+        model: str,
+        latency_ms: float,
+        result: Dict[str, Any],
+        valid: bool = True,
+        fallback: bool = False
+    ):
+        """Record one completion on the task:model route"""
+        route = self._stats.setdefault(f"{task}:{model}", {
+            "task": task,
+            "model": model,
+            "calls": 0,
+            "cache_hits": 0,
+            "invalid": 0,
+            "fallbacks": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost_usd": 0.0,
+            "latencies": deque(maxlen=LATENCY_WINDOW)
+        })
+        route["calls"] += 1
+        if result.get("cached"):
+            route["cache_hits"] += 1
+        else:
+            # Cache hits would drag the latency percentiles towards zero
+            route["latencies"].append(latency_ms)
+        if not valid:
+            route["invalid"] += 1
+        if fallback:
+            route["fallbacks"] += 1
+        route["prompt_tokens"] += result.get("prompt_tokens", 0)
+        route["completion_tokens"] += result.get("completion_tokens", 0)
+        route["cost_usd"] += self.cost(model, result.get("prompt_tokens", 0), result.get("completion_tokens", 0))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-route counters with p50/p95 latency over the recent window"""
+        routes = {}
+        for key, route in self._stats.items():
+            latencies = sorted(route["latencies"])
+            routes[key] = {
+                **{k: v for k, v in route.items() if k != "latencies"},
+                "cost_usd": round(route["cost_usd"], 6),
+                "p50_latency_ms": round(self._percentile(latencies, 50), 1),
+                "p95_latency_ms": round(self._percentile(latencies, 95), 1)
+            }
+        return {"policy": {task: self.tier_for(task) for task in self.routes}, "tiers": self.tiers, "routes": routes}
+
+    def _percentile(self, values: List[float], pct: int) -> float:
+        if not values:
+            return 0.0
+        index = max(0, math.ceil(len(values) * pct / 100) - 1)
+        return values[index]
+
+
+# Global router instance
+model_router = ModelRouter()
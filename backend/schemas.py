@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 
 
@@ -87,6 +87,7 @@ class EmailGenerateRequest(BaseModel):
     job_id: int
     tone: Optional[str] = "professional"
     length: Optional[str] = "medium"
+    regenerate: Optional[bool] = False  # Skip cached generations
 
 
 class GeneratedEmailResponse(BaseModel):
@@ -120,3 +121,78 @@ class UsageStatsResponse(BaseModel):
     total_jobs_added: int
     total_tokens_used: int
     total_cost: float
+
+
+# Generated Output Schemas (JSON returned by the LLM, see structured.py)
+class KeywordMatch(BaseModel):
+    matched_keywords: List[str] = []
+    missing_keywords: List[str] = []
+    match_percentage: Optional[float] = None
+    
+    class Config:
+        extra = "allow"
+
+
+class SkillsAnalysis(BaseModel):
+    matched_skills: List[str] = []
+    missing_skills: List[str] = []
+    transferable_skills: List[str] = []
+    
+    class Config:
+        extra = "allow"
+
+
+class ExperienceRelevance(BaseModel):
+    score: Optional[float] = Field(None, ge=0, le=100)
+    relevant_experiences: List[str] = []
+    gaps: List[str] = []
+    
+    class Config:
+        extra = "allow"
+
+
+class ATSIssue(BaseModel):
+    issue: str
+    severity: str = "medium"
+    fix: str = ""
+
+
+class ImprovementSuggestion(BaseModel):
+    suggestion: str
+    priority: str = "medium"
+    category: str = ""
+
+
+class ResumeAnalysisOutput(BaseModel):
+    ats_score: Union[int, float] = Field(..., ge=0, le=100)
+    match_score: Union[int, float] = Field(..., ge=0, le=100)
+    summary: str = Field(..., min_length=1)
+    keyword_match: KeywordMatch = Field(default_factory=KeywordMatch)
+    skills_analysis: SkillsAnalysis = Field(default_factory=SkillsAnalysis)
+    experience_relevance: ExperienceRelevance = Field(default_factory=ExperienceRelevance)
+    ats_issues: List[ATSIssue] = []
+    improvement_suggestions: List[ImprovementSuggestion] = []
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    
+    class Config:
+        extra = "allow"
+
+
+class InterviewQuestion(BaseModel):
+    question: str = Field(..., min_length=1)
+    category: str = ""
+    why_asked: str = ""
+    suggested_answer: str = ""
+    resume_connection: str = ""
+
+
+class InterviewPrepOutput(BaseModel):
+    questions: List[InterviewQuestion] = Field(..., min_length=1)
+    company_research_tips: List[str] = []
+    questions_to_ask_interviewer: List[str] = []
+    red_flags_to_avoid: List[str] = []
+    salary_negotiation_tips: List[str] = []
+    
+    class Config:
+        extra = "allow"
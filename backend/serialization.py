@@ -0,0 +1,208 @@
+"""
+Cache value serialization
+- Codecs: orjson (stdlib json when it is not installed) or msgpack, picked by CACHE_SERIALIZER
+- Values over CACHE_COMPRESS_MIN_BYTES are compressed with zstd (zlib when
+  zstandard is not installed) if that actually makes them smaller
+- Every value starts with a format header (format version, codec, compression),
+  so any worker reads values written under any configuration; values written
+  before the header existed (plain JSON) are still read
+- Per cache-family stats: bytes before/after compression, encode/decode time
+
+Redis clients run with decode_responses and Upstash REST speaks JSON, so
+stored values are text: binary frames (msgpack, compressed) are base64-armoured.
+"""
+
+import base64
+import json
+import re
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Any, Callable, Tuple
+from config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# First character of every framed value; bump when the layout changes
+FORMAT_VERSION = "\x01"
+
+# Header characters for codecs and compressions
+JSON_CODEC = "j"
+MSGPACK_CODEC = "m"
+NO_COMPRESSION = "-"
+ZLIB_COMPRESSION = "z"
+ZSTD_COMPRESSION = "s"
+
+# Per-user namespaced keys (user:{id}:v{n}:<family>:...) are grouped by family
+_USER_KEY_RE = re.compile(r"^user:\d+:v\d+:([^:]+)")
+
+
+def stats_label(key: str) -> str:
+    """Cache family a key's stats are grouped under, e.g. 'gen' or 'user:resumes'"""
+    match = _USER_KEY_RE.match(key)
+    if match:
+        return f"user:{match.group(1)}"
+    return key.split(":", 1)[0]
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # orjson rejects a few values stdlib json accepts (e.g. ints over 64 bits)
+    return json.dumps(value, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_json_default, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    JSON_CODEC: (_json_dumps, _json_loads),
+    MSGPACK_CODEC: (_msgpack_dumps, _msgpack_loads)
+}
+
+COMPRESSIONS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    ZLIB_COMPRESSION: (lambda data: zlib.compress(data, 6), zlib.decompress),
+    ZSTD_COMPRESSION: (_zstd_compress, _zstd_decompress)
+}
+
+
+class CacheSerializer:
+    """Encode cache values into self-describing text frames and back"""
+
+    def __init__(self):
+        self.codec = MSGPACK_CODEC if settings.CACHE_SERIALIZER == "msgpack" and msgpack is not None else JSON_CODEC
+        if settings.CACHE_COMPRESSION == "none":
+            self.compression = NO_COMPRESSION
+        elif settings.CACHE_COMPRESSION == "zstd" and zstandard is not None:
+            self.compression = ZSTD_COMPRESSION
+        else:
+            self.compression = ZLIB_COMPRESSION
+
+        # Say so when the configured libraries aren't installed
+        if settings.CACHE_SERIALIZER == "msgpack" and msgpack is None:
+            print("Cache serializer warning: msgpack is not installed, falling back to JSON")
+        elif settings.CACHE_SERIALIZER == "orjson" and orjson is None:
+            print("Cache serializer warning: orjson is not installed, falling back to stdlib json")
+        if settings.CACHE_COMPRESSION == "zstd" and zstandard is None:
+            print("Cache serializer warning: zstandard is not installed, falling back to zlib")
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def dumps(self, key: str, value: Any) -> str:
+        started = time.perf_counter()
+        encode, _ = CODECS[self.codec]
+        payload = encode(value)
+        raw_size = len(payload)
+
+        compression = NO_COMPRESSION
+        if self.compression != NO_COMPRESSION and raw_size >= settings.CACHE_COMPRESS_MIN_BYTES:
+            compressed = COMPRESSIONS[self.compression][0](payload)
+            # base64 costs a third on top - only keep the compressed form if it still wins
+            if len(compressed) * 4 // 3 < raw_size:
+                payload, compression = compressed, self.compression
+
+        if self.codec == JSON_CODEC and compression == NO_COMPRESSION:
+            body = payload.decode("utf-8")
+        else:
+            body = base64.b64encode(payload).decode("ascii")
+        data = f"{FORMAT_VERSION}{self.codec}{compression}{body}"
+
+        entry = self._entry(key)
+        entry["encoded"] += 1
+        entry["raw_bytes"] += raw_size
+        entry["stored_bytes"] += len(data)
+        entry["compressed"] += compression != NO_COMPRESSION
+        entry["encode_ms"] += (time.perf_counter() - started) * 1000
+        return data
+
+    def loads(self, key: str, data: str) -> Any:
+        started = time.perf_counter()
+        if data[:1] != FORMAT_VERSION:
+            # Written before framing - plain JSON
+            value = json.loads(data)
+        else:
+            codec, compression, body = data[1], data[2], data[3:]
+            if codec == JSON_CODEC and compression == NO_COMPRESSION:
+                payload = body.encode("utf-8")
+            else:
+                payload = base64.b64decode(body)
+            if compression != NO_COMPRESSION:
+                payload = COMPRESSIONS[compression][1](payload)
+            value = CODECS[codec][1](payload)
+
+        entry = self._entry(key)
+        entry["decoded"] += 1
+        entry["decode_ms"] += (time.perf_counter() - started) * 1000
+        return value
+
+    def snapshot(self) -> Dict[str, Any]:
+        prefixes = {}
+        for prefix, entry in self.stats.items():
+            prefixes[prefix] = {
+                "encoded": entry["encoded"],
+                "decoded": entry["decoded"],
+                "compressed": entry["compressed"],
+                "raw_bytes": entry["raw_bytes"],
+                "stored_bytes": entry["stored_bytes"],
+                "bytes_saved": entry["raw_bytes"] - entry["stored_bytes"],
+                "avg_encode_ms": round(entry["encode_ms"] / entry["encoded"], 4) if entry["encoded"] else 0.0,
+                "avg_decode_ms": round(entry["decode_ms"] / entry["decoded"], 4) if entry["decoded"] else 0.0
+            }
+        return {
+            "codec": "msgpack" if self.codec == MSGPACK_CODEC else ("orjson" if orjson is not None else "json"),
+            "compression": {ZSTD_COMPRESSION: "zstd", ZLIB_COMPRESSION: "zlib"}.get(self.compression, "none"),
+            "compress_min_bytes": settings.CACHE_COMPRESS_MIN_BYTES,
+            "prefixes": prefixes
+        }
+
+    def _entry(self, key: str) -> Dict[str, float]:
+        prefix = stats_label(key)
+        entry = self.stats.get(prefix)
+        if entry is None:
+            entry = self.stats.setdefault(prefix, {
+                "encoded": 0, "decoded": 0, "compressed": 0, "raw_bytes": 0,
+                "stored_bytes": 0, "encode_ms": 0.0, "decode_ms": 0.0
+            })
+        return entry
+
+
+# Global serializer instance
+cache_serializer = CacheSerializer()
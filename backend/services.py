@@ -1,28 +1,54 @@
-from groq import Groq
 from typing import Dict, Any, Optional
-from config import settings
+from llm import llm_gateway
+from resilience import LLMUnavailableError
+from cache import async_cache, LocalLRUCache
+from normalization import normalize_job_description, job_fingerprint, content_hash, canonicalize_url
+from prompt_budget import build_prompt_context
+from prompts import COLD_EMAIL
+from usage import usage_recorder
+import asyncio
+import hashlib
 import json
+import re
+
+
+def parse_json_object(content: str) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object from model output, tolerating markdown fences"""
+    raw = re.sub(r'^```(?:json)?\s*\n?', '', (content or "").strip())
+    raw = re.sub(r'\n?```\s*$', '', raw)
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def is_complete_email(content: str) -> bool:
+    """Output validator: a Subject: line followed by a real body"""
+    _, _, body = (content or "").partition("Subject:")
+    return bool(body) and len(body.strip().split()) >= 40
 
 
 class EmailGeneratorService:
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
-    
-    def generate_cold_email(
+    async def generate_cold_email(
         self,
         resume_content: str,
         job_description: str,
         company_name: str,
         job_title: str,
         tone: str = "professional",
-        length: str = "medium"
+        length: str = "medium",
+        regenerate: bool = False
     ) -> Dict[str, str]:
         """
         Generate a personalized cold email using AI
         """
-        if not self.client:
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
+        
         # Create the prompt
         prompt = self._create_email_prompt(
             resume_content,
@@ -34,32 +60,28 @@ class EmailGeneratorService:
         )
         
         try:
-            # Call Groq API
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert email writer specializing in cold emails for job applications. Generate professional, personalized emails that highlight relevant skills and experience."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
+            # Call Groq API through the shared gateway
+            response = await llm_gateway.complete(
+                **prompt,
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                task="email",
+                validate=is_complete_email,
+                use_cache=not regenerate
             )
             
             # Parse response
-            email_content = response.choices[0].message.content
+            email_content = response["content"]
             subject, body = self._parse_email_response(email_content, job_title, company_name)
             
             return {
                 "subject": subject,
                 "body": body,
-                "tokens_used": response.usage.total_tokens if hasattr(response, 'usage') else 0
+                "tokens_used": response["tokens_used"],
+                "prompt_version": response["prompt_version"]
             }
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise Exception(f"Error generating email: {str(e)}")
     
@@ -71,8 +93,9 @@ class EmailGeneratorService:
         job_title: str,
         tone: str,
         length: str
-    ) -> str:
-        """Create the prompt for email generation"""
+    ) -> Dict[str, str]:
+        """Render the cold email template; returns the gateway prompt arguments"""
+        resume_content, job_description = build_prompt_context("email", resume_content, job_description)
         
         length_instructions = {
             "short": "Keep it brief (150-200 words)",
@@ -86,34 +109,14 @@ class EmailGeneratorService:
             "enthusiastic": "Use an enthusiastic and energetic tone"
         }
         
-        prompt = f"""
-Generate a personalized cold email for a job application with the following details:
-
-**Job Information:**
-- Company: {company_name}
-- Position: {job_title}
-- Job Description: {job_description[:1000]}
-
-**Candidate Resume Summary:**
-{resume_content[:1500]}
-
-**Requirements:**
-1. {tone_instructions.get(tone, tone_instructions['professional'])}
-2. {length_instructions.get(length, length_instructions['medium'])}
-3. Highlight 2-3 relevant skills/experiences from the resume that match the job description
-4. Show genuine interest in the company and role
-5. Include a clear call-to-action
-6. Make it personalized and avoid generic phrases
-
-**Format:**
-Subject: [Write an engaging subject line]
-
-Body:
-[Write the email body]
-
-Make sure to start with "Subject:" on its own line.
-"""
-        return prompt
+        return COLD_EMAIL.render(
+            tone=tone_instructions.get(tone, tone_instructions['professional']),
+            length=length_instructions.get(length, length_instructions['medium']),
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
     
     def _parse_email_response(self, response: str, job_title: str, company_name: str) -> tuple:
         """Parse the AI response to extract subject and body"""
@@ -176,38 +179,265 @@ class ResumeParserService:
         return parsed_data
 
 
+class ResumeProfileService:
+    """
+    Structured resume profile (skills, experience, projects, education),
+    extracted once per resume content hash and reused by every prompt
+    """
+    
+    PROFILE_TTL = 30 * 86400
+    SYSTEM_PROMPT = "You extract structured data from resumes. Return only valid JSON with no commentary."
+    
+    def __init__(self):
+        self.local = LocalLRUCache(max_size=256)
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def content_hash(content: str) -> str:
+        """Hash of the resume text, insensitive to whitespace differences"""
+        normalized = " ".join((content or "").split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    
+    def remember(self, content: str, profile: Dict[str, Any]):
+        """Seed the cache with a profile loaded from Resume.parsed_data"""
+        self.local.set(f"resume_profile:{self.content_hash(content)}", profile, expire=self.PROFILE_TTL)
+    
+    async def get_profile(self, content: str, wait: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return the structured profile, extracting it on first sight.
+        With wait=False a profile that isn't cached yet is extracted in the
+        background and None is returned straight away.
+        """
+        if not llm_gateway.is_configured or not content:
+            return None
+        
+        key = f"resume_profile:{self.content_hash(content)}"
+        profile = self.local.get(key)
+        if profile is not None:
+            return profile
+        
+        if not wait:
+            profile = await async_cache.get(key)
+            if profile is not None:
+                self.local.set(key, profile, expire=self.PROFILE_TTL)
+                return profile
+        
+        # Concurrent callers for the same resume share one lookup/extraction
+        task = self._inflight.get(key)
+        if task is None:
+            scope = usage_recorder.current()
+            task = asyncio.ensure_future(self._load(key, content, scope.user_id if scope else None))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._loaded(key, done))
+        
+        if not wait:
+            return None
+        
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            print(f"Resume profile error: {e}")
+            return None
+    
+    def _loaded(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Background extractions have no caller to report their failure
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Resume profile error: {task.exception()}")
+    
+    async def _load(self, key: str, content: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        profile = await async_cache.get(key)
+        if profile is None:
+            # Recorded on its own: the request that started it may finish first
+            with usage_recorder.track("background:resume_profile", "resume_profile", user_id):
+                profile = await self._extract(content)
+            if profile is None:
+                return None
+            await async_cache.set(key, profile, self.PROFILE_TTL)
+        
+        self.local.set(key, profile, expire=self.PROFILE_TTL)
+        return profile
+    
+    async def sync_parsed_data(self, content: str, parsed_data: Optional[str], wait: bool = True) -> Optional[str]:
+        """
+        Make sure a stored Resume.parsed_data carries the profile for this
+        content. Returns the updated JSON string, or None if nothing changed
+        (or, with wait=False, if the profile is still being extracted).
+        """
+        try:
+            parsed = json.loads(parsed_data) if parsed_data else {}
+        except json.JSONDecodeError:
+            parsed = {}
+        
+        content_hash = self.content_hash(content)
+        if parsed.get("content_hash") == content_hash and parsed.get("profile"):
+            self.remember(content, parsed["profile"])
+            return None
+        
+        profile = await self.get_profile(content, wait=wait)
+        if not profile:
+            return None
+        
+        parsed["content_hash"] = content_hash
+        parsed["profile"] = profile
+        return json.dumps(parsed)
+    
+    async def prompt_text(self, content: str) -> str:
+        """
+        Compact profile text for prompts. Until the profile has been
+        extracted (in the background) the raw resume is returned, which the
+        prompt builders then fit to the task's token budget.
+        """
+        profile = await self.get_profile(content, wait=False)
+        if not profile:
+            return content
+        
+        rendered = self.render_profile(profile)
+        return rendered if rendered and len(rendered) < len(content) else content
+    
+    async def _extract(self, content: str) -> Optional[Dict[str, Any]]:
+        """Run the one-off LLM extraction pass"""
+        content, _ = build_prompt_context("resume_profile", content)
+        prompt = f"""### INSTRUCTIONS:
+Extract the following information from the resume data and provide it in JSON format:
+- name
+- summary (one or two sentences)
+- skills (flat list)
+- work_experience (title, company, duration, highlights as short bullet strings, tech_stack)
+- projects (title, description, tech_stack)
+- education (degree, institution, year)
+- certifications
+
+### OUTPUT FORMAT:
+{{
+    "name": "",
+    "summary": "",
+    "skills": [],
+    "work_experience": [{{"title": "", "company": "", "duration": "", "highlights": [], "tech_stack": []}}],
+    "projects": [{{"title": "", "description": "", "tech_stack": []}}],
+    "education": [{{"degree": "", "institution": "", "year": ""}}],
+    "certifications": []
+}}
+
+Keep highlights factual and concise, and keep numbers and metrics.
+
+### RESUME DATA:
+{content}"""
+        
+        response = await llm_gateway.complete(
+            system_prompt=self.SYSTEM_PROMPT,
+            user_prompt=prompt,
+            temperature=0.0,
+            max_tokens=1500,
+            task="resume_profile",
+            validate=lambda content: parse_json_object(content) is not None
+        )
+        
+        return parse_json_object(response["content"])
+    
+    @staticmethod
+    def render_profile(profile: Dict[str, Any]) -> str:
+        """Render a profile as compact prompt text"""
+        def joined(items) -> str:
+            return ", ".join(str(item) for item in items or [] if item)
+        
+        lines = []
+        if profile.get("name"):
+            lines.append(f"Name: {profile['name']}")
+        if profile.get("summary"):
+            lines.append(f"Summary: {profile['summary']}")
+        if profile.get("skills"):
+            lines.append(f"Skills: {joined(profile['skills'])}")
+        
+        experience = profile.get("work_experience") or []
+        if experience:
+            lines.append("Experience:")
+            for job in experience:
+                header = " @ ".join(part for part in [job.get("title"), job.get("company")] if part)
+                if job.get("duration"):
+                    header += f" ({job['duration']})"
+                lines.append(f"- {header}")
+                for highlight in job.get("highlights") or []:
+                    lines.append(f"  * {highlight}")
+                if job.get("tech_stack"):
+                    lines.append(f"  Tech: {joined(job['tech_stack'])}")
+        
+        projects = profile.get("projects") or []
+        if projects:
+            lines.append("Projects:")
+            for project in projects:
+                line = f"- {project.get('title', '')}: {project.get('description', '')}"
+                if project.get("tech_stack"):
+                    line += f" (Tech: {joined(project['tech_stack'])})"
+                lines.append(line)
+        
+        education = profile.get("education") or []
+        if education:
+            lines.append("Education:")
+            for entry in education:
+                lines.append("- " + ", ".join(str(v) for v in [entry.get("degree"), entry.get("institution"), entry.get("year")] if v))
+        
+        if profile.get("certifications"):
+            lines.append(f"Certifications: {joined(profile['certifications'])}")
+        
+        return "\n".join(lines)
+
+
 class JobParserService:
+    # Parses keyed by exact description hash; the SimHash fingerprint can collide
+    _parse_cache = LocalLRUCache(max_size=1024)
+    
     @staticmethod
-    def parse_job_description(description: str, company_name: str, job_title: str) -> Dict[str, Any]:
+    def parse_job_description(
+        description: str,
+        company_name: str,
+        job_title: str,
+        job_url: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Parse job description to extract key requirements
         """
-        parsed_data = {
+        description = normalize_job_description(description)
+        digest = content_hash(description)
+        
+        cached = JobParserService._parse_cache.get(digest)
+        if cached is None:
+            cached = {
+                "required_skills": [],
+                "responsibilities": [],
+                "summary": ""
+            }
+            
+            # Extract key information
+            cached["summary"] = description[:500]
+            
+            # Basic skill extraction
+            skill_keywords = [
+                "python", "javascript", "react", "node", "sql", "aws", "docker",
+                "kubernetes", "java", "c++", "machine learning", "data science"
+            ]
+            
+            description_lower = description.lower()
+            for skill in skill_keywords:
+                if skill in description_lower:
+                    cached["required_skills"].append(skill.title())
+            
+            JobParserService._parse_cache.set(digest, cached, expire=86400)
+        
+        # Copy the lists so callers can't mutate the cached parse
+        return {
             "company": company_name,
             "title": job_title,
-            "required_skills": [],
-            "responsibilities": [],
-            "summary": ""
+            "required_skills": list(cached["required_skills"]),
+            "responsibilities": list(cached["responsibilities"]),
+            "summary": cached["summary"],
+            "fingerprint": job_fingerprint(description),
+            "canonical_url": canonicalize_url(job_url) if job_url else None
         }
-        
-        # Extract key information
-        parsed_data["summary"] = description[:500]
-        
-        # Basic skill extraction
-        skill_keywords = [
-            "python", "javascript", "react", "node", "sql", "aws", "docker",
-            "kubernetes", "java", "c++", "machine learning", "data science"
-        ]
-        
-        description_lower = description.lower()
-        for skill in skill_keywords:
-            if skill in description_lower:
-                parsed_data["required_skills"].append(skill.title())
-        
-        return parsed_data
 
 
 # Service instances
 email_generator = EmailGeneratorService()
 resume_parser = ResumeParserService()
+resume_profiles = ResumeProfileService()
 job_parser = JobParserService()
@@ -8,11 +8,20 @@ Enhanced AI Services for LanditAI
 - Skills Gap Analysis
 """
 
-from groq import Groq
-from typing import Dict, Any, Optional, List
-from config import settings
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
+from llm import llm_gateway
+from resilience import LLMUnavailableError
+from cache import async_cache
+from normalization import canonicalize_url, normalize_job_description, job_fingerprint
+from prompt_budget import build_prompt_context
+from prompts import LATEX_RESUME, COVER_LETTER, RESUME_ANALYSIS, INTERVIEW_PREP, BUNDLE, QUICK_EMAIL
+from services import resume_profiles, is_complete_email
+from streaming import IncrementalJSONParser
+from structured import complete_structured, finalize_structured, is_valid_output
+from schemas import ResumeAnalysisOutput, InterviewPrepOutput
 import json
 import re
+import hashlib
 import httpx
 from bs4 import BeautifulSoup
 import asyncio
@@ -28,11 +37,21 @@ class JobScraperService:
         "Accept-Language": "en-US,en;q=0.5",
     }
     
+    SCRAPE_CACHE_TTL = 6 * 3600
+    
     async def scrape_job_url(self, url: str) -> Dict[str, Any]:
         """
         Scrape job details from a URL
         Supports: LinkedIn, Indeed, Glassdoor, generic job pages
+        Results are cached by canonical URL, so links that differ only in
+        tracking parameters are fetched once.
         """
+        canonical_url = canonicalize_url(url)
+        cache_key = f"scrape:{hashlib.sha256(canonical_url.encode('utf-8')).hexdigest()}"
+        cached = await async_cache.get(cache_key)
+        if cached:
+            return cached
+        
         try:
             async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
                 response = await client.get(url, headers=self.HEADERS)
@@ -43,20 +62,25 @@ class JobScraperService:
             
             # Route to appropriate parser
             if 'linkedin' in domain:
-                return self._parse_linkedin(soup, url)
+                job_data = self._parse_linkedin(soup, canonical_url)
             elif 'indeed' in domain:
-                return self._parse_indeed(soup, url)
+                job_data = self._parse_indeed(soup, canonical_url)
             elif 'glassdoor' in domain:
-                return self._parse_glassdoor(soup, url)
+                job_data = self._parse_glassdoor(soup, canonical_url)
             elif 'greenhouse' in domain:
-                return self._parse_greenhouse(soup, url)
+                job_data = self._parse_greenhouse(soup, canonical_url)
             elif 'lever' in domain:
-                return self._parse_lever(soup, url)
+                job_data = self._parse_lever(soup, canonical_url)
             else:
-                return self._parse_generic(soup, url)
+                job_data = self._parse_generic(soup, canonical_url)
                 
         except Exception as e:
             raise Exception(f"Failed to scrape job URL: {str(e)}")
+        
+        job_data["job_description"] = normalize_job_description(job_data.get("job_description", ""))
+        job_data["fingerprint"] = job_fingerprint(job_data["job_description"])
+        await async_cache.set(cache_key, job_data, self.SCRAPE_CACHE_TTL)
+        return job_data
     
     def _parse_linkedin(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
         """Parse LinkedIn job posting"""
@@ -256,86 +280,35 @@ class JobScraperService:
 class LatexResumeService:
     """Generate and tune LaTeX resumes"""
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
-    
-    def generate_latex_resume(
+    async def generate_latex_resume(
         self,
         resume_content: str,
         job_description: Optional[str] = None,
         template_style: str = "modern",
-        emphasis_skills: Optional[List[str]] = None
+        emphasis_skills: Optional[List[str]] = None,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """
         Generate a LaTeX resume tuned for the job description
         """
-        if not self.client:
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
-        template_instructions = {
-            "modern": "Use a clean, modern design with subtle colors and good whitespace",
-            "classic": "Use a traditional, professional layout suitable for conservative industries",
-            "minimal": "Use a minimalist design with maximum content density",
-            "creative": "Use a creative design with visual elements (suitable for design/creative roles)",
-            "academic": "Use an academic CV style with detailed sections for publications and research"
-        }
-        
-        skills_emphasis = ""
-        if emphasis_skills:
-            skills_emphasis = f"\n- Emphasize these skills prominently: {', '.join(emphasis_skills)}"
+        job_description = normalize_job_description(job_description)
         
-        job_tuning = ""
-        if job_description:
-            job_tuning = f"""
-**Target Job Description:**
-{job_description[:2000]}
-
-**Job-Specific Tuning:**
-- Reorder sections to highlight most relevant experience first
-- Use keywords from the job description naturally
-- Quantify achievements that align with job requirements
-- Adjust skill emphasis to match job needs"""
+        prompt = self._build_prompt(resume_content, job_description, template_style, emphasis_skills)
         
-        prompt = f"""Generate a complete, compilable LaTeX resume based on the following content.
-
-**Resume Content:**
-{resume_content[:3000]}
-{job_tuning}
-
-**Style Requirements:**
-- Template Style: {template_style} - {template_instructions.get(template_style, template_instructions['modern'])}
-{skills_emphasis}
-
-**Technical Requirements:**
-1. Use standard LaTeX packages (geometry, hyperref, fontspec if needed, titlesec, enumitem)
-2. Ensure the code compiles without errors
-3. Include proper sections: Contact Info, Summary/Objective, Experience, Education, Skills
-4. Use professional formatting with consistent spacing
-5. Make it ATS-friendly (no graphics, simple structure)
-6. Add comments for easy customization
-
-**Output Format:**
-Return ONLY the complete LaTeX code, starting with \\documentclass and ending with \\end{{document}}.
-Do not include any explanations or markdown code blocks."""
-
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert LaTeX resume designer. Generate clean, professional, ATS-friendly LaTeX resumes that compile without errors."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
+            response = await llm_gateway.complete(
+                **prompt,
                 temperature=0.3,
-                max_tokens=4000
+                max_tokens=4000,
+                task="latex",
+                use_cache=not regenerate,
+                validate=self._is_complete_latex
             )
             
-            latex_code = response.choices[0].message.content or ""
+            latex_code = response["content"]
             
             # Clean up the response
             latex_code = self._clean_latex_response(latex_code)
@@ -343,12 +316,87 @@ Do not include any explanations or markdown code blocks."""
             return {
                 "latex_code": latex_code,
                 "template_style": template_style,
-                "tokens_used": response.usage.total_tokens if response.usage else 0
+                "tokens_used": response["tokens_used"],
+                "prompt_version": response["prompt_version"]
             }
             
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise Exception(f"Error generating LaTeX resume: {str(e)}")
     
+    async def stream_latex_resume(
+        self,
+        resume_content: str,
+        job_description: Optional[str] = None,
+        template_style: str = "modern",
+        emphasis_skills: Optional[List[str]] = None,
+        regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream LaTeX generation as ("token", text) events, ending with a
+        ("done", result) event shaped like generate_latex_resume()
+        """
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        job_description = normalize_job_description(job_description)
+        
+        prompt = self._build_prompt(resume_content, job_description, template_style, emphasis_skills)
+        
+        async for chunk in llm_gateway.stream(
+            **prompt,
+            temperature=0.3,
+            max_tokens=4000,
+            task="latex",
+            use_cache=not regenerate
+        ):
+            if chunk["type"] == "delta":
+                yield "token", chunk["content"]
+            else:
+                yield "done", {
+                    "latex_code": self._clean_latex_response(chunk["content"]),
+                    "template_style": template_style,
+                    "tokens_used": chunk["tokens_used"],
+                    "prompt_version": chunk["prompt_version"]
+                }
+    
+    def _build_prompt(
+        self,
+        resume_content: str,
+        job_description: Optional[str],
+        template_style: str,
+        emphasis_skills: Optional[List[str]]
+    ) -> Dict[str, str]:
+        """Render the LaTeX template; returns the gateway prompt arguments"""
+        resume_content, job_description = build_prompt_context("latex", resume_content, job_description)
+        
+        template_instructions = {
+            "modern": "Use a clean, modern design with subtle colors and good whitespace",
+            "classic": "Use a traditional, professional layout suitable for conservative industries",
+            "minimal": "Use a minimalist design with maximum content density",
+            "creative": "Use a creative design with visual elements (suitable for design/creative roles)",
+            "academic": "Use an academic CV style with detailed sections for publications and research"
+        }
+        
+        skills_emphasis = ""
+        if emphasis_skills:
+            skills_emphasis = f"\n- Emphasize these skills prominently: {', '.join(emphasis_skills)}"
+        
+        job_section = ""
+        if job_description:
+            job_section = f"\n**Target Job Description:**\n{job_description}\n"
+        
+        return LATEX_RESUME.render(
+            template_style=f"{template_style} - {template_instructions.get(template_style, template_instructions['modern'])}",
+            skills_emphasis=skills_emphasis,
+            job_section=job_section,
+            resume_content=resume_content
+        )
+    
+    def _is_complete_latex(self, content: str) -> bool:
+        return "\\documentclass" in content and "\\end{document}" in content
+    
     def _clean_latex_response(self, content: str) -> str:
         """Clean up AI response to get pure LaTeX code"""
         # Remove markdown code blocks if present
@@ -371,10 +419,7 @@ Do not include any explanations or markdown code blocks."""
 class CoverLetterService:
     """Generate tailored cover letters"""
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
-    
-    def generate_cover_letter(
+    async def generate_cover_letter(
         self,
         resume_content: str,
         job_description: str,
@@ -382,12 +427,98 @@ class CoverLetterService:
         job_title: str,
         tone: str = "professional",
         include_salary_expectation: bool = False,
-        custom_points: Optional[List[str]] = None
+        custom_points: Optional[List[str]] = None,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """Generate a tailored cover letter"""
-        if not self.client:
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
+        
+        prompt = self._build_prompt(
+            resume_content, job_description, company_name, job_title,
+            tone, include_salary_expectation, custom_points
+        )
+        
+        try:
+            response = await llm_gateway.complete(
+                **prompt,
+                temperature=0.7,
+                max_tokens=1500,
+                task="cover_letter",
+                use_cache=not regenerate,
+                validate=lambda content: len(content.split()) >= 150
+            )
+            
+            content = response["content"]
+            return {
+                "cover_letter": content.strip(),
+                "tokens_used": response["tokens_used"],
+                "prompt_version": response["prompt_version"]
+            }
+            
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error generating cover letter: {str(e)}")
+    
+    async def stream_cover_letter(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        tone: str = "professional",
+        include_salary_expectation: bool = False,
+        custom_points: Optional[List[str]] = None,
+        regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a cover letter as ("token", text) events, ending with a
+        ("done", result) event shaped like generate_cover_letter()
+        """
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
+        
+        prompt = self._build_prompt(
+            resume_content, job_description, company_name, job_title,
+            tone, include_salary_expectation, custom_points
+        )
+        
+        async for chunk in llm_gateway.stream(
+            **prompt,
+            temperature=0.7,
+            max_tokens=1500,
+            task="cover_letter",
+            use_cache=not regenerate
+        ):
+            if chunk["type"] == "delta":
+                yield "token", chunk["content"]
+            else:
+                yield "done", {
+                    "cover_letter": chunk["content"].strip(),
+                    "tokens_used": chunk["tokens_used"],
+                    "prompt_version": chunk["prompt_version"]
+                }
+    
+    def _build_prompt(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        tone: str,
+        include_salary_expectation: bool,
+        custom_points: Optional[List[str]]
+    ) -> Dict[str, str]:
+        """Render the cover letter template; returns the gateway prompt arguments"""
+        resume_content, job_description = build_prompt_context("cover_letter", resume_content, job_description)
+        
         tone_instructions = {
             "professional": "Formal and professional, suitable for corporate environments",
             "enthusiastic": "Energetic and passionate while remaining professional",
@@ -397,79 +528,34 @@ class CoverLetterService:
         
         custom_section = ""
         if custom_points:
-            custom_section = f"\n**Points to Include:**\n" + "\n".join(f"- {point}" for point in custom_points)
+            custom_section = "\n\n**Points to Include:**\n" + "\n".join(f"- {point}" for point in custom_points)
         
         salary_section = ""
         if include_salary_expectation:
             salary_section = "\n- Include a professional statement about being open to discussing compensation"
         
-        prompt = f"""Generate a professional cover letter for the following job application:
-
-**Job Details:**
-- Company: {company_name}
-- Position: {job_title}
-- Job Description: {job_description[:2000]}
-
-**Candidate Resume:**
-{resume_content[:2000]}
-
-**Writing Requirements:**
-- Tone: {tone_instructions.get(tone, tone_instructions['professional'])}
-- Length: 3-4 paragraphs (300-400 words)
-- Structure: Opening hook → Relevant experience/skills → Why this company → Call to action
-{custom_section}
-{salary_section}
-
-**Guidelines:**
-1. Start with an engaging opening that shows genuine interest
-2. Connect specific resume achievements to job requirements
-3. Demonstrate knowledge of the company
-4. End with a confident call to action
-5. Avoid generic phrases like "I am writing to apply..."
-6. Use specific, quantified achievements where possible
-
-**Output Format:**
-Return only the cover letter text, ready to copy-paste. Do not include any headers or signatures (the candidate will add those)."""
-
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert career coach and cover letter writer. Generate compelling, personalized cover letters that get interviews."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            content = response.choices[0].message.content or ""
-            return {
-                "cover_letter": content.strip(),
-                "tokens_used": response.usage.total_tokens if response.usage else 0
-            }
-            
-        except Exception as e:
-            raise Exception(f"Error generating cover letter: {str(e)}")
+        return COVER_LETTER.render(
+            tone=tone_instructions.get(tone, tone_instructions['professional']),
+            salary_section=salary_section,
+            custom_section=custom_section,
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
 
 
 class ResumeAnalyzerService:
     """Analyze resumes against job descriptions"""
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
-    
-    def analyze_resume(
+    async def analyze_resume(
         self,
         resume_content: str,
         job_description: str,
         job_title: str = "",
-        company_name: str = ""
+        company_name: str = "",
+        regenerate: bool = False,
+        task: str = "analysis"
     ) -> Dict[str, Any]:
         """
         Comprehensive resume analysis including:
@@ -478,185 +564,392 @@ class ResumeAnalyzerService:
         - Missing keywords
         - Improvement suggestions
         """
-        if not self.client:
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
-        prompt = f"""Analyze this resume against the job description and provide a detailed assessment.
-
-**Job Details:**
-- Company: {company_name}
-- Position: {job_title}
-- Job Description: {job_description[:2000]}
-
-**Resume Content:**
-{resume_content[:3000]}
-
-**Provide analysis in the following JSON format (return ONLY valid JSON):**
-{{
-    "ats_score": <number 0-100>,
-    "match_score": <number 0-100>,
-    "keyword_match": {{
-        "matched_keywords": ["keyword1", "keyword2"],
-        "missing_keywords": ["keyword1", "keyword2"],
-        "match_percentage": <number>
-    }},
-    "skills_analysis": {{
-        "matched_skills": ["skill1", "skill2"],
-        "missing_skills": ["skill1", "skill2"],
-        "transferable_skills": ["skill1", "skill2"]
-    }},
-    "experience_relevance": {{
-        "score": <number 0-100>,
-        "relevant_experiences": ["experience1", "experience2"],
-        "gaps": ["gap1", "gap2"]
-    }},
-    "ats_issues": [
-        {{"issue": "description", "severity": "high|medium|low", "fix": "suggestion"}}
-    ],
-    "improvement_suggestions": [
-        {{"priority": "high|medium|low", "category": "category", "suggestion": "detailed suggestion"}}
-    ],
-    "summary": "2-3 sentence overall assessment",
-    "strengths": ["strength1", "strength2"],
-    "weaknesses": ["weakness1", "weakness2"]
-}}"""
-
+        prompt = await self._build_prompt(resume_content, job_description, job_title, company_name)
+        
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert ATS system and resume analyst. Provide detailed, actionable analysis in valid JSON format only."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
+            result = await complete_structured(
+                ResumeAnalysisOutput,
+                **prompt,
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                task=task,
+                use_cache=not regenerate
             )
             
-            content = response.choices[0].message.content or ""
-            
-            # Parse JSON response
-            try:
-                # Clean up markdown if present
-                content = re.sub(r'^```(?:json)?\s*\n?', '', content)
-                content = re.sub(r'\n?```\s*$', '', content)
-                analysis = json.loads(content)
-            except json.JSONDecodeError:
-                # Return a basic structure if parsing fails
-                analysis = {
-                    "ats_score": 70,
-                    "match_score": 65,
-                    "summary": content[:500] if content else "Analysis unavailable",
-                    "error": "Could not parse detailed analysis"
-                }
-            
-            analysis["tokens_used"] = response.usage.total_tokens if response.usage else 0
+            analysis = result["data"]
+            analysis["tokens_used"] = result["tokens_used"]
+            analysis["prompt_version"] = result["prompt_version"]
             return analysis
-            
+        
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise Exception(f"Error analyzing resume: {str(e)}")
+    
+    async def stream_analysis(
+        self,
+        resume_content: str,
+        job_description: str,
+        job_title: str = "",
+        company_name: str = "",
+        regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream an analysis as ("section", {"name", "value"}) events, one per
+        top-level field (ats_score, keyword_match, ...) as soon as it is
+        complete, ending with a ("done", result) event shaped like analyze_resume()
+        """
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        prompt = await self._build_prompt(resume_content, job_description, job_title, company_name)
+        parser = IncrementalJSONParser()
+        
+        async for chunk in llm_gateway.stream(
+            **prompt,
+            temperature=0.3,
+            max_tokens=2000,
+            task="analysis",
+            use_cache=not regenerate,
+            validate=lambda content: is_valid_output(ResumeAnalysisOutput, content),
+            json_mode=True
+        ):
+            if chunk["type"] == "delta":
+                for kind, name, value in parser.feed(chunk["content"]):
+                    if kind == "field":
+                        yield "section", {"name": name, "value": value}
+            else:
+                result = await finalize_structured(
+                    ResumeAnalysisOutput, chunk, **prompt,
+                    temperature=0.3, max_tokens=2000, task="analysis", use_cache=not regenerate
+                )
+                # Fields regenerated after the stream ended were never sent as sections
+                for name in result["regenerated_fields"]:
+                    yield "section", {"name": name, "value": result["data"][name]}
+                analysis = result["data"]
+                analysis["tokens_used"] = result["tokens_used"]
+                analysis["prompt_version"] = result["prompt_version"]
+                yield "done", analysis
+    
+    async def _build_prompt(
+        self,
+        resume_content: str,
+        job_description: str,
+        job_title: str,
+        company_name: str
+    ) -> Dict[str, str]:
+        job_description = normalize_job_description(job_description)
+        
+        resume_content, job_description = build_prompt_context("analysis", resume_content, job_description)
+        
+        return RESUME_ANALYSIS.render(
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
 
 
 class InterviewPrepService:
     """Generate interview preparation materials"""
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
-    
-    def generate_interview_questions(
+    async def generate_interview_questions(
         self,
         resume_content: str,
         job_description: str,
         job_title: str,
         company_name: str,
-        question_types: Optional[List[str]] = None
+        question_types: Optional[List[str]] = None,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """Generate likely interview questions with suggested answers"""
-        if not self.client:
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
-        if not question_types:
-            question_types = ["behavioral", "technical", "situational", "company-specific"]
+        prompt = await self._build_prompt(resume_content, job_description, job_title, company_name, question_types)
         
-        prompt = f"""Generate interview preparation materials for this job application.
-
-**Job Details:**
-- Company: {company_name}
-- Position: {job_title}
-- Job Description: {job_description[:2000]}
-
-**Candidate Resume:**
-{resume_content[:2000]}
-
-**Generate questions for these categories:** {', '.join(question_types)}
-
-**Return as JSON with this structure:**
-{{
-    "questions": [
-        {{
-            "category": "category_name",
-            "question": "interview question",
-            "why_asked": "why interviewer might ask this",
-            "suggested_answer": "framework or key points for answer",
-            "resume_connection": "relevant resume experience to mention"
-        }}
-    ],
-    "company_research_tips": ["tip1", "tip2"],
-    "questions_to_ask_interviewer": ["question1", "question2"],
-    "red_flags_to_avoid": ["flag1", "flag2"],
-    "salary_negotiation_tips": ["tip1", "tip2"]
-}}
-
-Generate 3-4 questions per category."""
-
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert interview coach with experience at top companies. Generate realistic, helpful interview preparation materials."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
+            result = await complete_structured(
+                InterviewPrepOutput,
+                **prompt,
                 temperature=0.6,
-                max_tokens=3000
+                max_tokens=3000,
+                task="interview_prep",
+                use_cache=not regenerate
             )
             
-            content = response.choices[0].message.content or ""
-            
-            try:
-                content = re.sub(r'^```(?:json)?\s*\n?', '', content)
-                content = re.sub(r'\n?```\s*$', '', content)
-                prep_materials = json.loads(content)
-            except json.JSONDecodeError:
-                prep_materials = {"raw_content": content}
-            
-            prep_materials["tokens_used"] = response.usage.total_tokens if response.usage else 0
+            prep_materials = result["data"]
+            prep_materials["tokens_used"] = result["tokens_used"]
+            prep_materials["prompt_version"] = result["prompt_version"]
             return prep_materials
-            
+        
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise Exception(f"Error generating interview prep: {str(e)}")
+    
+    async def stream_interview_questions(
+        self,
+        resume_content: str,
+        job_description: str,
+        job_title: str,
+        company_name: str,
+        question_types: Optional[List[str]] = None,
+        regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream interview prep as ("question", {"index", "question"}) events as
+        each question object closes and ("section", {"name", "value"}) for the
+        other top-level fields, ending with a ("done", result) event shaped
+        like generate_interview_questions()
+        """
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        prompt = await self._build_prompt(resume_content, job_description, job_title, company_name, question_types)
+        parser = IncrementalJSONParser()
+        questions = 0
+        
+        async for chunk in llm_gateway.stream(
+            **prompt,
+            temperature=0.6,
+            max_tokens=3000,
+            task="interview_prep",
+            use_cache=not regenerate,
+            validate=lambda content: is_valid_output(InterviewPrepOutput, content),
+            json_mode=True
+        ):
+            if chunk["type"] == "delta":
+                for kind, name, value in parser.feed(chunk["content"]):
+                    if kind == "item" and name == "questions":
+                        yield "question", {"index": questions, "question": value}
+                        questions += 1
+                    elif kind == "field" and name != "questions":
+                        yield "section", {"name": name, "value": value}
+            else:
+                result = await finalize_structured(
+                    InterviewPrepOutput, chunk, **prompt,
+                    temperature=0.6, max_tokens=3000, task="interview_prep", use_cache=not regenerate
+                )
+                for name in result["regenerated_fields"]:
+                    yield "section", {"name": name, "value": result["data"][name]}
+                prep_materials = result["data"]
+                prep_materials["tokens_used"] = result["tokens_used"]
+                prep_materials["prompt_version"] = result["prompt_version"]
+                yield "done", prep_materials
+    
+    async def _build_prompt(
+        self,
+        resume_content: str,
+        job_description: str,
+        job_title: str,
+        company_name: str,
+        question_types: Optional[List[str]]
+    ) -> Dict[str, str]:
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
+        
+        if not question_types:
+            question_types = ["behavioral", "technical", "situational", "company-specific"]
+        
+        resume_content, job_description = build_prompt_context("interview_prep", resume_content, job_description)
+        
+        return INTERVIEW_PREP.render(
+            question_types=", ".join(question_types),
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
+
+
+class BundleGeneratorService:
+    """
+    Generate email, cover letter and analysis from one JSON completion.
+    The resume and job description are sent once instead of once per artifact;
+    each section is validated on its own so a bad section can be regenerated
+    individually without discarding the others.
+    """
+    
+    ARTIFACTS = ("email", "cover_letter", "analysis")
+    
+    # Output token allowance per section (matches the individual services)
+    MAX_TOKENS = {
+        "email": 1000,
+        "cover_letter": 1500,
+        "analysis": 2000
+    }
+    
+    async def generate_bundle(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        artifacts: List[str],
+        email_tone: str = "professional",
+        email_length: str = "medium",
+        cover_letter_tone: str = "professional",
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Returns {"sections": {name: result}, "invalid": {name: reason}, "tokens_used": n}.
+        Section results are shaped like the individual services' output.
+        """
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        artifacts = [name for name in self.ARTIFACTS if name in artifacts]
+        job_description = normalize_job_description(job_description)
+        
+        prompt = self._build_prompt(
+            resume_content, job_description, company_name, job_title, artifacts,
+            email_tone, email_length, cover_letter_tone
+        )
+        
+        try:
+            response = await llm_gateway.complete(
+                **prompt,
+                temperature=0.5,
+                max_tokens=sum(self.MAX_TOKENS[name] for name in artifacts),
+                task="bundle",
+                use_cache=not regenerate,
+                json_mode=True,
+                validate=lambda content: not self.parse_bundle(content, artifacts)[1]
+            )
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error generating bundle: {str(e)}")
+        
+        sections, invalid = self.parse_bundle(response["content"], artifacts)
+        return {
+            "sections": sections,
+            "invalid": invalid,
+            "tokens_used": response["tokens_used"],
+            "prompt_version": response["prompt_version"]
+        }
+    
+    def parse_bundle(self, content: str, artifacts: List[str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Validate each requested section independently"""
+        try:
+            content = re.sub(r'^```(?:json)?\s*\n?', '', content.strip())
+            content = re.sub(r'\n?```\s*$', '', content)
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            return {}, {name: f"Invalid JSON: {e.msg}" for name in artifacts}
+        
+        if not isinstance(data, dict):
+            return {}, {name: "Response is not a JSON object" for name in artifacts}
+        
+        validators = {
+            "email": self._validate_email,
+            "cover_letter": self._validate_cover_letter,
+            "analysis": self._validate_analysis
+        }
+        
+        sections: Dict[str, Any] = {}
+        invalid: Dict[str, str] = {}
+        for name in artifacts:
+            if name not in data:
+                invalid[name] = "Missing section"
+                continue
+            try:
+                sections[name] = validators[name](data[name])
+            except ValueError as e:
+                invalid[name] = str(e)
+        return sections, invalid
+    
+    def _validate_email(self, section: Any) -> Dict[str, Any]:
+        if not isinstance(section, dict):
+            raise ValueError("email must be an object")
+        subject = section.get("subject")
+        body = section.get("body")
+        if not isinstance(subject, str) or not subject.strip():
+            raise ValueError("email.subject is empty")
+        if not isinstance(body, str) or len(body.strip()) < 50:
+            raise ValueError("email.body is missing or too short")
+        return {"subject": subject.strip(), "body": body.strip(), "tokens_used": 0}
+    
+    def _validate_cover_letter(self, section: Any) -> Dict[str, Any]:
+        # Accept {"cover_letter": "..."} as well as a bare string
+        if isinstance(section, dict):
+            section = section.get("cover_letter") or section.get("text")
+        if not isinstance(section, str) or len(section.strip()) < 200:
+            raise ValueError("cover_letter is missing or too short")
+        return {"cover_letter": section.strip(), "tokens_used": 0}
+    
+    def _validate_analysis(self, section: Any) -> Dict[str, Any]:
+        if not isinstance(section, dict):
+            raise ValueError("analysis must be an object")
+        for field in ("ats_score", "match_score"):
+            value = section.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"analysis.{field} must be a number")
+            if not 0 <= value <= 100:
+                raise ValueError(f"analysis.{field} out of range")
+        if not isinstance(section.get("summary"), str) or not section["summary"].strip():
+            raise ValueError("analysis.summary is empty")
+        return {**section, "tokens_used": 0}
+    
+    def _build_prompt(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        artifacts: List[str],
+        email_tone: str,
+        email_length: str,
+        cover_letter_tone: str
+    ) -> Dict[str, str]:
+        """One prompt carrying the shared context; every section format is in the static prefix"""
+        resume_content, job_description = build_prompt_context("bundle", resume_content, job_description)
+        
+        email_lengths = {
+            "short": "150-200 words",
+            "medium": "250-350 words",
+            "long": "400-500 words"
+        }
+        
+        options = []
+        if "email" in artifacts:
+            options.append(f"- email: {email_tone} tone, {email_lengths.get(email_length, email_lengths['medium'])}")
+        if "cover_letter" in artifacts:
+            options.append(f"- cover_letter: {cover_letter_tone} tone")
+        
+        return BUNDLE.render(
+            artifacts=", ".join(artifacts),
+            options="\n".join(options),
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
 
 
 class QuickGeneratorService:
     """Quick generation service - no database storage required"""
     
+    # Per-artifact timeouts in seconds (override with options["timeouts"])
+    ARTIFACT_TIMEOUTS = {
+        "email": 30.0,
+        "cover_letter": 45.0,
+        "analysis": 45.0,
+        "interview_prep": 75.0,
+        "latex_resume": 90.0
+    }
+    
     def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
         self.email_service = None
         self.cover_letter_service = CoverLetterService()
         self.latex_service = LatexResumeService()
         self.analyzer_service = ResumeAnalyzerService()
         self.interview_service = InterviewPrepService()
+        self.bundle_service = BundleGeneratorService()
     
     async def quick_generate_all(
         self,
@@ -669,11 +962,15 @@ class QuickGeneratorService:
         """
         Generate all materials at once without saving to database.
         Returns email, cover letter, analysis, and interview prep.
+        Artifacts are generated concurrently; any that fail or time out
+        are reported under "errors" while the rest are still returned.
+        With options["single_call"], email, cover letter and analysis come
+        from one JSON completion; invalid sections are regenerated individually.
         """
         if not options:
             options = {}
         
-        results = {
+        results: Dict[str, Any] = {
             "job_info": {
                 "company_name": company_name,
                 "job_title": job_title
@@ -686,144 +983,286 @@ class QuickGeneratorService:
         analyze_resume = options.get("analyze_resume", True)
         generate_interview_prep = options.get("generate_interview_prep", False)
         generate_latex = options.get("generate_latex", False)
+        regenerate = bool(options.get("regenerate", False))
         
-        try:
-            if generate_email:
-                email_result = self._generate_quick_email(
-                    resume_content, job_description, company_name, job_title,
-                    options.get("email_tone", "professional"),
-                    options.get("email_length", "medium")
-                )
-                results["email"] = email_result
-            
-            if generate_cover_letter:
-                cl_result = self.cover_letter_service.generate_cover_letter(
-                    resume_content, job_description, company_name, job_title,
-                    options.get("cover_letter_tone", "professional")
-                )
-                results["cover_letter"] = cl_result
-            
-            if analyze_resume:
-                analysis_result = self.analyzer_service.analyze_resume(
-                    resume_content, job_description, job_title, company_name
-                )
-                results["analysis"] = analysis_result
-            
-            if generate_interview_prep:
-                interview_result = self.interview_service.generate_interview_questions(
-                    resume_content, job_description, job_title, company_name
-                )
-                results["interview_prep"] = interview_result
-            
-            if generate_latex:
-                latex_result = self.latex_service.generate_latex_resume(
-                    resume_content, job_description,
-                    options.get("latex_template", "modern")
-                )
-                results["latex_resume"] = latex_result
-            
+        factories = {
+            "email": lambda: self.generate_quick_email(
+                resume_content, job_description, company_name, job_title,
+                options.get("email_tone", "professional"),
+                options.get("email_length", "medium"),
+                regenerate=regenerate
+            ),
+            "cover_letter": lambda: self.cover_letter_service.generate_cover_letter(
+                resume_content, job_description, company_name, job_title,
+                options.get("cover_letter_tone", "professional"),
+                regenerate=regenerate
+            ),
+            "analysis": lambda: self.analyzer_service.analyze_resume(
+                resume_content, job_description, job_title, company_name,
+                regenerate=regenerate
+            ),
+            "interview_prep": lambda: self.interview_service.generate_interview_questions(
+                resume_content, job_description, job_title, company_name,
+                regenerate=regenerate
+            ),
+            "latex_resume": lambda: self.latex_service.generate_latex_resume(
+                resume_content, job_description,
+                options.get("latex_template", "modern"),
+                regenerate=regenerate
+            )
+        }
+        requested = [
+            name for name, wanted in (
+                ("email", generate_email),
+                ("cover_letter", generate_cover_letter),
+                ("analysis", analyze_resume),
+                ("interview_prep", generate_interview_prep),
+                ("latex_resume", generate_latex)
+            ) if wanted
+        ]
+        
+        # A single-artifact "bundle" saves nothing, so only bundle two or more
+        bundled = []
+        if options.get("single_call", False):
+            bundled = [name for name in requested if name in BundleGeneratorService.ARTIFACTS]
+            if len(bundled) < 2:
+                bundled = []
+        
+        jobs = {name: factories[name]() for name in requested if name not in bundled}
+        if bundled:
+            jobs["bundle"] = self.bundle_service.generate_bundle(
+                resume_content, job_description, company_name, job_title, bundled,
+                email_tone=options.get("email_tone", "professional"),
+                email_length=options.get("email_length", "medium"),
+                cover_letter_tone=options.get("cover_letter_tone", "professional"),
+                regenerate=regenerate
+            )
+        
+        if not jobs:
             return results
-            
+        
+        timeouts = {**self.ARTIFACT_TIMEOUTS, **(options.get("timeouts") or {})}
+        if bundled:
+            timeouts["bundle"] = max(float(timeouts[name]) for name in bundled)
+        outcomes = await asyncio.gather(*(
+            self._run_artifact(name, coro, float(timeouts[name]))
+            for name, coro in jobs.items()
+        ))
+        
+        errors = {}
+        bundle = None
+        for name, value, error in outcomes:
+            if name == "bundle":
+                bundle = {"invalid": {name: error for name in bundled}, "sections": {}, "tokens_used": 0} if error else value
+            elif error is None:
+                results[name] = value
+            else:
+                errors[name] = error
+        
+        if bundle is not None:
+            results.update(bundle["sections"])
+            # Fall back to one call per section that did not validate
+            fallbacks = list(bundle["invalid"].keys())
+            if fallbacks:
+                retried = await asyncio.gather(*(
+                    self._run_artifact(name, factories[name](), float(timeouts[name]))
+                    for name in fallbacks
+                ))
+                for name, value, error in retried:
+                    if error is None:
+                        results[name] = value
+                    else:
+                        errors[name] = error
+            results["bundle"] = {
+                "mode": "single_call",
+                "artifacts": bundled,
+                "tokens_used": bundle["tokens_used"],
+                "prompt_version": bundle.get("prompt_version"),
+                "fallbacks": bundle["invalid"]
+            }
+        
+        # Nothing usable came back - surface it as a failure like before
+        if len(errors) == len(requested):
+            raise Exception(f"Error in quick generation: {'; '.join(f'{k}: {v}' for k, v in errors.items())}")
+        
+        if errors:
+            results["errors"] = errors
+        
+        return results
+    
+    async def _run_artifact(self, name: str, coro, timeout: float) -> tuple:
+        """Await one artifact under its own timeout, capturing failures"""
+        try:
+            return name, await asyncio.wait_for(coro, timeout=timeout), None
+        except asyncio.TimeoutError:
+            return name, None, f"Timed out after {timeout:g}s"
         except Exception as e:
-            raise Exception(f"Error in quick generation: {str(e)}")
+            return name, None, str(e)
     
-    def _generate_quick_email(
+    async def generate_quick_email(
         self,
         resume_content: str,
         job_description: str,
         company_name: str,
         job_title: str,
         tone: str,
-        length: str
+        length: str,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """Generate email without database"""
-        if not self.client:
+        if not llm_gateway.is_configured:
             raise ValueError("GROQ_API_KEY not configured")
         
-        length_instructions = {
-            "short": "Keep it brief (150-200 words)",
-            "medium": "Write a moderate length email (250-350 words)",
-            "long": "Write a comprehensive email (400-500 words)"
-        }
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
         
-        tone_instructions = {
-            "professional": "Use a formal, professional tone",
-            "friendly": "Use a warm, friendly yet professional tone",
-            "enthusiastic": "Use an enthusiastic and energetic tone",
-            "confident": "Use a confident, accomplished tone"
-        }
+        prompt = self._build_email_prompt(
+            resume_content, job_description, company_name, job_title, tone, length
+        )
         
-        prompt = f"""Generate a personalized cold email for a job application.
-
-**Job Information:**
-- Company: {company_name}
-- Position: {job_title}
-- Job Description: {job_description[:1500]}
-
-**Candidate Resume:**
-{resume_content[:2000]}
-
-**Requirements:**
-1. {tone_instructions.get(tone, tone_instructions['professional'])}
-2. {length_instructions.get(length, length_instructions['medium'])}
-3. Highlight 2-3 relevant skills/experiences
-4. Show genuine interest in the company
-5. Include a clear call-to-action
-6. Avoid generic phrases
-
-**Format:**
-Subject: [Write engaging subject line]
-
-Body:
-[Write the email body]"""
-
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert email writer specializing in cold emails for job applications."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
+            response = await llm_gateway.complete(
+                **prompt,
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                task="quick_email",
+                use_cache=not regenerate,
+                validate=is_complete_email
             )
             
-            content = response.choices[0].message.content or ""
-            
-            # Parse subject and body
-            lines = content.strip().split('\n')
-            subject = ""
-            body_lines = []
-            found_subject = False
-            
-            for line in lines:
-                if line.strip().startswith("Subject:"):
-                    subject = line.replace("Subject:", "").strip()
-                    found_subject = True
-                elif found_subject and line.strip():
-                    body_lines.append(line)
-            
-            if not subject:
-                subject = f"Application for {job_title} at {company_name}"
-            
-            body = '\n'.join(body_lines).strip()
-            if not body:
-                body = content.strip()
+            subject, body = self._parse_email_content(response["content"], job_title, company_name)
             
             return {
                 "subject": subject,
                 "body": body,
-                "tokens_used": response.usage.total_tokens if response.usage else 0
+                "tokens_used": response["tokens_used"],
+                "prompt_version": response["prompt_version"]
             }
             
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise Exception(f"Error generating email: {str(e)}")
+    
+    async def stream_quick_email(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        tone: str,
+        length: str,
+        regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream an email as ("token", text) events. A ("subject", text) event
+        is emitted as soon as the Subject: line is complete, and a final
+        ("done", result) event is shaped like generate_quick_email()
+        """
+        if not llm_gateway.is_configured:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        job_description = normalize_job_description(job_description)
+        resume_content = await resume_profiles.prompt_text(resume_content)
+        
+        prompt = self._build_email_prompt(
+            resume_content, job_description, company_name, job_title, tone, length
+        )
+        
+        content = ""
+        subject_sent = False
+        async for chunk in llm_gateway.stream(
+            **prompt,
+            temperature=0.7,
+            max_tokens=1000,
+            task="quick_email",
+            use_cache=not regenerate
+        ):
+            if chunk["type"] == "delta":
+                content += chunk["content"]
+                yield "token", chunk["content"]
+                
+                if not subject_sent:
+                    subject = self._complete_subject_line(content)
+                    if subject is not None:
+                        subject_sent = True
+                        yield "subject", subject
+            else:
+                subject, body = self._parse_email_content(chunk["content"], job_title, company_name)
+                if not subject_sent:
+                    yield "subject", subject
+                yield "done", {
+                    "subject": subject,
+                    "body": body,
+                    "tokens_used": chunk["tokens_used"],
+                    "prompt_version": chunk["prompt_version"]
+                }
+    
+    def _build_email_prompt(
+        self,
+        resume_content: str,
+        job_description: str,
+        company_name: str,
+        job_title: str,
+        tone: str,
+        length: str
+    ) -> Dict[str, str]:
+        """Render the quick email template; returns the gateway prompt arguments"""
+        resume_content, job_description = build_prompt_context("quick_email", resume_content, job_description)
+        
+        length_instructions = {
+            "short": "Keep it brief (150-200 words)",
+            "medium": "Write a moderate length email (250-350 words)",
+            "long": "Write a comprehensive email (400-500 words)"
+        }
+        
+        tone_instructions = {
+            "professional": "Use a formal, professional tone",
+            "friendly": "Use a warm, friendly yet professional tone",
+            "enthusiastic": "Use an enthusiastic and energetic tone",
+            "confident": "Use a confident, accomplished tone"
+        }
+        
+        return QUICK_EMAIL.render(
+            tone=tone_instructions.get(tone, tone_instructions['professional']),
+            length=length_instructions.get(length, length_instructions['medium']),
+            company_name=company_name,
+            job_title=job_title,
+            job_description=job_description,
+            resume_content=resume_content
+        )
+    
+    def _complete_subject_line(self, partial: str) -> Optional[str]:
+        """Return the subject once its line has fully streamed in"""
+        for line in partial.split('\n')[:-1]:
+            if line.strip().startswith("Subject:"):
+                subject = line.replace("Subject:", "").strip()
+                if subject:
+                    return subject
+        return None
+    
+    def _parse_email_content(self, content: str, job_title: str, company_name: str) -> Tuple[str, str]:
+        """Parse subject and body from the model output"""
+        lines = content.strip().split('\n')
+        subject = ""
+        body_lines = []
+        found_subject = False
+        
+        for line in lines:
+            if line.strip().startswith("Subject:"):
+                subject = line.replace("Subject:", "").strip()
+                found_subject = True
+            elif found_subject and line.strip():
+                body_lines.append(line)
+        
+        if not subject:
+            subject = f"Application for {job_title} at {company_name}"
+        
+        body = '\n'.join(body_lines).strip()
+        if not body:
+            body = content.strip()
+        
+        return subject, body
 
 
 # Service instances
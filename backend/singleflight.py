@@ -0,0 +1,151 @@
+"""
+Request coalescing for identical generations
+- In-process: concurrent callers share one asyncio task
+- Across workers: a Redis lock elects one leader per generation key; the
+  leader stores its result under a short-lived result key and publishes it,
+  and everyone else waits on that channel while polling the result key (so
+  waiters without pub/sub, e.g. on Upstash REST, or that subscribed too late
+  still get it)
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable, Awaitable
+from cache import async_cache
+from config import settings
+
+
+class SingleFlight:
+    """Run at most one upstream generation per key at a time"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"leaders": 0, "local_joins": 0, "remote_joins": 0, "remote_timeouts": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SINGLEFLIGHT_ENABLED
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]],
+        lookup: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Return fn()'s result, sharing it with identical concurrent calls.
+        lookup() checks for a result the leader has already stored (used
+        when a published result is missed).
+        """
+        if not self.enabled:
+            return await fn()
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["local_joins"] += 1
+            return self._shared(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(self._run_distributed(key, fn, lookup))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # A caller disconnecting must not cancel the generation others wait on
+        return await asyncio.shield(task)
+
+    async def _run_distributed(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]],
+        lookup: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]]
+    ) -> Dict[str, Any]:
+        lock_key = f"lock:{key}"
+        owner = uuid.uuid4().hex
+        acquired = await async_cache.acquire_lock(lock_key, owner, settings.SINGLEFLIGHT_LOCK_TTL)
+        if acquired is False:
+            self.stats["remote_joins"] += 1
+            # A publish between losing the lock and subscribing is caught by
+            # the result key check in _wait_for_leader
+            pubsub = await async_cache.subscribe(self._channel(key))
+            try:
+                result = await self._wait_for_leader(key, lock_key, pubsub, lookup)
+            finally:
+                await async_cache.unsubscribe(pubsub)
+            if result is not None:
+                return self._shared(result)
+            # Leader failed or is too slow - generate ourselves
+            self.stats["remote_timeouts"] += 1
+            return await fn()
+
+        # Leader (or Redis unreachable, in which case there is nothing to coordinate)
+        self.stats["leaders"] += 1
+        if acquired:
+            # A previous flight's result must not be handed to this one's waiters
+            await async_cache.delete(self._result_key(key))
+        try:
+            result = await fn()
+            if acquired:
+                # Stored before the lock is released so no waiter can miss it
+                await async_cache.set(self._result_key(key), result, settings.SINGLEFLIGHT_RESULT_TTL)
+                await async_cache.publish(self._channel(key), result)
+            return result
+        finally:
+            if acquired:
+                await async_cache.release_lock(lock_key, owner)
+
+    async def _wait_for_leader(
+        self,
+        key: str,
+        lock_key: str,
+        pubsub,
+        lookup: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Wait for the leader's result (published, stored, or cached) or the lock to vanish"""
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            result = await self._stored_result(key, lookup)
+            if result is not None:
+                return result
+            if not await async_cache.exists(lock_key):
+                # The leader stores its result before releasing; check once
+                # more in case it finished since the read above
+                result = await self._stored_result(key, lookup)
+                if result is not None:
+                    return result
+                # Lock released without a result (e.g. the leader failed)
+                return None
+            interval = min(settings.SINGLEFLIGHT_POLL_INTERVAL, max(0.0, deadline - time.monotonic()))
+            message = await async_cache.next_message(pubsub, interval)
+            if message is not None:
+                return message
+        return None
+
+    async def _stored_result(
+        self,
+        key: str,
+        lookup: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]]
+    ) -> Optional[Dict[str, Any]]:
+        result = await async_cache.get(self._result_key(key))
+        if result is None and lookup is not None:
+            result = await lookup()
+        return result
+
+    def _channel(self, key: str) -> str:
+        return f"flight:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"flight:{key}:result"
+
+    def _shared(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Waiters reuse another request's generation and spend no tokens"""
+        return {
+            **result,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tokens_used": 0,
+            "coalesced": True
+        }
+
+
+# Global single-flight instance
+single_flight = SingleFlight()
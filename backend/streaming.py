@@ -0,0 +1,132 @@
+"""
+Helpers for streamed HTTP responses (NDJSON and server-sent events)
+and for parsing JSON model output while it streams
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+from cache import DateTimeEncoder
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Headers that stop proxies (nginx etc.) from buffering the stream
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def ndjson_line(data: Any) -> str:
+    """Encode one NDJSON record"""
+    return json.dumps(data, cls=DateTimeEncoder) + "\n"
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Encode one server-sent event; non-string data is sent as JSON"""
+    payload = data if isinstance(data, str) else json.dumps(data, cls=DateTimeEncoder)
+    lines = "".join(f"data: {line}\n" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+class IncrementalJSONParser:
+    """
+    Parse a JSON object as it streams in, reporting pieces as soon as they close.
+    feed() returns ("field", key, value) for each completed top-level member and
+    ("item", key, value) for each completed element of a top-level array.
+    Text before the opening brace (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._array_key: Optional[str] = None
+        self._item_start = 0
+
+    def feed(self, text: str) -> List[Tuple[str, str, Any]]:
+        self.buffer += text
+        buf = self.buffer
+        events: List[Tuple[str, str, Any]] = []
+
+        while self._pos < len(buf) and not self.done:
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"' and self._depth == 1 and self._expect_key:
+                    self._in_string = False
+                    self._key = self._decode(buf[self._string_start:i + 1])
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._expect_key = False
+                self._value_start = i + 1
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1:
+                    self._array_key = self._key
+                    self._item_start = i + 1
+                self._depth += 1
+            elif ch in "}]":
+                if ch == "]" and self._depth == 2 and self._array_key is not None:
+                    self._emit(events, "item", self._array_key, buf[self._item_start:i])
+                    self._array_key = None
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_field(events, buf[self._value_start:i] if self._value_start is not None else "")
+                    self.done = True
+            elif ch == ",":
+                if self._depth == 1:
+                    self._emit_field(events, buf[self._value_start:i] if self._value_start is not None else "")
+                    self._expect_key = True
+                    self._value_start = None
+                elif self._depth == 2 and self._array_key is not None:
+                    self._emit(events, "item", self._array_key, buf[self._item_start:i])
+                    self._item_start = i + 1
+
+        return events
+
+    def _emit_field(self, events: List[Tuple[str, str, Any]], raw: str):
+        if self._key is not None:
+            self._emit(events, "field", self._key, raw)
+        self._key = None
+
+    def _emit(self, events: List[Tuple[str, str, Any]], kind: str, key: str, raw: str):
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            events.append((kind, key, json.loads(raw)))
+        except json.JSONDecodeError:
+            # Malformed piece - the final parse decides what to do with it
+            pass
+
+    def _decode(self, raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
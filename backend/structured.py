@@ -0,0 +1,240 @@
+"""
+Structured (JSON) model output
+- Local repair of almost-valid JSON: code fences, trailing commas, truncation
+- Field-by-field validation against a Pydantic response model
+- One follow-up completion that regenerates only the fields that failed
+"""
+
+import json
+import math
+import re
+from typing import Dict, Any, Optional, List, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from llm import llm_gateway
+
+
+_FENCE_START_RE = re.compile(r'^```(?:json)?\s*\n?')
+_FENCE_END_RE = re.compile(r'\n?```\s*$')
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+
+# Fewest output tokens a field-level retry is given
+MIN_RETRY_TOKENS = 256
+
+# Truncation cut points tried (latest first) before giving up on a repair
+MAX_REPAIR_ATTEMPTS = 50
+
+
+class StructuredOutputError(Exception):
+    """Model output could not be repaired into the response model"""
+
+
+def repair_json(content: str) -> str:
+    """
+    Best-effort fix for model JSON: strips fences and surrounding prose and
+    drops trailing commas. Truncated output is cut back to the last complete
+    member or array item and the open containers are closed.
+    """
+    text = _FENCE_END_RE.sub('', _FENCE_START_RE.sub('', (content or "").strip()))
+    start = text.find("{")
+    if start == -1:
+        return text
+    text = _TRAILING_COMMA_RE.sub(r'\1', text[start:])
+
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    # (cut position, closers needed) after each complete value, latest last
+    cuts: List[Tuple[int, str]] = []
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[:i + 1]
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+
+    for position, closers in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        candidate = text[:position].rstrip().rstrip(",") + closers
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            continue
+    return text
+
+
+def load_json_object(content: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Parse a JSON object, repairing it if needed; returns (data, repaired)"""
+    raw = _FENCE_END_RE.sub('', _FENCE_START_RE.sub('', (content or "").strip()))
+    try:
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            return data, False
+    except json.JSONDecodeError:
+        pass
+    try:
+        data = json.loads(repair_json(content))
+    except json.JSONDecodeError:
+        return None, False
+    return (data, True) if isinstance(data, dict) else (None, False)
+
+
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """json_schema response_format payload for a response model"""
+    return {"name": model.__name__, "schema": model.model_json_schema()}
+
+
+def check_fields(model: Type[BaseModel], data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Split data into fields that validate and {field: reason} for those that
+    don't (including missing required fields). Invalid items of list fields
+    are dropped rather than failing the whole list.
+    """
+    data = dict(data)
+    for _ in range(2):
+        try:
+            model.model_validate(data)
+            return data, {}
+        except ValidationError as e:
+            errors = e.errors()
+
+        invalid: Dict[str, str] = {}
+        bad_items: Dict[str, set] = {}
+        for error in errors:
+            loc = error["loc"]
+            field = str(loc[0]) if loc else "__root__"
+            if len(loc) > 1 and isinstance(loc[1], int) and isinstance(data.get(field), list):
+                bad_items.setdefault(field, set()).add(loc[1])
+            else:
+                invalid.setdefault(field, error["msg"])
+
+        if not bad_items:
+            break
+        for field, indexes in bad_items.items():
+            items = [item for index, item in enumerate(data[field]) if index not in indexes]
+            if items:
+                data[field] = items
+            else:
+                invalid.setdefault(field, "no valid items")
+                data.pop(field)
+        if invalid:
+            break
+
+    for field in invalid:
+        data.pop(field, None)
+    return data, invalid
+
+
+def is_valid_output(model: Type[BaseModel], content: str) -> bool:
+    """Output validator: the (repaired) JSON satisfies the response model"""
+    data, _ = load_json_object(content)
+    return data is not None and not check_fields(model, data)[1]
+
+
+async def complete_structured(
+    model: Type[BaseModel],
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    task: str,
+    use_cache: bool = True,
+    prompt_version: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    JSON-mode completion validated against `model`. Broken JSON is repaired
+    locally and fields that still fail are regenerated in one follow-up call.
+    Returns {"data", "tokens_used", "repaired", "regenerated_fields", "prompt_version"}.
+    """
+    response = await llm_gateway.complete(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        task=task,
+        use_cache=use_cache,
+        json_mode=True,
+        response_schema=response_schema(model),
+        validate=lambda content: is_valid_output(model, content),
+        prompt_version=prompt_version
+    )
+    return await finalize_structured(
+        model, response, system_prompt, user_prompt, temperature, max_tokens, task, use_cache, prompt_version
+    )
+
+
+async def finalize_structured(
+    model: Type[BaseModel],
+    response: Dict[str, Any],
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    task: str,
+    use_cache: bool = True,
+    prompt_version: Optional[str] = None
+) -> Dict[str, Any]:
+    """Repair and validate a finished completion, regenerating only the invalid fields"""
+    data, repaired = load_json_object(response["content"])
+    if data is None:
+        # Nothing salvageable - every field has to be generated again
+        fields, invalid = {}, {field: "response was not a JSON object" for field in model.model_fields}
+    else:
+        fields, invalid = check_fields(model, data)
+    tokens_used = response["tokens_used"]
+    regenerated: List[str] = []
+
+    if invalid:
+        retry = await llm_gateway.complete(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt + _retry_instructions(invalid),
+            temperature=temperature,
+            max_tokens=max(MIN_RETRY_TOKENS, math.ceil(max_tokens * len(invalid) / len(model.model_fields))),
+            task=task,
+            use_cache=use_cache,
+            json_mode=True,
+            prompt_version=prompt_version
+        )
+        tokens_used += retry["tokens_used"]
+        retry_data, _ = load_json_object(retry["content"])
+        patch = {field: value for field, value in (retry_data or {}).items() if field in invalid}
+        fields, invalid = check_fields(model, {**fields, **patch})
+        regenerated = sorted(patch)
+
+    try:
+        validated = model.model_validate(fields)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Model output failed validation for {', '.join(sorted(invalid)) or 'response'}: {e.errors()[0]['msg']}")
+
+    return {
+        "data": validated.model_dump(),
+        "tokens_used": tokens_used,
+        "repaired": repaired,
+        "regenerated_fields": regenerated,
+        "prompt_version": prompt_version
+    }
+
+
+def _retry_instructions(invalid: Dict[str, str]) -> str:
+    """Appended to the original prompt so its prefix (and provider prompt cache) is reused"""
+    problems = "\n".join(f"- {field}: {reason}" for field, reason in sorted(invalid.items()))
+    return (
+        "\n\n**Correction:** a previous answer had missing or invalid values for these keys:\n"
+        f"{problems}\n"
+        f"Return a JSON object containing ONLY the keys {', '.join(sorted(invalid))}, "
+        "following the format above."
+    )
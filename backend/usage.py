@@ -0,0 +1,268 @@
+"""
+Buffered usage accounting
+- UsageMiddleware opens a usage scope for every request; the LLM gateway adds
+  each generation's model and token counts to the current scope
+- When the request finishes (streams included) the scope becomes one usage
+  event (endpoint, action, model, prompt/completion tokens, latency, status)
+  appended to an in-process buffer - no DB round trip on the request path
+- A background flusher bulk-inserts buffered events every USAGE_FLUSH_INTERVAL
+  seconds (sooner once USAGE_FLUSH_BATCH events are waiting)
+- If the database is unreachable events stay buffered and the flusher backs
+  off; past USAGE_BUFFER_MAX events the oldest are dropped and counted
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from sqlalchemy import inspect, text
+from config import settings
+from database import SessionLocal
+from models import UsageTracking
+
+
+# Example rate, as used by the original per-request usage rows
+COST_PER_TOKEN = 0.0001
+
+# Requests with these methods are recorded even when they made no generation
+RECORDED_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Columns added to usage_tracking after the table was first created
+USAGE_COLUMNS = {
+    "model": "VARCHAR",
+    "prompt_tokens": "INTEGER",
+    "completion_tokens": "INTEGER",
+    "latency_ms": "FLOAT",
+    "status_code": "INTEGER"
+}
+
+
+class UsageScope:
+    """Token usage accumulated while serving one request or job"""
+
+    def __init__(self, endpoint: str, action: Optional[str] = None, user_id: Optional[int] = None):
+        self.endpoint = endpoint
+        self.action = action
+        self.user_id = user_id
+        self.status_code: Optional[int] = None
+        self.started = time.perf_counter()
+        self.models: List[str] = []
+        self.generations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_used = 0
+
+    def add_generation(self, result: Dict[str, Any]):
+        self.generations += 1
+        model = result.get("model")
+        if model and model not in self.models:
+            self.models.append(model)
+        self.prompt_tokens += result.get("prompt_tokens", 0) or 0
+        self.completion_tokens += result.get("completion_tokens", 0) or 0
+        self.tokens_used += result.get("tokens_used", 0) or 0
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "endpoint": self.endpoint,
+            "action": self.action or "request",
+            "model": ",".join(self.models) or None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_used": self.tokens_used,
+            "cost": self.tokens_used * COST_PER_TOKEN,
+            "latency_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "status_code": self.status_code,
+            "timestamp": datetime.utcnow()
+        }
+
+
+_current_scope: contextvars.ContextVar[Optional[UsageScope]] = contextvars.ContextVar("usage_scope", default=None)
+
+
+class UsageRecorder:
+    """In-process usage event buffer with a periodic bulk-insert flusher"""
+
+    def __init__(self):
+        self._buffer: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.last_error: Optional[str] = None
+        self.stats = {"recorded": 0, "flushed": 0, "batches": 0, "dropped": 0, "flush_errors": 0}
+
+    # Request side
+
+    @contextmanager
+    def track(self, endpoint: str, action: Optional[str] = None, user_id: Optional[int] = None):
+        """Collect generations made inside the block; record them on exit"""
+        scope = UsageScope(endpoint, action, user_id)
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+            self.record(scope)
+
+    def current(self) -> Optional[UsageScope]:
+        return _current_scope.get()
+
+    def add_generation(self, result: Dict[str, Any]):
+        """Called by the LLM gateway for every completion, cached or not"""
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.add_generation(result)
+
+    def set_user(self, user_id: int):
+        scope = _current_scope.get()
+        if scope is not None and scope.user_id is None:
+            scope.user_id = user_id
+
+    def set_action(self, action: str):
+        """Override the action name recorded for the current request"""
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.action = action
+
+    def record(self, scope: UsageScope):
+        """Buffer a finished scope; anonymous scopes are not recorded"""
+        if scope.user_id is None:
+            return
+        if len(self._buffer) >= settings.USAGE_BUFFER_MAX:
+            self._buffer.popleft()
+            self.stats["dropped"] += 1
+        self._buffer.append(scope.to_row())
+        self.stats["recorded"] += 1
+        if self._wakeup is not None and len(self._buffer) >= settings.USAGE_FLUSH_BATCH:
+            self._wakeup.set()
+
+    # Flusher
+
+    def start(self):
+        """Start the flusher on the running event loop"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.ensure_future(self._flusher())
+
+    async def stop(self):
+        """Stop the flusher and make a last attempt to write what is buffered"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def flush(self) -> bool:
+        """Write all buffered events in batches; False if the database failed"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                size = min(len(self._buffer), settings.USAGE_FLUSH_BATCH)
+                batch = [self._buffer.popleft() for _ in range(size)]
+                try:
+                    await asyncio.to_thread(self._insert, batch)
+                except Exception as e:
+                    print(f"Usage flush error: {e}")
+                    self.last_error = str(e)
+                    self.stats["flush_errors"] += 1
+                    self._requeue(batch)
+                    return False
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "buffered": len(self._buffer),
+            "last_error": self.last_error,
+            **self.stats
+        }
+
+    async def _flusher(self):
+        delay = settings.USAGE_FLUSH_INTERVAL
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                ok = await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Usage flusher error: {e}")
+                ok = False
+            # Back off while the database is down instead of hammering it
+            delay = settings.USAGE_FLUSH_INTERVAL if ok else min(delay * 2, settings.USAGE_RETRY_MAX_DELAY)
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back in front, keeping the buffer within USAGE_BUFFER_MAX"""
+        room = max(0, settings.USAGE_BUFFER_MAX - len(self._buffer))
+        keep = batch[len(batch) - room:] if room < len(batch) else batch
+        self.stats["dropped"] += len(batch) - len(keep)
+        self._buffer.extendleft(reversed(keep))
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(UsageTracking, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class UsageMiddleware:
+    """ASGI middleware giving each HTTP request a usage scope"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with usage_recorder.track(scope["path"]) as usage:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    usage.status_code = message["status"]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Routing has filled in the matched route by now
+                route = scope.get("route")
+                endpoint = scope.get("endpoint")
+                if route is not None and getattr(route, "path", None):
+                    usage.endpoint = route.path
+                if usage.action is None and endpoint is not None:
+                    usage.action = endpoint.__name__
+                if usage.generations == 0 and scope["method"] not in RECORDED_METHODS:
+                    usage.user_id = None
+
+
+def upgrade_usage_table(engine):
+    """Add usage columns missing from a table created by an older version"""
+    existing = {column["name"] for column in inspect(engine).get_columns(UsageTracking.__tablename__)}
+    missing = [(name, kind) for name, kind in USAGE_COLUMNS.items() if name not in existing]
+    if not missing:
+        return
+    with engine.begin() as connection:
+        for name, kind in missing:
+            connection.execute(text(f"ALTER TABLE {UsageTracking.__tablename__} ADD COLUMN {name} {kind}"))
+
+
+# Global usage recorder instance
+usage_recorder = UsageRecorder()